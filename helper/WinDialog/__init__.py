@@ -20,6 +20,8 @@ Currently the following classes and enums are supported and tested:
 - StatusBar: Represents a status bar control.
 - UpDown: Represents an up-down control.
 - ListView: Represents a syslistview32 control.
+- VirtualListView: Represents a syslistview32 control whose rows are served by a ListViewDataSource.
+- TableModel: Rows with typed columns, sorted and filtered in Python, a data source of a VirtualListView.
 - TreeView: Represents a systreeview32 control.
 
 Enums:
@@ -57,7 +59,7 @@ Classes that are missing and for which there are currently no plans to include a
 __all__ = ['Dialog',
            'Button', 'DefaultButton', 'CheckBoxButton', 'GroupBox', 'CommandButton', 'RadioButton', 'RadioPushButton', 'SplitButton',
            'Label', 'TruncatedLabel', 'BlackFramedLabel', 'CenteredLabel', 'RigthAlignedLabel',
-           'ComboBox', 'ComboBoxEx', 'ListBox', 'TextBox', 'ListView', 'ProgressBar', 'StatusBar', 'UpDown', 'TreeView',
+           'ComboBox', 'ComboBoxEx', 'ListBox', 'TextBox', 'ListView', 'VirtualListView', 'ListViewDataSource', 'TableModel', 'Column', 'ProgressBar', 'StatusBar', 'UpDown', 'TreeView',
            'DirectoryPicker', 'FileOpenDialog', 'FileSaveDialog'
            ]
 __version__ = '0.3'
@@ -74,7 +76,7 @@ from .win_helper import (
 
     CreateDialogIndirectParam, DestroyWindow,
     ShowWindow, UpdateWindow, MSG, GetMessage, IsDialogMessage, TranslateMessage, DispatchMessage,
-    LPWINDOWPOS
+    LPWINDOWPOS, SetWindowLong, DWLP
 )
 from .controls.__control_template import Control
 from .controls.button import Button, DefaultButton, CheckBoxButton, GroupBox, CommandButton, RadioButton, RadioPushButton, SplitButton
@@ -82,7 +84,7 @@ from .controls.label import Label, TruncatedLabel, BlackFramedLabel, CenteredLab
 from .controls.combobox import ComboBox, ComboBoxEx
 from .controls.listbox import ListBox
 from .controls.textbox import TextBox
-from .controls.listview import ListView
+from .controls.listview import ListView, VirtualListView, ListViewDataSource, LVS
 from .controls.progressbar import ProgressBar
 from .controls.statusbar import StatusBar
 from .controls.updown import UpDown
@@ -105,12 +107,15 @@ from .controls.treeview import TreeView
 from .com_dialogs import FileOpenDialog, DirectoryPicker, FileSaveDialog
 
 from .resource_parser import parser
+from .dialog_template import build_template
+from .table_model import TableModel, Column
 
 from Npp import notepad
 import ctypes
-from ctypes import wintypes, create_unicode_buffer, pointer, cast
+from ctypes import wintypes, pointer, cast
 from dataclasses import dataclass, field
 from typing import Dict, List
+from time import perf_counter
 
 def registerHotkey(hotkey):
     def wrapper(func):
@@ -119,6 +124,84 @@ def registerHotkey(hotkey):
     return wrapper
 
 
+def registerMessage(msg):
+    '''
+    Decorator which makes a method of a Dialog subclass the handler of a window message.
+
+    The method is called with hwnd, wparam and lparam. Handlers of base classes for the
+    same message are called first, so e.g. a WM.INITDIALOG handler of a subclass runs
+    after Dialog has assigned the window handles. The dialog procedure returns the result
+    of the last handler which returned a true value, otherwise False.
+    A handler overridden under the same name replaces the base one.
+
+    Args:
+        msg (int): The message identifier, e.g. WM.SIZE.
+
+    Returns:
+        The decorator.
+    '''
+    def wrapper(func):
+        func._message = msg
+        return func
+    return wrapper
+
+
+def _parse_hotkey(hotkey):
+    '''
+    Converts a hotkey string into the arguments of RegisterHotKey.
+
+    Args:
+        hotkey (str): A hotkey in the form "CTRL+SHIFT+A".
+
+    Returns:
+        tuple: (modifiers, virtual key code) or None if the hotkey does not consist of exactly one key.
+    '''
+    _hotkey = hotkey.lower()
+    mod = 0
+    mod += 0x1 if 'alt' in _hotkey else 0
+    mod += 0x2 if 'ctrl' in _hotkey else 0
+    mod += 0x4 if 'shift' in _hotkey else 0
+    hotkey_parts = _hotkey.split('+')
+    _key = [x for x in hotkey_parts if x not in ("ctrl", "alt", "shift")]
+    if len(_key) != 1:
+        return None
+    return mod, ord(_key[0].upper())
+
+
+def _collect_class_handlers(cls):
+    '''
+    Collects the hotkey methods and the message handlers of a Dialog class once.
+
+    Only the class dictionaries get looked at, so no property of an instance is ever evaluated.
+    A method overridden without a decorator is no longer a hotkey method or message handler.
+    All handlers of a message are kept, those of base classes first.
+
+    Args:
+        cls (type): Dialog or a subclass of it.
+
+    Returns:
+        None
+    '''
+    hotkeys = {}
+    handlers = {}
+    for klass in reversed(cls.__mro__):
+        for name, attr in vars(klass).items():
+            hotkeys.pop(name, None)
+            handlers.pop(name, None)
+            if not callable(attr):
+                continue
+            if hasattr(attr, '_hotkey'):
+                hotkeys[name] = _parse_hotkey(attr._hotkey)
+            if hasattr(attr, '_message'):
+                handlers[name] = attr
+    # handlers keeps the order of the mro, base classes first
+    messages = {}
+    for handler in handlers.values():
+        messages.setdefault(handler._message, []).append(handler)
+    cls._hotkeyMethods = tuple((name, hotkey) for name, hotkey in sorted(hotkeys.items()) if hotkey)
+    cls._messageHandlers = {msg: tuple(chain) for msg, chain in messages.items()}
+
+
 @dataclass
 class Dialog:
     '''
@@ -206,6 +289,12 @@ class Dialog:
         self.registeredCommands = {}
         self.registeredNotifications = {}
         self.registeredHotkeys = {}
+        self.dialog_proc = None
+        # message -> [count, seconds], see enableMessageStatistics
+        self.messageStatistics = None
+        # what the last template and the registered commands and notifications were made of
+        self.__definition = None
+        self.__dialogTemplate = None
 
     def initialize(self):
         '''
@@ -250,39 +339,24 @@ class Dialog:
         """
         SetWindowText(self.hwnd, new_title)
 
-    def __create_dialog_window(self):
+    def __template(self):
         '''
-        Create the dialog template structure.
+        Returns the values of the dialog template structure, without its controls.
 
         Args:
             None.
 
         Returns:
-            bytearray: The byte array representing the dialog template structure.
+            tuple: (exStyle, style, x, y, cx, cy, title, pointsize, weight, italic, charset, typeface)
 
         '''
         # https://learn.microsoft.com/en-us/windows/win32/dlgbox/dlgtemplateex
-        self.windowClass = 0
-        _array = bytearray()
-        _array += wintypes.WORD(1)  # dlgVer
-        _array += wintypes.WORD(0xFFFF)  # signature
-        _array += wintypes.DWORD(0)  # helpID
-        _array += wintypes.DWORD(self.exStyle)
-        _array += wintypes.DWORD(self.style)
-        _array += wintypes.WORD(self.dialog_items or 0)  # cDlgItems
-        _array += wintypes.SHORT(self.position[0])  # x
-        _array += wintypes.SHORT(self.position[1])  # y
-        _array += wintypes.SHORT(self.size[0])  # width
-        _array += wintypes.SHORT(self.size[1])  # height
-        _array += wintypes.WORD(0)  # menu
-        _array += wintypes.WORD(0)  # windowClass
-        _array += create_unicode_buffer(self.title)
-        _array += wintypes.WORD(self.pointsize)
-        _array += wintypes.WORD(self.weight)
-        _array += wintypes.BYTE(self.italic)
-        _array += wintypes.BYTE(self.charset)
-        _array += create_unicode_buffer(self.typeface)
-        return _array
+        return (self.exStyle, self.style,
+                self.position[0], self.position[1],
+                self.size[0], self.size[1],
+                self.title,
+                self.pointsize, self.weight, self.italic, self.charset,
+                self.typeface)
 
     def __default_dialog_proc(self, hwnd, msg, wparam, lparam):
         """
@@ -300,84 +374,148 @@ class Dialog:
             The result of the message processing.
 
         Note: Custom window procedures should call this function when they do not handle a particular message.
+              The handlers of a message are looked up in the class level table built from the methods
+              decorated with registerMessage, subclasses can add handlers that way, base handlers run first.
 
         """
-        if msg == WM.INITDIALOG:
-            self.hwnd = hwnd
-            for i, control in enumerate(self.controlList):
-                self.controlList[i].hwnd = GetDlgItem(hwnd, control.id)
-
-            for ident, key in enumerate(dir(self)):
-                method = getattr(self, key)
-                if hasattr(method, "_hotkey") and callable(method):
-                    _hotkey = method._hotkey.lower()
-                    mod = 0
-                    mod += 0x1 if 'alt' in _hotkey else 0
-                    mod += 0x2 if 'ctrl' in _hotkey else 0
-                    mod += 0x4 if 'shift' in _hotkey else 0
-                    hotkey_parts = _hotkey.split('+')
-                    _key = [x for x in hotkey_parts if x not in ("ctrl", "alt", "shift")]
-                    if len(_key) == 1:
-                        __key = ord(_key[0].upper())
-                        if RegisterHotKey(self.hwnd, ident, mod, __key):
-                            wparam = ( __key << 16) + mod
-                            self.registeredHotkeys[(ident, wparam)] = method
-
-            self.initialize()
-
-            if self.useLastDialogPos and self.__lastDialogPos:
-                SetWindowPos(hwnd, 0, self.__lastDialogPos[0], self.__lastDialogPos[1], 0, 0, SWP.NOSIZE)
-                return True
-
-            if self.center:
-                rcOwner = wintypes.RECT()
-                rcDlg = wintypes.RECT()
-                rc = wintypes.RECT()
-
-                GetWindowRect(self.parent, ctypes.byref(rcOwner))
-                GetWindowRect(hwnd, ctypes.byref(rcDlg))
-                CopyRect(ctypes.byref(rc), ctypes.byref(rcOwner))
-
-                OffsetRect(ctypes.byref(rcDlg), -rcDlg.left, -rcDlg.top)
-                OffsetRect(ctypes.byref(rc), -rc.left, -rc.top)
-                OffsetRect(ctypes.byref(rc), -rcDlg.right, -rcDlg.bottom)
-
-                center_x = rcOwner.left + (rc.right // 2)
-                center_y = rcOwner.top + (rc.bottom // 2)
-                SetWindowPos(hwnd, 0, center_x, center_y, 0, 0, SWP.NOSIZE)
-
-                return True
-
-        elif msg == WM.CLOSE:
-            self.terminate()  # this is executed by clicking the X in the upper right corner
-
-        elif msg == WM.COMMAND:
-            if wparam in self.registeredCommands:
-                self.registeredCommands[wparam]()
-                return True
-            elif wparam==2 and lparam==0 and self.closeOnEscapeKey:
-                self.terminate()
-
-        elif msg == WM.NOTIFY:
-            lpnmhdr = cast(lparam, LPNMHDR)
-            notif_key = (lpnmhdr.contents.code, lpnmhdr.contents.idFrom)
-            if notif_key in self.registeredNotifications:
-                args = cast(lparam, self.registeredNotifications[notif_key][1])
-                self.registeredNotifications[notif_key][0](args.contents)
-                return True
-
-        elif msg == WM.HOTKEY:
-            if (wparam, lparam) in self.registeredHotkeys:
-                self.registeredHotkeys[(wparam, lparam)]()
-
-        elif msg == WM.WINDOWPOSCHANGED:
-            if self.useLastDialogPos:
-                p_wp = cast(lparam, LPWINDOWPOS)
-                self.__lastDialogSize = (p_wp.contents.cx, p_wp.contents.cy)
-                self.__lastDialogPos = (p_wp.contents.x, p_wp.contents.y)
+        handlers = self._messageHandlers.get(msg, ())
+        if self.messageStatistics is None:
+            result = False
+            for handler in handlers:
+                result = handler(self, hwnd, wparam, lparam) or result
+            return result
+
+        started = perf_counter()
+        result = False
+        for handler in handlers:
+            result = handler(self, hwnd, wparam, lparam) or result
+        entry = self.messageStatistics.get(msg)
+        if entry is None:
+            entry = self.messageStatistics[msg] = [0, 0.0]
+        entry[0] += 1
+        entry[1] += perf_counter() - started
+        return result
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        _collect_class_handlers(cls)
+
+    @registerMessage(WM.INITDIALOG)
+    def __on_init_dialog(self, hwnd, wparam, lparam):
+        self.hwnd = hwnd
+        for i, control in enumerate(self.controlList):
+            self.controlList[i].hwnd = GetDlgItem(hwnd, control.id)
+
+        # the hotkey methods of the class are known in advance, functions assigned to the instance are not
+        hotkeys = list(self._hotkeyMethods)
+        hotkeys.extend((name, _parse_hotkey(value._hotkey)) for name, value in self.__dict__.items()
+                       if callable(value) and hasattr(value, '_hotkey'))
+        self.registeredHotkeys.clear()
+        for ident, (name, hotkey) in enumerate(hotkeys):
+            if hotkey is None:
+                continue
+            mod, key = hotkey
+            if RegisterHotKey(self.hwnd, ident, mod, key):
+                self.registeredHotkeys[(ident, (key << 16) + mod)] = getattr(self, name)
+
+        self.initialize()
+
+        if self.useLastDialogPos and self.__lastDialogPos:
+            SetWindowPos(hwnd, 0, self.__lastDialogPos[0], self.__lastDialogPos[1], 0, 0, SWP.NOSIZE)
+            return True
+
+        if self.center:
+            rcOwner = wintypes.RECT()
+            rcDlg = wintypes.RECT()
+            rc = wintypes.RECT()
+
+            GetWindowRect(self.parent, ctypes.byref(rcOwner))
+            GetWindowRect(hwnd, ctypes.byref(rcDlg))
+            CopyRect(ctypes.byref(rc), ctypes.byref(rcOwner))
+
+            OffsetRect(ctypes.byref(rcDlg), -rcDlg.left, -rcDlg.top)
+            OffsetRect(ctypes.byref(rc), -rc.left, -rc.top)
+            OffsetRect(ctypes.byref(rc), -rcDlg.right, -rcDlg.bottom)
+
+            center_x = rcOwner.left + (rc.right // 2)
+            center_y = rcOwner.top + (rc.bottom // 2)
+            SetWindowPos(hwnd, 0, center_x, center_y, 0, 0, SWP.NOSIZE)
+
+            return True
+        return False
+
+    @registerMessage(WM.CLOSE)
+    def __on_close(self, hwnd, wparam, lparam):
+        self.terminate()  # this is executed by clicking the X in the upper right corner
+        return False
+
+    @registerMessage(WM.COMMAND)
+    def __on_command(self, hwnd, wparam, lparam):
+        if wparam in self.registeredCommands:
+            self.registeredCommands[wparam]()
+            return True
+        elif wparam==2 and lparam==0 and self.closeOnEscapeKey:
+            self.terminate()
+        return False
+
+    @registerMessage(WM.NOTIFY)
+    def __on_notify(self, hwnd, wparam, lparam):
+        lpnmhdr = cast(lparam, LPNMHDR)
+        notif_key = (lpnmhdr.contents.code, lpnmhdr.contents.idFrom)
+        if notif_key in self.registeredNotifications:
+            args = cast(lparam, self.registeredNotifications[notif_key][1])
+            result = self.registeredNotifications[notif_key][0](args.contents)
+            # e.g. the index of the item found for LVN_ODFINDITEM
+            if isinstance(result, int) and not isinstance(result, bool):
+                SetWindowLong(hwnd, DWLP.MSGRESULT, result)
+            return True
+        return False
 
+    @registerMessage(WM.HOTKEY)
+    def __on_hotkey(self, hwnd, wparam, lparam):
+        if (wparam, lparam) in self.registeredHotkeys:
+            self.registeredHotkeys[(wparam, lparam)]()
         return False
 
+    @registerMessage(WM.WINDOWPOSCHANGED)
+    def __on_window_pos_changed(self, hwnd, wparam, lparam):
+        if self.useLastDialogPos:
+            p_wp = cast(lparam, LPWINDOWPOS)
+            self.__lastDialogSize = (p_wp.contents.cx, p_wp.contents.cy)
+            self.__lastDialogPos = (p_wp.contents.x, p_wp.contents.y)
+        return False
+
+    def enableMessageStatistics(self, state=True):
+        '''
+        Starts or stops counting the messages the dialog procedure receives and the time their handlers take.
+
+        Args:
+            state (bool): True starts counting from scratch, False stops it.
+
+        Returns:
+            None
+        '''
+        self.messageStatistics = {} if state else None
+
+    def messageStatisticsReport(self):
+        '''
+        Formats the collected message statistics, the most time consuming message first.
+
+        Args:
+            None.
+
+        Returns:
+            str: One line per message with its name, count and the total time spent in its handler.
+        '''
+        lines = []
+        for msg, (count, seconds) in sorted((self.messageStatistics or {}).items(), key=lambda x: -x[1][1]):
+            try:
+                name = WM(msg).name
+            except ValueError:
+                name = f'0x{msg:04X}'
+            lines.append(f'{name:<20}{count:>8}{seconds * 1000:>12.3f}ms')
+        return '\n'.join(lines)
+
     def show(self):
         '''
         This method displays the dialog on the screen and starts its message loop,
@@ -446,59 +584,51 @@ class Dialog:
                 self.__keep_running = False
                 DestroyWindow(self.hwnd)
 
-    def __align_struct(self, tmp):
-        '''
-        Aligns the template structure to the size of a DWORD.
-
-        Args:
-            tmp: The template structure to be aligned.
-
-        Returns:
-            The aligned template structure.
-        '''
-        dword_size = ctypes.sizeof(wintypes.DWORD)
-        align = dword_size - len(tmp) % dword_size
-        if align < dword_size:
-            tmp += bytearray(align)
-        return tmp
-
     def __create_dialog(self):
         """
         Create the dialog window and its controls.
 
         This method constructs the dialog window by creating its controls and setting up event handling.
-        It iterates over the controlList, assigns unique IDs to the controls, creates control structures,
-        aligns them to match memory requirements, and registers event handlers for commands and notifications.
+        It iterates over the controlList, assigns unique IDs to the controls, collects their template values
+        and registers event handlers for commands and notifications.
 
         Args:
             None.
 
         Returns:
-            None.
+            bytes: The dialog template, see dialog_template.build_template.
 
         Raises:
             TypeError: If a control in controlList is not an instance of Control.
 
         Notes:
             - This method is called internally during the creation of the Dialog object.
-            - It utilizes the __align_struct method to ensure proper memory alignment.
+            - The template is packed into a single buffer and reused while the definition is unchanged.
+            - The template and the registered commands and notifications are kept for the next show,
+              they are only rebuilt if the dialog, its controls or their handlers have changed.
             - The created dialog is displayed using the DialogBoxIndirectParam function.
         """
         # Instead of using dir(self), which always returns a sorted list,
         # __dict__.keys is used to maintain the order of control creation.
-        self.controlList.clear()
-        for item in self.__dict__.keys():
-            obj = getattr(self, item)
-            if isinstance(obj, Control):
-                self.controlList.append(obj)
+        controls = [obj for obj in self.__dict__.values() if isinstance(obj, Control)]
+        for i, control in enumerate(controls):
+            control.id = self.controlStartId + i
 
-        controls = bytearray()
-        for i, control in enumerate(self.controlList):
+        # Showing the dialog again only needs new hwnds, which are set during WM_INITDIALOG,
+        # as long as neither the dialog, its controls nor their handlers have been changed.
+        definition = (type(self), self.__template(), self.onIdOk,
+                      tuple((id(control), control.template(),
+                             tuple(control.registeredCommands.items()),
+                             tuple(control.registeredNotifications.items()))
+                            for control in controls))
+        if definition == self.__definition:
+            return self.__dialogTemplate
+
+        self.controlList.clear()
+        self.controlList.extend(controls)
+        for control in self.controlList:
             if not isinstance(control, Control):
                 raise TypeError(f"{control} is not an instance of Control")
-            control.id = self.controlStartId + i
-            control_struct = control.create()
-            controls += self.__align_struct(control_struct)
             for event, func in control.registeredCommands.items():
                 # mimicking what MS does internally allows us to directly use wparam in __default_dialog_proc
                 self.registeredCommands[(event << 16) + control.id] = func
@@ -507,18 +637,22 @@ class Dialog:
                 self.registeredCommands[1] = self.onIdOk
 
             for event, func in control.registeredNotifications.items():
-                self.registeredNotifications[(event, control.id)] = func
+                # NMHDR.code is unsigned, while e.g. LVN and NM codes are defined as negative numbers
+                self.registeredNotifications[(event & 0xFFFFFFFF, control.id)] = func
+
+        if self.dialog_proc is None:
+            self.dialog_proc = DIALOGPROC(self.__default_dialog_proc)
+
+        self.__definition = definition
+        control_templates = tuple(template for _, template, _, _ in definition[3])
+        self.__dialogTemplate = build_template(definition[1], control_templates)
+        return self.__dialogTemplate
 
-        self.dialog_proc = DIALOGPROC(self.__default_dialog_proc)
 
-        self.dialog_items = len(self.controlList)
-        dlg_window = self.__create_dialog_window()
-        dlg_window = self.__align_struct(dlg_window)
-        dialog = dlg_window + controls
-        return dialog
+_collect_class_handlers(Dialog)
 
 
-def create_dialog_from_rc(rc_code):
+def create_dialog_from_rc(rc_code, name=None):
     '''
     Create a dialog object from resource code.
 
@@ -528,14 +662,18 @@ def create_dialog_from_rc(rc_code):
 
     Args:
         rc_code (str): The resource code defining the dialog and its controls.
+        name (str, optional): The name or ID of the dialog if the code contains several, the first one if None.
 
     Returns:
         Dialog: A `Dialog` object representing the parsed dialog and its controls.
 
     Raises:
         NotImplementedError: If a requested control type is not implemented yet.
+        ValueError: If the resource code cannot be parsed or does not contain the requested dialog.
 
-    Note that currently only resource code generated by ResourceHacker is supported.
+    Parsed resource code is cached, creating a dialog from the same code again does not parse it again.
+    A control is named after the comment following it, e.g. // listview, after the symbol used
+    as its ID if that is not defined in the code, or after its class and ID.
     '''
     control_type_map = {
         'button': Button,
@@ -544,6 +682,7 @@ def create_dialog_from_rc(rc_code):
         'combobox': ComboBox,
         'comboboxex32': ComboBoxEx,
         'syslistview32': ListView,
+        'syslistview32_ownerdata': VirtualListView,
         'listbox': ListBox,
         'msctls_progress32': ProgressBar,
         'msctls_statusbar32': StatusBar,
@@ -551,7 +690,7 @@ def create_dialog_from_rc(rc_code):
         'systreeview32': TreeView,
     }
 
-    _dialog = parser(rc_code)
+    _dialog = parser(rc_code, name)
     dialog = Dialog(title=_dialog.title,
                     size=_dialog.size,
                     position=_dialog.position,
@@ -564,7 +703,10 @@ def create_dialog_from_rc(rc_code):
                     charset=_dialog.font.charset)
 
     for rc in _dialog.controls:
-        base_instance = control_type_map.get(rc.control_class, None)
+        control_class = rc.control_class
+        if control_class == 'syslistview32' and rc.style & LVS.OWNERDATA:
+            control_class = 'syslistview32_ownerdata'
+        base_instance = control_type_map.get(control_class, None)
         if base_instance is None:
             raise NotImplementedError(f'The requested control "{rc.control_class}" is not implemented yet!')
 
@@ -576,7 +718,7 @@ def create_dialog_from_rc(rc_code):
             style=rc.style,
             exStyle=rc.exStyle,
         )
-        control_name =  rc.name if rc.name else f"{rc.control_class}_{rc.id_}"
+        control_name = rc.name or rc.symbol or f"{rc.control_class}_{rc.id_}"
         setattr(dialog, control_name, control_instance)
 
     return dialog
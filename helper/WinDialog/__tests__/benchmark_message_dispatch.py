@@ -0,0 +1,95 @@
+from Npp import console
+console.show()
+import time
+import WinDialog
+from WinDialog import Dialog, registerHotkey, registerMessage
+from WinDialog.win_helper import WinMessages as WM
+
+# Sends messages straight to the dialog procedure, no window gets created.
+# The user32 functions used while handling them are replaced by stubs.
+
+MESSAGES = 100000
+FAKE_HWND = 0x1234
+
+stubs = {
+    'GetDlgItem': lambda hwnd, id_: id_,
+    'RegisterHotKey': lambda hwnd, id_, mod, key: True,
+    'UnregisterHotKey': lambda hwnd, id_: True,
+    'EndDialog': lambda hwnd, result: True,
+}
+
+
+class SizedDialog(Dialog):
+    def __init__(self, title='Dispatch'):
+        super().__init__(title)
+        self.center = False
+        self.sizes = 0
+        self.hotkeys = 0
+        self.init_hwnd = None
+        self.show()
+
+    @registerMessage(WM.INITDIALOG)
+    def on_init_dialog(self, hwnd, wparam, lparam):
+        # runs after the handler of Dialog, which has assigned the window handle already
+        self.init_hwnd = self.hwnd
+        return False
+
+    @registerMessage(WM.SIZE)
+    def on_size(self, hwnd, wparam, lparam):
+        self.sizes += 1
+        return True
+
+    @registerHotkey('CTRL+Q')
+    def on_ctrl_q(self):
+        self.hotkeys += 1
+
+    def show(self):
+        # only builds the dialog, the messages are sent below
+        pass
+
+
+class ResizedDialog(SizedDialog):
+    @registerMessage(WM.SIZE)
+    def on_size(self, hwnd, wparam, lparam):
+        # replaces the handler of SizedDialog, as it has the same name
+        self.sizes += 10
+        return True
+
+
+originals = {name: getattr(WinDialog, name) for name in stubs}
+try:
+    for name, stub in stubs.items():
+        setattr(WinDialog, name, stub)
+
+    dlg = SizedDialog()
+    assert WM.SIZE in SizedDialog._messageHandlers and WM.SIZE not in Dialog._messageHandlers
+    assert len(SizedDialog._messageHandlers[WM.INITDIALOG]) == 2
+    assert len(ResizedDialog._messageHandlers[WM.SIZE]) == 1
+    assert [name for name, _ in SizedDialog._hotkeyMethods] == ['on_ctrl_q']
+
+    proc = dlg._Dialog__default_dialog_proc
+    proc(FAKE_HWND, WM.INITDIALOG, 0, 0)
+    hotkey_lparam = (ord('Q') << 16) + 0x2
+    assert list(dlg.registeredHotkeys) == [(0, hotkey_lparam)]
+    assert dlg.hwnd == dlg.init_hwnd == FAKE_HWND
+
+    resized = ResizedDialog()
+    resized._Dialog__default_dialog_proc(FAKE_HWND, WM.SIZE, 0, 0)
+    assert resized.sizes == 10
+
+    for statistics in (False, True):
+        dlg.enableMessageStatistics(statistics)
+        started = time.perf_counter()
+        for i in range(MESSAGES):
+            proc(FAKE_HWND, WM.SIZE, 0, 0)
+            proc(FAKE_HWND, WM.PAINT, 0, 0)
+            proc(FAKE_HWND, WM.HOTKEY, 0, hotkey_lparam)
+        elapsed = (time.perf_counter() - started) / (3 * MESSAGES) * 1e6
+        print(f'{3 * MESSAGES} messages, statistics {"on" if statistics else "off"}: {elapsed:.2f}µs per message')
+
+    assert dlg.sizes == dlg.hotkeys == 2 * MESSAGES
+    assert dlg.messageStatistics[WM.SIZE][0] == MESSAGES
+    print(dlg.messageStatisticsReport())
+finally:
+    for name, original in originals.items():
+        setattr(WinDialog, name, original)
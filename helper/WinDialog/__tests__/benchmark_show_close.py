@@ -0,0 +1,69 @@
+from Npp import console
+console.show()
+import time
+import WinDialog
+from WinDialog import create_dialog_from_rc
+from WinDialog.win_helper import WinMessages as WM
+
+# Measures show-close cycles without any window being created.
+# The user32 functions used by Dialog.show are replaced by stubs,
+# the stubbed DialogBoxIndirectParam sends WM_INITDIALOG and WM_CLOSE to the dialog procedure.
+
+CYCLES = 200
+FAKE_HWND = 0x1234
+
+def fake_dialog_box(hinstance, template, parent, dialog_proc, param):
+    dialog_proc(FAKE_HWND, WM.INITDIALOG, 0, 0)
+    dialog_proc(FAKE_HWND, WM.CLOSE, 0, 0)
+    return 0
+
+stubs = {
+    'DialogBoxIndirectParam': fake_dialog_box,
+    'GetDlgItem': lambda hwnd, id_: id_,
+    'EndDialog': lambda hwnd, result: True,
+    'GetModuleHandle': lambda name: 0,
+    'RegisterHotKey': lambda hwnd, id_, mod, key: True,
+    'UnregisterHotKey': lambda hwnd, id_: True,
+}
+
+controls = '\n'.join(f'CONTROL "{i:03}", {i}, BUTTON, BS_PUSHBUTTON | WS_CHILD | WS_VISIBLE | WS_TABSTOP, '
+                     f'{5 + 20 * (i % 20)}, {5 + 15 * (i // 20)}, 17, 11'
+                     for i in range(400))
+rc = f'''
+1 DIALOGEX 0, 0, 405, 305
+STYLE DS_SETFONT | DS_MODALFRAME | WS_POPUP | WS_CAPTION | WS_SYSMENU
+CAPTION "Benchmark"
+LANGUAGE LANG_NEUTRAL, SUBLANG_NEUTRAL
+FONT 9, "Segoe UI"
+{{
+{controls}
+}}
+'''
+
+originals = {name: getattr(WinDialog, name) for name in stubs}
+try:
+    for name, stub in stubs.items():
+        setattr(WinDialog, name, stub)
+
+    dlg = create_dialog_from_rc(rc_code=rc)
+    for i in range(400):
+        getattr(dlg, f'button_{i}').onClick = dlg.terminate
+
+    started = time.perf_counter()
+    for i in range(CYCLES):
+        # a changed title is a changed definition, everything gets rebuilt
+        dlg.title = f'Benchmark {i}'
+        dlg.show()
+    changed = (time.perf_counter() - started) / CYCLES * 1000
+
+    started = time.perf_counter()
+    for i in range(CYCLES):
+        dlg.show()
+    unchanged = (time.perf_counter() - started) / CYCLES * 1000
+
+    assert all(control.hwnd == control.id for control in dlg.controlList)
+    print(f'400 controls, {CYCLES} show-close cycles each: '
+          f'changed dialog {changed:.2f}ms, unchanged dialog {unchanged:.2f}ms per cycle')
+finally:
+    for name, original in originals.items():
+        setattr(WinDialog, name, original)
@@ -0,0 +1,100 @@
+from Npp import console
+console.show()
+import ctypes
+import random
+import time
+from WinDialog import Dialog, TextBox, VirtualListView, TableModel, Column
+from WinDialog.win_helper import WinMessages as WM
+from WinDialog.controls.listview import LVN, LVIF, LVIS, LVDISPINFO, NMLISTVIEW
+
+# Part one sorts 500000 rows by synthetic LVN_COLUMNCLICK notifications sent to the dialog procedure,
+# no window gets created and the list view never calls back into Python for a comparison.
+# Part two shows them, clicking a header sorts, typing into the edit control filters.
+
+ROWS = 500000
+FAKE_HWND = 0x1234
+words = ['alpha', 'beta', 'gamma', 'delta', 'epsilon', 'zeta', 'eta', 'theta']
+random.seed(1)
+
+
+class TableDialog(Dialog):
+    def __init__(self, title='TableModel'):
+        super().__init__(title)
+        self.size = (250, 215)
+        self.filter = TextBox('', (240, 14), (5, 5))
+        self.filter.onChange = self.on_filter_change
+        self.listview = VirtualListView('', (240, 190), (5, 22))
+        self.listview.columns = ['Name', 'Size', 'Ratio']
+        self.listview.onColumnClick = self.on_column_click
+        self.model = TableModel([Column('Name'), Column('Size', int), Column('Ratio', float, '{:.3f}'.format)],
+                                ((f'{random.choice(words)} {i}', random.randrange(1000000), random.random())
+                                 for i in range(ROWS)))
+        self.listview.dataSource = self.model
+
+    def initialize(self):
+        self.listview.addColumns()
+        self.listview.insertItems()
+
+    def on_column_click(self, nmlistview):
+        column = nmlistview.iSubItem
+        reverse = self.model.sortColumn == column and not self.model.sortReverse
+        self.listview.updateView(lambda: self.model.sort(column, reverse))
+
+    def on_filter_change(self):
+        text = self.filter.getText()
+        self.listview.updateView(lambda: self.model.setFilter(text))
+
+
+def notify(dlg, struct, code):
+    struct.hdr.hwndFrom = FAKE_HWND
+    struct.hdr.idFrom = dlg.listview.id
+    struct.hdr.code = code
+    dlg._Dialog__default_dialog_proc(FAKE_HWND, WM.NOTIFY, dlg.listview.id, ctypes.addressof(struct))
+
+
+def get_text(dlg, row, column):
+    buffer = ctypes.create_unicode_buffer(260)
+    dispinfo = LVDISPINFO()
+    dispinfo.item.mask = LVIF.TEXT
+    dispinfo.item.iItem = row
+    dispinfo.item.iSubItem = column
+    ctypes.c_void_p.from_buffer(dispinfo.item, type(dispinfo.item).pszText.offset).value = ctypes.addressof(buffer)
+    dispinfo.item.cchTextMax = 260
+    notify(dlg, dispinfo, LVN.GETDISPINFO)
+    return buffer.value
+
+
+dlg = TableDialog()
+dlg._Dialog__create_dialog()
+model = dlg.model
+
+# select the row with id 42
+changed = NMLISTVIEW()
+changed.iItem = 42
+changed.uChanged = LVIF.STATE
+changed.uNewState = LVIS.SELECTED
+notify(dlg, changed, LVN.ITEMCHANGED)
+
+click = NMLISTVIEW()
+for column, title in ((1, 'size'), (1, 'size descending'), (0, 'name'), (2, 'ratio')):
+    click.iSubItem = column
+    started = time.perf_counter()
+    notify(dlg, click, LVN.COLUMNCLICK)
+    print(f'sorted {ROWS} rows by {title} in {(time.perf_counter() - started) * 1000:.0f}ms')
+    values = [model.row(model.rowId(i))[column] for i in range(len(model))]
+    if column == 0:
+        values = [value.casefold() for value in values]
+    assert values == sorted(values, reverse=model.sortReverse)
+    assert dlg.listview.getSelectedRows() == [model.viewIndex(42)]
+    assert get_text(dlg, model.viewIndex(42), 0) == model.row(42)[0]
+
+for text in ('eta', 'eta 4', 'eta 42'):
+    started = time.perf_counter()
+    dlg.listview.updateView(lambda: model.setFilter(text))
+    print(f'filtered "{text}" in {(time.perf_counter() - started) * 1000:.0f}ms, {len(model)} rows')
+    assert all(text in get_text(dlg, i, 0) for i in range(min(len(model), 100)))
+print('table model is ok')
+
+dlg = TableDialog()
+dlg.center = True
+dlg.show()
@@ -0,0 +1,131 @@
+from Npp import console
+console.show()
+import ctypes
+import time
+import WinDialog
+from WinDialog import Dialog, VirtualListView, ListViewDataSource
+from WinDialog.win_helper import WinMessages as WM, NM
+from WinDialog.controls.listview import (
+    LVN, LVIF, LVIS, LVFI, LVDISPINFO, NMLVCACHEHINT, NMLVFINDITEM, NMLISTVIEW, NMLVODSTATECHANGE
+)
+
+# Part one drives the virtual list view with synthetic notifications sent to the dialog procedure,
+# no window gets created. SetWindowLong, which returns the result of a notification, is replaced by a stub.
+# Part two shows a dialog with 100000 rows.
+
+ROWS = 100000
+FAKE_HWND = 0x1234
+results = []
+
+
+class CountingSource(ListViewDataSource):
+    def __init__(self, rows):
+        super().__init__(rows)
+        self.fetched = 0
+
+    def getRow(self, index):
+        self.fetched += 1
+        return super().getRow(index)
+
+    def getRows(self, first, last):
+        self.fetched += last - first + 1
+        return super().getRows(first, last)
+
+
+class VirtualDialog(Dialog):
+    def __init__(self, title='Virtual ListView'):
+        super().__init__(title)
+        self.size = (250, 200)
+        self.listview = VirtualListView('', (240, 190), (5, 5))
+        self.listview.columns = ['Name', 'Value', 'Square']
+        self.listview.dataSource = CountingSource([(f'name {i}', i, i * i) for i in range(ROWS)])
+
+    def initialize(self):
+        self.listview.addColumns()
+        self.listview.insertItems()
+
+
+def notify(dlg, struct, code):
+    struct.hdr.hwndFrom = FAKE_HWND
+    struct.hdr.idFrom = dlg.listview.id
+    struct.hdr.code = code
+    del results[:]
+    dlg._Dialog__default_dialog_proc(FAKE_HWND, WM.NOTIFY, dlg.listview.id, ctypes.addressof(struct))
+    return results[0] if results else None
+
+
+def get_text(dlg, row, column, size=260):
+    buffer = ctypes.create_unicode_buffer(size)
+    dispinfo = LVDISPINFO()
+    dispinfo.item.mask = LVIF.TEXT
+    dispinfo.item.iItem = row
+    dispinfo.item.iSubItem = column
+    ctypes.c_void_p.from_buffer(dispinfo.item, type(dispinfo.item).pszText.offset).value = ctypes.addressof(buffer)
+    dispinfo.item.cchTextMax = size
+    notify(dlg, dispinfo, LVN.GETDISPINFO)
+    return buffer.value
+
+
+original = WinDialog.SetWindowLong
+try:
+    WinDialog.SetWindowLong = lambda hwnd, index, value: results.append(value)
+
+    dlg = VirtualDialog()
+    dlg._Dialog__create_dialog()
+    source = dlg.listview.dataSource
+
+    assert get_text(dlg, 5, 0) == 'name 5'
+    assert get_text(dlg, 5, 2) == '25'
+    assert get_text(dlg, 5, 3) == ''
+    assert get_text(dlg, 12345, 1, size=3) == '12'
+    # the columns of one row are served by a single request to the data source
+    assert source.fetched == 2, source.fetched
+
+    hint = NMLVCACHEHINT()
+    hint.iFrom, hint.iTo = 1000, 1049
+    notify(dlg, hint, LVN.ODCACHEHINT)
+    fetched = source.fetched
+    assert [get_text(dlg, i, 0) for i in range(1000, 1050)] == [f'name {i}' for i in range(1000, 1050)]
+    assert source.fetched == fetched, 'cached rows were fetched again'
+
+    finditem = NMLVFINDITEM()
+    text = ctypes.c_wchar_p('NAME 9999')
+    finditem.lvfi.psz = text
+    finditem.lvfi.flags = LVFI.STRING | LVFI.PARTIAL | LVFI.WRAP
+    finditem.iStart = 50000
+    assert notify(dlg, finditem, LVN.ODFINDITEM) == 99990
+    finditem.lvfi.flags = LVFI.STRING
+    assert notify(dlg, finditem, LVN.ODFINDITEM) == -1
+    finditem.iStart = 0
+    assert notify(dlg, finditem, LVN.ODFINDITEM) == 9999
+
+    changed = NMLISTVIEW()
+    changed.iItem = 7
+    changed.uChanged = LVIF.STATE
+    changed.uNewState = LVIS.SELECTED | LVIS.FOCUSED
+    notify(dlg, changed, LVN.ITEMCHANGED)
+    statechange = NMLVODSTATECHANGE()
+    statechange.iFrom, statechange.iTo = 10, 14
+    statechange.uNewState = LVIS.SELECTED
+    notify(dlg, statechange, LVN.ODSTATECHANGED)
+    assert dlg.listview.getSelectedRows() == [7, 10, 11, 12, 13, 14]
+    changed.iItem = 12
+    changed.uOldState, changed.uNewState = LVIS.SELECTED, 0
+    notify(dlg, changed, LVN.ITEMCHANGED)
+    assert dlg.listview.getSelectedRows() == [7, 10, 11, 13, 14]
+    changed.iItem = -1
+    changed.uOldState, changed.uNewState = 0, LVIS.SELECTED
+    notify(dlg, changed, LVN.ITEMCHANGED)
+    assert len(dlg.listview.getSelectedRows()) == ROWS
+
+    started = time.perf_counter()
+    for i in range(0, 10000):
+        get_text(dlg, i, i % 3)
+    elapsed = (time.perf_counter() - started) / 10000 * 1e6
+    print(f'virtual listview is ok, {elapsed:.1f}µs per synthetic LVN_GETDISPINFO')
+finally:
+    WinDialog.SetWindowLong = original
+
+dlg = VirtualDialog()
+dlg.center = True
+dlg.show()
@@ -1,5 +1,4 @@
-from ctypes import create_unicode_buffer
-from ctypes.wintypes import DWORD, WORD, SHORT
+from ..dialog_template import pack_control
 from ..win_helper import (
     WindowStyle as WS,
     EnableWindow, IsWindowEnabled,
@@ -37,6 +36,9 @@ class Control:
         create(self) -> bytearray:
             Create the control template structure.
 
+        template(self) -> tuple:
+            Returns the values the control template structure is made of.
+
         enable(self, state: bool) -> None:
             Enables or disables a control.
 
@@ -71,21 +73,28 @@ class Control:
             bytearray: The byte array representing the control template structure.
 
         '''
+        self._array = pack_control(self.template())
+        return self._array
+
+    def template(self) -> tuple:
+        '''
+        Returns the values of the control template structure.
+
+        The dialog packs these of all its controls into one template,
+        an unchanged tuple means an unchanged control template.
+
+        Args:
+            None.
+
+        Returns:
+            tuple: (exStyle, style, x, y, cx, cy, id, windowClass, title)
+        '''
         # DO NOT CHANGE ORDER !!
         # https://learn.microsoft.com/en-us/windows/win32/dlgbox/dlgitemtemplateex
-        self._array = bytearray()
-        self._array += DWORD(0)  # helpID
-        self._array += DWORD(self.exStyle)
-        self._array += DWORD(self.style)
-        self._array += SHORT(self.position[0])  # x
-        self._array += SHORT(self.position[1])  # y
-        self._array += SHORT(self.size[0])  # cx
-        self._array += SHORT(self.size[1])  # cy
-        self._array += DWORD(self.id)
-        self._array += create_unicode_buffer(self.windowClass)
-        self._array += create_unicode_buffer(self.title)
-        self._array += WORD(0)  # extraCount
-        return self._array
+        return (self.exStyle, self.style,
+                self.position[0], self.position[1],
+                self.size[0], self.size[1],
+                self.id, self.windowClass, self.title)
 
     def enable(self, state: bool):
         '''
@@ -12,6 +12,7 @@ Example Usage:
 For detailed documentation, refer to their respective docstrings.
 """
 from dataclasses import dataclass
+from itertools import chain
 from .__control_template import Control
 from enum import IntEnum
 from ..win_helper import (
@@ -595,6 +596,7 @@ class NMLISTVIEW(ctypes.Structure):
         ('ptAction', POINT),
         ('lParam', LPARAM),
     ]
+LPNMLISTVIEW = ctypes.POINTER(NMLISTVIEW)
 
 # NMITEMACTIVATE is used instead of NMLISTVIEW in IE >= 0x400
 # therefore all the fields are the same except for extra uKeyFlags
@@ -642,6 +644,7 @@ class NMLVCACHEHINT(ctypes.Structure):
         ('iFrom', INT),
         ('iTo', INT),
     ]
+LPNMLVCACHEHINT = ctypes.POINTER(NMLVCACHEHINT)
 
 
 class NMLVFINDITEM(ctypes.Structure):
@@ -650,6 +653,7 @@ class NMLVFINDITEM(ctypes.Structure):
         ('iStart', INT),
         ('lvfi', LVFINDINFO),
     ]
+LPNMLVFINDITEM = ctypes.POINTER(NMLVFINDITEM)
 
 class NMLVODSTATECHANGE(ctypes.Structure):
     _fields_ = [
@@ -659,12 +663,14 @@ class NMLVODSTATECHANGE(ctypes.Structure):
         ('uNewState', UINT),
         ('uOldState', UINT),
     ]
+LPNMLVODSTATECHANGE = ctypes.POINTER(NMLVODSTATECHANGE)
 
 class LVDISPINFO(ctypes.Structure):
     _fields_ = [
         ('hdr', NMHDR),
         ('item', LVITEM),
     ]
+LPLVDISPINFO = ctypes.POINTER(LVDISPINFO)
 
 class LVKEYDOWN(ctypes.Structure):
     _pack_ = 1
@@ -1060,23 +1066,23 @@ class ListView(Control):
     onHover = WM_NotifyDelegator(NM.HOVER, None)
     onReleasedCapture = WM_NotifyDelegator(NM.RELEASEDCAPTURE, None)
 
-    onItemChanging = WM_NotifyDelegator(LVN.ITEMCHANGING, None)
-    onItemChanged = WM_NotifyDelegator(LVN.ITEMCHANGED, None)
+    onItemChanging = WM_NotifyDelegator(LVN.ITEMCHANGING, LPNMLISTVIEW)
+    onItemChanged = WM_NotifyDelegator(LVN.ITEMCHANGED, LPNMLISTVIEW)
     onInsertItem = WM_NotifyDelegator(LVN.INSERTITEM, None)
     onDeleteItem = WM_NotifyDelegator(LVN.DELETEITEM, None)
     onDeleteAllItems = WM_NotifyDelegator(LVN.DELETEALLITEMS, None)
     onBeginLabelEdit = WM_NotifyDelegator(LVN.BEGINLABELEDIT, None)
     onEndLabelEdit = WM_NotifyDelegator(LVN.ENDLABELEDIT, None)
-    onColumnClick = WM_NotifyDelegator(LVN.COLUMNCLICK, None)
+    onColumnClick = WM_NotifyDelegator(LVN.COLUMNCLICK, LPNMLISTVIEW)
     onBeginDrag = WM_NotifyDelegator(LVN.BEGINDRAG, None)
     onBeginrDrag = WM_NotifyDelegator(LVN.BEGINRDRAG, None)
-    onOdCacheHint = WM_NotifyDelegator(LVN.ODCACHEHINT, None)
+    onOdCacheHint = WM_NotifyDelegator(LVN.ODCACHEHINT, LPNMLVCACHEHINT)
     onItemActivate = WM_NotifyDelegator(LVN.ITEMACTIVATE, None)
-    onOdStateChanged = WM_NotifyDelegator(LVN.ODSTATECHANGED, None)
-    onOdFindItem = WM_NotifyDelegator(LVN.ODFINDITEM, None)
+    onOdStateChanged = WM_NotifyDelegator(LVN.ODSTATECHANGED, LPNMLVODSTATECHANGE)
+    onOdFindItem = WM_NotifyDelegator(LVN.ODFINDITEM, LPNMLVFINDITEM)
     onHotTrack = WM_NotifyDelegator(LVN.HOTTRACK, None)
-    onGetDispInfo = WM_NotifyDelegator(LVN.GETDISPINFO, None)
-    onSetDispInfo = WM_NotifyDelegator(LVN.SETDISPINFO, None)
+    onGetDispInfo = WM_NotifyDelegator(LVN.GETDISPINFO, LPLVDISPINFO)
+    onSetDispInfo = WM_NotifyDelegator(LVN.SETDISPINFO, LPLVDISPINFO)
     onKeyDown = WM_NotifyDelegator(LVN.KEYDOWN, None)
     onMarqueeBegin = WM_NotifyDelegator(LVN.MARQUEEBEGIN, None)
     onGetInfoTip = WM_NotifyDelegator(LVN.GETINFOTIP, None)
@@ -1134,7 +1140,7 @@ class ListView(Control):
                 except IndexError:
                     pass
 
-        for i in range(len(self.rows)):
+        for i in range(self.column_count):
             SendMessage(self.hwnd, LVM.SETCOLUMNWIDTH, i, LVSCW.AUTOSIZE)
 
 
@@ -1313,9 +1319,11 @@ class ListView(Control):
     def update(self, i):
         return SendMessage(self.hwnd, LVM.UPDATE, i, 0)  # BOOL
 
-    # def setItemState(i, data, mask):
-        # LV_ITEM _macro_lvi;  _macro_lvi.stateMask = (mask);  _macro_lvi.state = (data)
-        # SendMessage(self.hwnd, LVM.SETITEMSTATE, i, (LPARAM)(LV_ITEM *)&_macro_lvi)
+    def setItemState(self, i, data, mask):
+        lv_item = LVITEM()
+        lv_item.stateMask = mask
+        lv_item.state = data
+        return SendMessage(self.hwnd, LVM.SETITEMSTATE, i, ctypes.addressof(lv_item))  # BOOL
 
     # def setCheckState(i, fCheck):
         # ListView_SetItemState(i, INDEXTOSTATEIMAGEMASK((fCheck)?2:1), LVIS_STATEIMAGEMASK)
@@ -1598,3 +1606,252 @@ class ListView(Control):
     def getBkImage(self, plvbki):
         return SendMessage(self.hwnd, LVM.GETBKIMAGE, 0, plvbki)  # BOOL
 
+
+class ListViewDataSource:
+    """
+    Serves the rows of a VirtualListView.
+
+    The default implementation wraps a sequence of rows, each row being a sequence of cell values.
+    Data sources which, for example, read from a file or a database override the methods.
+
+    Methods:
+        __len__() -> int:
+            The number of rows.
+
+        getRow(index) -> Sequence:
+            The cell values of a row, values which are not strings are shown by their str().
+
+        getRows(first, last) -> List[Sequence]:
+            The rows first to last, both inclusive, called when the list view announces which rows it is about to show.
+
+        find(text, start, partial, wrap) -> int:
+            The index of the first row whose first column starts with, or is, text, -1 if there is none.
+    """
+    def __init__(self, rows=None):
+        self.rows = [] if rows is None else rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def getRow(self, index):
+        return self.rows[index]
+
+    def getRows(self, first, last):
+        return self.rows[first:last + 1]
+
+    def find(self, text, start, partial=True, wrap=True):
+        """
+        Finds a row by the text of its first column, ignoring the case like the list view does.
+
+        Args:
+            text (str): The text to search for.
+            start (int): The index of the first row to look at.
+            partial (bool): True finds rows starting with text, False rows matching it.
+            wrap (bool): Continues at the first row if no row from start on matches.
+
+        Returns:
+            int: The index of the row or -1.
+        """
+        text = text.casefold()
+        count = len(self)
+        start = min(max(start, 0), count)
+        indexes = range(start, count)
+        if wrap:
+            indexes = chain(indexes, range(start))
+        for index in indexes:
+            row = self.getRow(index)
+            value = row[0] if row else ''
+            value = (value if isinstance(value, str) else str(value)).casefold()
+            if value.startswith(text) if partial else value == text:
+                return index
+        return -1
+
+
+def _copyItemText(item, text):
+    # copies text into the buffer the list view provides, truncated to its size
+    if item.cchTextMax <= 0:
+        return
+    address = ctypes.c_void_p.from_buffer(item, LVITEM.pszText.offset).value
+    if not address:
+        return
+    buffer = ctypes.create_unicode_buffer(text)
+    count = min(len(buffer) - 1, item.cchTextMax - 1)
+    char_size = ctypes.sizeof(ctypes.c_wchar)
+    ctypes.memmove(address, buffer, count * char_size)
+    ctypes.memset(address + count * char_size, 0, char_size)
+
+
+@dataclass
+class VirtualListView(ListView):
+    """
+    A list view control in virtual mode (LVS.OWNERDATA).
+
+    No row is inserted into the control, only the number of rows is set,
+    the control asks for the text of the visible cells by LVN.GETDISPINFO notifications,
+    which are served from a data source. The rows the control announces by LVN.ODCACHEHINT
+    are fetched at once and kept until the control announces other rows.
+    Finding rows by typing and the selection are handled in Python.
+
+    Attributes:
+        dataSource (ListViewDataSource): Serves the rows, e.g. a TableModel, if it is not set, the rows attribute is used.
+        selection (set): The indexes of the selected rows.
+
+    Methods:
+        setDataSource(dataSource) -> None:
+            Shows the rows of another data source.
+
+        refresh(keepScrollPosition: bool) -> None:
+            Sets the number of rows again and redraws them, e.g. after the data source has changed.
+
+        getSelectedRows() -> List[int]:
+            The indexes of the selected rows.
+
+        updateView(change: Callable) -> None:
+            Sorts or filters a data source with row ids, e.g. a TableModel, keeping the selected rows selected.
+
+    Note:
+        The notifications GETDISPINFO, ODCACHEHINT, ODFINDITEM, ITEMCHANGED and ODSTATECHANGED
+        are handled by the control itself, assigning other handlers to them disables virtual mode.
+    """
+    style: int = ListView.style | LVS.OWNERDATA
+    dataSource: ListViewDataSource = None
+
+    def __post_init__(self):
+        self.selection = set()
+        self.__cacheFirst = 0
+        self.__cacheRows = []
+        self.onGetDispInfo = self._onGetDispInfo
+        self.onOdCacheHint = self._onOdCacheHint
+        self.onOdFindItem = self._onOdFindItem
+        self.onItemChanged = self._onItemChanged
+        self.onOdStateChanged = self._onOdStateChanged
+
+    def addColumns(self):
+        # state images, e.g. checkboxes, would have to be served by the data source too
+        self.column_count = len(self.columns)
+        for i in range(self.column_count):
+            self.insertColumn(i, self.columns[i])
+
+    def insertItems(self):
+        if self.dataSource is None:
+            self.dataSource = ListViewDataSource(getattr(self, 'rows', None))
+        self.refresh(False)
+        for i in range(self.column_count):
+            SendMessage(self.hwnd, LVM.SETCOLUMNWIDTH, i, LVSCW.AUTOSIZEUSEHEADER)
+
+    def setDataSource(self, dataSource):
+        """
+        Shows the rows of another data source, the selection is cleared.
+
+        Args:
+            dataSource (ListViewDataSource): The new data source.
+
+        Returns:
+            None
+        """
+        self.dataSource = dataSource
+        self.selection.clear()
+        if self.hwnd:
+            self.refresh(False)
+
+    def refresh(self, keepScrollPosition=True):
+        """
+        Sets the number of rows and redraws them, the cached rows are discarded.
+
+        Args:
+            keepScrollPosition (bool): False scrolls to the first row.
+
+        Returns:
+            None
+        """
+        self.__cacheFirst = 0
+        self.__cacheRows = []
+        count = len(self.dataSource) if self.dataSource is not None else 0
+        self.selection.intersection_update(range(count))
+        self.setItemCountEx(count, LVSICF.NOSCROLL if keepScrollPosition else 0)
+
+    def clear(self):
+        self.setDataSource(ListViewDataSource())
+
+    def updateView(self, change):
+        """
+        Changes the rows of a data source which maps row indexes to row ids, like a TableModel does,
+        and shows them, the selected rows stay selected if they are still shown.
+
+        Args:
+            change (Callable): Changes the data source, e.g. lambda: model.sort('name').
+
+        Returns:
+            None
+        """
+        row_ids = [self.dataSource.rowId(index) for index in sorted(self.selection)]
+        change()
+        self.refresh()
+        selection = [index for index in map(self.dataSource.viewIndex, row_ids) if index >= 0]
+        if self.hwnd:
+            self.setItemState(-1, 0, LVIS.SELECTED)
+            for index in selection:
+                self.setItemState(index, LVIS.SELECTED, LVIS.SELECTED)
+        self.selection = set(selection)
+
+    def getSelectedRows(self):
+        return sorted(self.selection)
+
+    def _getRow(self, index):
+        offset = index - self.__cacheFirst
+        if 0 <= offset < len(self.__cacheRows):
+            return self.__cacheRows[offset]
+        # the row of the last request, the control asks for every column of a row one after another
+        row = self.dataSource.getRow(index)
+        self.__cacheFirst = index
+        self.__cacheRows = [row]
+        return row
+
+    def _onGetDispInfo(self, dispinfo):
+        item = dispinfo.item
+        if not item.mask & LVIF.TEXT or self.dataSource is None:
+            return
+        try:
+            value = self._getRow(item.iItem)[item.iSubItem]
+        except IndexError:
+            value = ''
+        _copyItemText(item, value if isinstance(value, str) else str(value))
+
+    def _onOdCacheHint(self, hint):
+        first, last = hint.iFrom, hint.iTo
+        if self.dataSource is None or last < first:
+            return
+        if self.__cacheFirst <= first and last < self.__cacheFirst + len(self.__cacheRows):
+            return
+        self.__cacheRows = list(self.dataSource.getRows(first, last))
+        self.__cacheFirst = first
+
+    def _onOdFindItem(self, finditem):
+        info = finditem.lvfi
+        if self.dataSource is None or not info.flags & (LVFI.STRING | LVFI.PARTIAL) or not info.psz:
+            return -1
+        return self.dataSource.find(info.psz, finditem.iStart,
+                                    bool(info.flags & LVFI.PARTIAL), bool(info.flags & LVFI.WRAP))
+
+    def _setSelected(self, first, last, selected):
+        if selected:
+            self.selection.update(range(first, last + 1))
+        else:
+            self.selection.difference_update(range(first, last + 1))
+
+    def _onItemChanged(self, nmlistview):
+        if not nmlistview.uChanged & LVIF.STATE or not (nmlistview.uNewState ^ nmlistview.uOldState) & LVIS.SELECTED:
+            return
+        selected = bool(nmlistview.uNewState & LVIS.SELECTED)
+        if nmlistview.iItem == -1:
+            # the change applies to all rows
+            if selected and self.dataSource is not None:
+                self.selection = set(range(len(self.dataSource)))
+            else:
+                self.selection.clear()
+        else:
+            self._setSelected(nmlistview.iItem, nmlistview.iItem, selected)
+
+    def _onOdStateChanged(self, statechange):
+        if (statechange.uNewState ^ statechange.uOldState) & LVIS.SELECTED:
+            self._setSelected(statechange.iFrom, statechange.iTo, bool(statechange.uNewState & LVIS.SELECTED))
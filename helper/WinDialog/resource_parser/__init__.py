@@ -1,15 +1,32 @@
 """
 This module provides functions and classes for parsing resource script code.
 
+The code is split into tokens by a single regular expression and the DIALOG and DIALOGEX
+resources are read by a recursive descent parser. It understands quoted strings with escapes,
+line continuations, #define symbols, numeric expressions like WS_CHILD | NOT WS_VISIBLE,
+the generic control statements like LTEXT or PUSHBUTTON and files containing several resources.
+The style of a CONTROL statement is taken as written, the generic statements get WS_CHILD | WS_VISIBLE added.
+Other resources, e.g. menus or string tables, are skipped.
+
+Parsed code is cached by the hash of its content, parsing the same code again returns the cached result.
+
+Running the package, e.g. python -m WinDialog.resource_parser, checks the parser
+and measures it on a generated resource script with 5000 controls.
+
 Functions:
-    - parser(rc_code): Parses the provided RC code and returns a DialogExResource object representing the dialog resource.
+    - parse_resources(rc_code): Parses the provided RC code and returns all dialog resources it contains.
+    - parser(rc_code, name=None): Parses the provided RC code and returns a DialogExResource object representing the dialog resource.
 
 Classes:
     - DialogExResource: Represents a dialog resource extracted from an RC file.
     - FONT: Represents a font used in a dialog.
     - ControlStatement: Represents a control statement within a dialog.
 """
+import hashlib
+import re
+from collections import OrderedDict
 from dataclasses import dataclass
+from functools import lru_cache
 from ..win_helper import (
     WindowStyle as WS,
     ExtendedWindowStyles as WS_EX,
@@ -46,6 +63,76 @@ STYLE_MAP = {
     'TVS_EX': TVS_EX
 }
 
+# symbols which are usually defined by windows.h or afxres.h
+CONSTANTS = {
+    'IDOK': 1,
+    'IDCANCEL': 2,
+    'IDABORT': 3,
+    'IDRETRY': 4,
+    'IDIGNORE': 5,
+    'IDYES': 6,
+    'IDNO': 7,
+    'IDCLOSE': 8,
+    'IDHELP': 9,
+    'IDC_STATIC': -1,
+    'BS_3STATE': BS.THREE_STATE,
+    'BS_PUSHBOX': 10,
+}
+
+# statement: (class, default style, has a text)
+# https://learn.microsoft.com/en-us/windows/win32/menurc/control-control
+GENERIC_CONTROLS = {
+    'LTEXT': ('static', SS.LEFT | WS.GROUP, True),
+    'RTEXT': ('static', SS.RIGHT | WS.GROUP, True),
+    'CTEXT': ('static', SS.CENTER | WS.GROUP, True),
+    'ICON': ('static', SS.ICON, True),
+    'PUSHBUTTON': ('button', BS.PUSHBUTTON | WS.TABSTOP, True),
+    'DEFPUSHBUTTON': ('button', BS.DEFPUSHBUTTON | WS.TABSTOP, True),
+    'PUSHBOX': ('button', CONSTANTS['BS_PUSHBOX'] | WS.TABSTOP, True),
+    'CHECKBOX': ('button', BS.CHECKBOX | WS.TABSTOP, True),
+    'AUTOCHECKBOX': ('button', BS.AUTOCHECKBOX | WS.TABSTOP, True),
+    'STATE3': ('button', BS.THREE_STATE | WS.TABSTOP, True),
+    'AUTO3STATE': ('button', BS.AUTO3STATE | WS.TABSTOP, True),
+    'RADIOBUTTON': ('button', BS.RADIOBUTTON, True),
+    'AUTORADIOBUTTON': ('button', BS.AUTORADIOBUTTON, True),
+    'GROUPBOX': ('button', BS.GROUPBOX, True),
+    'EDITTEXT': ('edit', ES.LEFT | WS.BORDER | WS.TABSTOP, False),
+    'LISTBOX': ('listbox', LBS.NOTIFY | WS.BORDER, False),
+    'COMBOBOX': ('combobox', CBS.SIMPLE | WS.TABSTOP, False),
+    'SCROLLBAR': ('scrollbar', 0, False),
+}
+
+# resource compiler adds these to every generic control statement, e.g. LTEXT,
+# CONTROL statements keep their style as written, as scripts rely on e.g. hidden WS_CHILD only controls
+CONTROL_DEFAULT_STYLE = WS.CHILD | WS.VISIBLE
+
+# statements which may follow the DIALOGEX line
+DIALOG_OPTIONS = {'STYLE', 'EXSTYLE', 'CAPTION', 'FONT', 'LANGUAGE', 'MENU', 'CLASS', 'CHARACTERISTICS', 'VERSION'}
+MEMORY_FLAGS = {'DISCARDABLE', 'MOVEABLE', 'FIXED', 'PURE', 'IMPURE', 'PRELOAD', 'LOADONCALL', 'SHARED', 'NONSHARED'}
+
+_TOKEN = re.compile(r'''
+    (?P<space>\s+)
+  | (?P<comment>//[^\r\n]*)
+  | (?P<block>/\*.*?\*/)
+  | (?P<directive>\#[^\r\n]*)
+  | (?P<str>L?"(?:[^"\\]|\\.|"")*")
+  | (?P<num>(?:0[xX][0-9a-fA-F]+|\d+)[uUlL]*)
+  | (?P<name>[A-Za-z_][\w.]*)
+  | (?P<op>[-,|&+*/~(){}])
+  | (?P<error>.)
+''', re.VERBOSE | re.DOTALL)
+_ESCAPE = re.compile(r'\\(x[0-9a-fA-F]{1,4}|[0-7]{1,3}|.)|""', re.DOTALL)
+_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'a': '\a', 'b': '\b', 'f': '\f', 'v': '\v'}
+_DEFINE = re.compile(r'#\s*define\s+([A-Za-z_]\w*)(?!\()\s*(.*)')
+_BEGIN = {'{', 'BEGIN'}
+_TOP_LEVEL_STATEMENTS = {'LANGUAGE', 'VERSION', 'CHARACTERISTICS'}
+_HEADERLESS_OPTIONS = {'STYLE', 'EXSTYLE', 'CAPTION', 'FONT'}
+_END = {'}', 'END'}
+
+_CACHE_SIZE = 32
+_cache = OrderedDict()
+
+
 @dataclass
 class FONT:
     """
@@ -58,20 +145,11 @@ class FONT:
         italic (int): Indicates whether the font is italic (1 for True, 0 for False).
         charset (int): The character set used by the font.
     """
-    pointsize: int = None
-    typeface: str = None
-    weight: int = None
-    italic: int = None
-    charset: int = None
-
-    def __init__(self, line):
-        not_set = [None] * 5
-        pointsize, typeface, weight, italic, charset, *_ = [x.strip() for x in line.split(',')] + not_set
-        self.pointsize = int(pointsize) if pointsize else 0
-        self.typeface = typeface.strip('"')
-        self.weight = int(weight) if weight else 0
-        self.italic = int(italic) if italic else 0
-        self.charset = int(charset) if charset else 0
+    pointsize: int = 0
+    typeface: str = ''
+    weight: int = 0
+    italic: int = 0
+    charset: int = 0
 
 
 @dataclass
@@ -88,8 +166,9 @@ class ControlStatement:
         size (tuple[int, int]): The size of the control (width, height).
         exStyle (int): The combined value of extended control styles.
         name (str): The name or label associated with the control.
+        symbol (str): The symbol used as control ID if it is not defined within the resource code.
     """
-    # ('', '1', 'EDIT', ['ES_LEFT', 'WS_CHILD', 'WS_VISIBLE', 'WS_BORDER', 'WS_TABSTOP'], 6, 5, 240, 14),
+    # ('', 1, 'edit', ES.LEFT | WS.CHILD | WS.VISIBLE | WS.BORDER | WS.TABSTOP, (6, 5), (240, 14)),
     title: str = ''
     id_ : int = None
     control_class: str = ''
@@ -98,17 +177,7 @@ class ControlStatement:
     size: (int, int) = None
     exStyle: int = 0
     name: str = None
-
-    def __init__(self, line):
-        if '//' in line:
-            line, name = line.split('//')
-            self.name = name.strip()
-        self.title, self.id_, control_class, style, x, y, width, height, *ex_style = [x.strip().strip('"') for x in line.split(',')]
-        self.control_class = control_class.lower()
-        self.style = _get_style_value([x.strip() for x in style.split('|')])
-        self.position = (int(x), int(y))
-        self.size = int(width), int(height)
-        self.exStyle = _get_extended_style_value(ex_style)
+    symbol: str = None
 
 
 @dataclass
@@ -124,6 +193,7 @@ class DialogExResource:
         position (tuple[int, int]): The position of the dialog (x, y).
         font (FONT): The font used in the dialog.
         controls (list[ControlStatement]): The list of control statements in the dialog.
+        name (str): The name or ID of the dialog resource.
     """
     styles: int = None
     exStyle: int = 0
@@ -132,75 +202,618 @@ class DialogExResource:
     position: (int, int) = (0, 0)
     font: FONT = None
     controls: list[ControlStatement] = None
+    name: str = None
     def __post_init__(self):
         if self.controls is None:
             self.controls = []
+        if self.font is None:
+            self.font = FONT()
+
+
+def parse_resources(rc_code):
+    """
+    Parse the RC (Resource Compiler) code and return all dialog resources it contains.
+
+    The result is cached by the hash of rc_code and shared by all callers, it must not be modified.
+
+    Parameters:
+        rc_code (str): The RC code to parse.
+
+    Returns:
+        tuple[DialogExResource]: The dialog resources in the order of their definition.
+
+    Raises:
+        ValueError: If the code contains a syntax error.
+    """
+    key = hashlib.sha1(rc_code.encode('utf-8', 'surrogatepass')).digest()
+    dialogs = _cache.get(key)
+    if dialogs is None:
+        dialogs = _cache[key] = tuple(_Parser(rc_code).parse())
+        if len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    else:
+        _cache.move_to_end(key)
+    return dialogs
 
-# TODO: needs to be revised if VS generated rc files are considered.
-def parser(rc_code):
+
+def parser(rc_code, name=None):
     """
     Parse the RC (Resource Compiler) code and create a DialogExResource object.
 
     Parameters:
         rc_code (str): The RC code to parse.
+        name (str, optional): The name or ID of the dialog resource, the first one if None.
 
     Returns:
         DialogExResource: The parsed DialogExResource object.
+
+    Raises:
+        ValueError: If the code contains a syntax error or the requested dialog.
     """
-    dlg = DialogExResource()
-    for line_ in rc_code.splitlines():
-        line = line_.strip()
-        if line.startswith('CONTROL'):
-            dlg.controls.append(ControlStatement(line.replace('CONTROL', '')))
-        elif line.startswith('STYLE'):
-            dlg.styles = _get_style_value([x.strip() for x in line.replace('STYLE', '').split('|')])
-        elif line.startswith('EXSTYLE'):
-            dlg.exStyle = _get_extended_style_value([x.strip() for x in line.replace('EXSTYLE', '').split('|')])
-        elif line.startswith('CAPTION'):
-            dlg.title = line.replace('CAPTION', '').strip().strip('"')
-        elif line.startswith('FONT'):
-            dlg.font = FONT(line.replace('FONT', ''))
-        else:
-            if 'DIALOGEX' in line:
-                pos = line.find('DIALOGEX',0)
-                x, y, width, height, *rest = [x.strip() for x in line[pos+8:].split(',')]
-                dlg.position = (int(x), int(y))
-                dlg.size = (int(width), int(height))
-            else:
-                continue
-    return dlg
+    dialogs = parse_resources(rc_code)
+    if name is None:
+        # code without a dialog resource, e.g. only optional statements, results in a default dialog
+        return dialogs[0] if dialogs else DialogExResource()
+    for dialog in dialogs:
+        if dialog.name == str(name):
+            return dialog
+    raise ValueError(f'The resource code does not contain the dialog "{name}"')
+
+
+@lru_cache(maxsize=None)
+def _style_constant(name):
+    """
+    Get the value of a style or another predefined symbol.
+
+    Parameters:
+        name (str): A symbol like WS_CHILD or LVS_EX_CHECKBOXES.
+
+    Returns:
+        int: The value of the symbol or None if it is unknown.
+    """
+    if name in CONSTANTS:
+        return int(CONSTANTS[name])
+    klass, separator, member = name.partition('_EX_')
+    if separator and klass + '_EX' in STYLE_MAP:
+        value = STYLE_MAP[klass + '_EX'].__members__.get(member)
+        return None if value is None else int(value)
+    klass, _, member = name.partition('_')
+    if klass in STYLE_MAP:
+        value = STYLE_MAP[klass].__members__.get(member)
+        return None if value is None else int(value)
+    return None
+
 
-def _get_extended_style_value(styles):
+def _unquote(token):
     """
-    Get the combined value of extended styles from a list of style names.
+    Get the content of a string token with its escape sequences resolved.
 
     Parameters:
-        styles (list): A list of extended style names.
+        token (str): A quoted string, optionally prefixed by L.
+
+    Returns:
+        str: The string.
+    """
+    text = token[2:-1] if token[0] == 'L' else token[1:-1]
+    if '\\' not in text and '""' not in text:
+        return text
+
+    def replace(match):
+        escape = match.group(1)
+        if escape is None:
+            return '"'
+        if escape[0] == 'x':
+            return chr(int(escape[1:], 16))
+        if escape[0] in '01234567':
+            return chr(int(escape, 8))
+        return _ESCAPES.get(escape, escape)
+    return _ESCAPE.sub(replace, text)
+
+
+def _tokenize(rc_code):
+    """
+    Split the RC code into tokens.
+
+    Parameters:
+        rc_code (str): The RC code.
+
+    Returns:
+        tuple: A list of (kind, value, position, first on line) tuples ending with an eof token,
+               a dictionary of token index -> comment following that token on the same line
+               and a dictionary of #define symbols.
+
+    Raises:
+        ValueError: If the code contains an unexpected character.
+    """
+    if '\\\n' in rc_code or '\\\r\n' in rc_code:
+        # line continuations
+        rc_code = rc_code.replace('\\\r\n', '').replace('\\\n', '')
+
+    tokens = []
+    comments = {}
+    defines = {}
+    append = tokens.append
+    first_on_line = True
+    for match in _TOKEN.finditer(rc_code):
+        kind = match.lastgroup
+        value = match.group()
+        if kind == 'space' or kind == 'block':
+            if '\n' in value:
+                first_on_line = True
+        elif kind == 'comment':
+            if not first_on_line and tokens:
+                comments[len(tokens) - 1] = value[2:].strip()
+        elif kind == 'directive':
+            define = _DEFINE.match(value)
+            if define:
+                defines[define.group(1)] = define.group(2).split('//')[0].strip()
+        elif kind == 'error':
+            line = rc_code.count('\n', 0, match.start()) + 1
+            raise ValueError(f'Unexpected character {value!r} in line {line}')
+        else:
+            append((kind, value, match.start(), first_on_line))
+            first_on_line = False
+    append(('eof', None, len(rc_code), True))
+    return tokens, comments, defines
+
+
+class _Parser:
+    """
+    Reads the dialog resources from the tokens of RC code.
+    """
+    def __init__(self, rc_code):
+        self.rc_code = rc_code
+        self.tokens, self.comments, self.defines = _tokenize(rc_code)
+        self.pos = 0
+        self.symbols = {}
+
+    def parse(self):
+        """
+        Parse all resources, dialogs are returned, everything else is skipped.
+
+        Returns:
+            list[DialogExResource]: The dialogs.
+        """
+        dialogs = []
+        tokens = self.tokens
+        while tokens[self.pos][0] != 'eof':
+            kind, value, _, _ = tokens[self.pos]
+            if kind == 'name' and value in _HEADERLESS_OPTIONS:
+                # dialog statements without a DIALOGEX line, as used by create_dialog_from_rc since the beginning
+                dialog = DialogExResource()
+                self._dialog_options(dialog)
+                self._dialog_body(dialog)
+                dialogs.append(dialog)
+            elif self._peek_value(1) in ('DIALOGEX', 'DIALOG'):
+                dialogs.append(self._dialog())
+            else:
+                self._skip_resource()
+        return dialogs
+
+    def _error(self, message):
+        position = self.tokens[self.pos][2]
+        line = self.rc_code.count('\n', 0, position) + 1
+        raise ValueError(f'{message} in line {line}')
+
+    def _peek_value(self, offset=0):
+        index = self.pos + offset
+        return self.tokens[index][1] if index < len(self.tokens) else None
+
+    def _next(self):
+        token = self.tokens[self.pos]
+        if token[0] == 'eof':
+            self._error('Unexpected end of the resource code')
+        self.pos += 1
+        return token
+
+    def _accept(self, value):
+        if self.tokens[self.pos][1] == value:
+            self.pos += 1
+            return True
+        return False
+
+    def _expect(self, value):
+        if not self._accept(value):
+            self._error(f'Expected "{value}" but found "{self._peek_value()}"')
+
+    def _skip_block(self):
+        # the current token is BEGIN or {
+        depth = 0
+        while True:
+            value = self._next()[1]
+            if value in _BEGIN:
+                depth += 1
+            elif value in _END:
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def _skip_resource(self):
+        # a resource defined by a file, e.g. 1 ICON "app.ico", and top level statements like LANGUAGE
+        # end with their line, others, e.g. menus or string tables, with their BEGIN ... END block
+        tokens = self.tokens
+        first = tokens[self.pos][1]
+        self.pos += 1
+        while not tokens[self.pos][3]:
+            if tokens[self.pos][1] in _BEGIN:
+                self._skip_block()
+                return
+            self.pos += 1
+        if first in _TOP_LEVEL_STATEMENTS or tokens[self.pos - 1][0] == 'str':
+            return
+        while tokens[self.pos][0] != 'eof':
+            if tokens[self.pos][1] in _BEGIN:
+                self._skip_block()
+                return
+            if self._peek_value(1) in ('DIALOGEX', 'DIALOG'):
+                return
+            self.pos += 1
+
+    def _dialog(self):
+        kind, value, _, _ = self._next()
+        dialog = DialogExResource(name=_unquote(value) if kind == 'str' else value)
+        self._next()
+        while self._peek_value() in MEMORY_FLAGS:
+            self.pos += 1
+        x, y, width, height = self._arguments(4)
+        if self._accept(','):
+            self._expression()  # helpID
+        dialog.position = (x, y)
+        dialog.size = (width, height)
+        self._dialog_options(dialog)
+        self._dialog_body(dialog)
+        return dialog
+
+    def _dialog_options(self, dialog):
+        while True:
+            value = self._peek_value()
+            if value not in DIALOG_OPTIONS or self.tokens[self.pos][0] != 'name':
+                return
+            self.pos += 1
+            if value == 'STYLE':
+                dialog.styles = self._expression() & 0xFFFFFFFF
+            elif value == 'EXSTYLE':
+                dialog.exStyle = self._expression() & 0xFFFFFFFF
+            elif value == 'CAPTION':
+                dialog.title = self._text()
+            elif value == 'FONT':
+                font = FONT(self._expression(), '')
+                self._expect(',')
+                font.typeface = self._text()
+                for attribute in ('weight', 'italic', 'charset'):
+                    if not self._accept(','):
+                        break
+                    setattr(font, attribute, self._expression())
+                dialog.font = font
+            elif value == 'LANGUAGE':
+                self._arguments(2)
+            else:
+                # MENU, CLASS, CHARACTERISTICS and VERSION have a single argument
+                self._next()
+
+    def _dialog_body(self, dialog):
+        if self._peek_value() not in _BEGIN:
+            return
+        self.pos += 1
+        controls = dialog.controls
+        while not self._accept('}') and not self._accept('END'):
+            kind, statement, _, _ = self._next()
+            if statement == 'CONTROL':
+                control = self._control()
+            elif statement in GENERIC_CONTROLS:
+                control = self._generic_control(statement)
+            else:
+                self.pos -= 1
+                self._error(f'Unknown control statement "{statement}"')
+            name = self.comments.get(self.pos - 1)
+            if name:
+                control.name = name
+            if self._peek_value() in _BEGIN:
+                # creation data
+                self._skip_block()
+            controls.append(control)
+
+    def _control(self):
+        # CONTROL text, id, class, style, x, y, width, height [, extended-style [, helpID]]
+        control = ControlStatement(title=self._text())
+        self._expect(',')
+        self._control_id(control)
+        self._expect(',')
+        kind, value, _, _ = self._next()
+        control.control_class = (_unquote(value) if kind == 'str' else value).lower()
+        self._expect(',')
+        control.style = self._expression() & 0xFFFFFFFF
+        self._expect(',')
+        self._geometry(control)
+        return control
+
+    def _generic_control(self, statement):
+        # LTEXT text, id, x, y, width, height [, style [, extended-style [, helpID]]]
+        # EDITTEXT id, x, y, width, height [, style [, extended-style [, helpID]]]
+        control_class, default_style, has_text = GENERIC_CONTROLS[statement]
+        control = ControlStatement(control_class=control_class)
+        if has_text:
+            control.title = self._text()
+            self._expect(',')
+        self._control_id(control)
+        self._expect(',')
+        x, y, width, height = self._arguments(4)
+        control.position = (x, y)
+        control.size = (width, height)
+        style = CONTROL_DEFAULT_STYLE | default_style
+        if self._accept(','):
+            style = self._expression(style)
+        control.style = style & 0xFFFFFFFF
+        if self._accept(','):
+            control.exStyle = self._expression() & 0xFFFFFFFF
+            if self._accept(','):
+                self._expression()
+        return control
+
+    def _geometry(self, control):
+        x, y, width, height = self._arguments(4)
+        control.position = (x, y)
+        control.size = (width, height)
+        if self._accept(','):
+            control.exStyle = self._expression() & 0xFFFFFFFF
+            if self._accept(','):
+                self._expression()
+
+    def _control_id(self, control):
+        kind, value, _, _ = self.tokens[self.pos]
+        if kind == 'name' and self._peek_value(1) == ',' and self._symbol(value) is None:
+            control.symbol = value
+        control.id_ = self._expression()
+
+    def _arguments(self, count):
+        values = [self._expression()]
+        for _ in range(count - 1):
+            self._expect(',')
+            values.append(self._expression())
+        return values
+
+    def _text(self):
+        # a string, or a number or symbol, e.g. the resource ID of an icon
+        kind, value, _, _ = self.tokens[self.pos]
+        if kind == 'str':
+            self.pos += 1
+            return _unquote(value)
+        return str(self._expression())
+
+    def _symbol(self, name):
+        if name in self.symbols:
+            return self.symbols[name]
+        value = None
+        if name in self.defines:
+            self.symbols[name] = None  # guards against recursive definitions
+            define = self.defines[name]
+            if define:
+                try:
+                    sub_parser = _Parser.__new__(_Parser)
+                    sub_parser.rc_code = define
+                    sub_parser.tokens, sub_parser.comments, _ = _tokenize(define)
+                    sub_parser.defines = self.defines
+                    sub_parser.symbols = self.symbols
+                    sub_parser.pos = 0
+                    value = sub_parser._expression()
+                except ValueError:
+                    value = None
+        if value is None:
+            value = _style_constant(name)
+        self.symbols[name] = value
+        return value
+
+    def _expression(self, value=0):
+        # rc.exe: "STYLE | NOT WS_VISIBLE" removes WS_VISIBLE, e.g. from the default style of a control
+        tokens = self.tokens
+        while True:
+            if tokens[self.pos][1] == 'NOT':
+                self.pos += 1
+                value &= ~self._bitwise_and()
+            else:
+                value |= self._bitwise_and()
+            if tokens[self.pos][1] != '|':
+                return value
+            self.pos += 1
+
+    def _bitwise_and(self):
+        value = self._additive()
+        while self.tokens[self.pos][1] == '&':
+            self.pos += 1
+            value &= self._additive()
+        return value
+
+    def _additive(self):
+        value = self._multiplicative()
+        while True:
+            operator = self.tokens[self.pos][1]
+            if operator == '+':
+                self.pos += 1
+                value += self._multiplicative()
+            elif operator == '-':
+                self.pos += 1
+                value -= self._multiplicative()
+            else:
+                return value
+
+    def _multiplicative(self):
+        value = self._unary()
+        while True:
+            operator = self.tokens[self.pos][1]
+            if operator == '*':
+                self.pos += 1
+                value *= self._unary()
+            elif operator == '/':
+                self.pos += 1
+                divisor = self._unary()
+                value = int(value / divisor) if divisor else 0
+            else:
+                return value
+
+    def _unary(self):
+        kind, value, _, _ = self._next()
+        if kind == 'num':
+            value = value.rstrip('uUlL')
+            return int(value, 16) if value[1:2] in ('x', 'X') else int(value)
+        if kind == 'name':
+            symbol = self._symbol(value)
+            return 0 if symbol is None else symbol
+        if value == '(':
+            result = self._expression()
+            self._expect(')')
+            return result
+        if value == '-':
+            return -self._unary()
+        if value == '~':
+            return ~self._unary()
+        if value == '+':
+            return self._unary()
+        self.pos -= 1
+        self._error(f'Expected a value but found "{value}"')
+
+
+def _example(count):
+    controls = '\n'.join(
+        f'    CONTROL "Item {i}, \\"quoted\\"", {1000 + i}, BUTTON, BS_PUSHBUTTON | WS_CHILD | WS_VISIBLE | WS_TABSTOP,\n'
+        f'            {5 + 20 * (i % 20)}, {5 + 15 * (i // 20)}, 17, 11 // button_{i}'
+        for i in range(count))
+    return f'''
+#define IDD_STRESS 100
+1 ICON "app.ico"
+IDD_STRESS DIALOGEX 0, 0, 405, 305
+STYLE DS_SETFONT | DS_MODALFRAME | WS_POPUP | WS_CAPTION | WS_SYSMENU
+CAPTION "Stress Test"
+FONT 9, "Segoe UI", 400, 0, 0x1
+BEGIN
+{controls}
+END
+'''
+
+
+def self_test():
+    """
+    Checks the parser with code as written by ResourceHacker and Visual Studio.
 
     Returns:
-        int: The combined value of the extended styles.
+        None
     """
-    value = 0
-    for style in styles:
-        klass, _, member = style.partition('_EX_')
-        klass += '_EX'
-        if klass in STYLE_MAP:
-            value += STYLE_MAP[klass].__members__.get(member, 0)
-    return value
+    hacker = '''
+1 DIALOGEX 0, 0, 250, 125
+STYLE DS_SETFONT | DS_MODALFRAME | WS_POPUP | WS_CAPTION | WS_SYSMENU
+CAPTION "TextBox Dialog"
+LANGUAGE LANG_NEUTRAL, SUBLANG_NEUTRAL
+FONT 9, "Segoe UI"
+{
+   CONTROL "", 0, "SysListView32", LVS_REPORT | WS_CHILD | WS_VISIBLE | WS_BORDER | WS_TABSTOP, 5, 5, 240, 76 , LVS_EX_CHECKBOXES // listview
+   CONTROL "Get selected rows", 0, BUTTON, BS_PUSHBUTTON | WS_CHILD | WS_VISIBLE | WS_TABSTOP, 84, 100, 87, 14
+}
+'''
+    dialog = parser(hacker)
+    assert (dialog.name, dialog.title, dialog.position, dialog.size) == ('1', 'TextBox Dialog', (0, 0), (250, 125))
+    assert dialog.styles == DS.SETFONT | DS.MODALFRAME | WS.POPUP | WS.CAPTION | WS.SYSMENU
+    assert dialog.font == FONT(9, 'Segoe UI', 0, 0, 0)
+    listview, button = dialog.controls
+    assert (listview.name, listview.control_class, listview.exStyle) == ('listview', 'syslistview32', LVS_EX.CHECKBOXES)
+    assert listview.style == LVS.REPORT | WS.CHILD | WS.VISIBLE | WS.BORDER | WS.TABSTOP
+    assert (button.title, button.id_, button.control_class, button.name) == ('Get selected rows', 0, 'button', None)
+    assert (button.position, button.size) == ((84, 100), (87, 14))
+    assert parser(hacker) is dialog
+
+    studio = r'''
+// Microsoft Visual C++ generated resource script.
+#include "resource.h"
+#define IDD_ABOUT 101
+#define IDC_NAME  (1000 + \
+                   1)
+#define DEFAULT_STYLE WS_CHILD | WS_VISIBLE
+/* the icon and the menu are skipped */
+IDI_APP ICON "app.ico"
+IDR_MENU MENU
+BEGIN
+    POPUP "&File"
+    BEGIN
+        MENUITEM "E&xit", IDOK
+    END
+END
+STRINGTABLE
+BEGIN
+    1 "a string"
+END
+LANGUAGE LANG_ENGLISH, SUBLANG_ENGLISH_US
+IDD_ABOUT DIALOGEX DISCARDABLE 10, 20, 200, 100
+STYLE DS_SETFONT | WS_POPUP | WS_CAPTION
+EXSTYLE WS_EX_TOOLWINDOW
+CAPTION "About ""Demo"", version 1\t2"
+FONT 8, "MS Shell Dlg", 400, 0, 0x1
+BEGIN
+    LTEXT           "Name, first",IDC_STATIC,7,7,50,8
+    EDITTEXT        IDC_NAME,60,7,
+                    100,14,ES_AUTOHSCROLL | NOT WS_TABSTOP
+    DEFPUSHBUTTON   "OK",IDOK,90,80,50,14
+    CONTROL         "Check",IDC_UNKNOWN,"Button",DEFAULT_STYLE | BS_AUTOCHECKBOX,7,30,(20*2),10,WS_EX_CLIENTEDGE
+END
+"SECOND" DIALOG 0, 0, 50, 50
+CAPTION "Second"
+'''
+    about, second = parse_resources(studio)
+    assert (about.name, about.position, about.size, about.exStyle) == ('IDD_ABOUT', (10, 20), (200, 100), WS_EX.TOOLWINDOW)
+    assert about.title == 'About "Demo", version 1\t2'
+    assert about.font == FONT(8, 'MS Shell Dlg', 400, 0, 1)
+    label, edit, ok, check = about.controls
+    assert (label.title, label.id_, label.control_class) == ('Name, first', -1, 'static')
+    assert label.style == WS.CHILD | WS.VISIBLE | SS.LEFT | WS.GROUP
+    assert (edit.id_, edit.control_class, edit.size) == (1001, 'edit', (100, 14))
+    assert edit.style == WS.CHILD | WS.VISIBLE | WS.BORDER | ES.__members__.get('AUTOHSCROLL', 0), hex(edit.style)
+    assert (ok.id_, ok.style) == (1, WS.CHILD | WS.VISIBLE | BS.DEFPUSHBUTTON | WS.TABSTOP)
+    assert (check.symbol, check.id_, check.size, check.exStyle) == ('IDC_UNKNOWN', 0, (40, 10), WS_EX.CLIENTEDGE)
+    assert check.style == WS.CHILD | WS.VISIBLE | BS.AUTOCHECKBOX
+    assert (second.name, second.title, second.controls) == ('SECOND', 'Second', [])
+    assert parser(studio, 'SECOND') is second
+
+    # a CONTROL statement gets no default style, the progress bar stays hidden
+    hidden = parser('1 DIALOGEX 0, 0, 10, 10\nBEGIN\n    CONTROL "", 7, "msctls_progress32", WS_CHILD, 0, 0, 10, 8\nEND')
+    assert hidden.controls[0].style == WS.CHILD, hex(hidden.controls[0].style)
+
+    # the statements of a dialog without DIALOGEX line and without controls
+    assert parser('STYLE WS_POPUP\nCAPTION "x"').title == 'x'
+
+    try:
+        parser('1 DIALOGEX 0, 0, 10\nBEGIN\nEND')
+    except ValueError as e:
+        assert 'line 2' in str(e), e
+    else:
+        assert False, 'syntax error not detected'
 
-def _get_style_value(styles):
+    dialog = parser(_example(3))
+    assert [control.title for control in dialog.controls] == ['Item {}, "quoted"'.format(i) for i in range(3)]
+    assert [control.name for control in dialog.controls] == ['button_0', 'button_1', 'button_2']
+    print('resource parser is ok')
+
+
+def benchmark(count=5000, repeat=5):
     """
-    Get the combined value of styles from a list of style names.
+    Measures parsing a resource script with count controls, uncached and cached.
 
     Parameters:
-        styles (list): A list of style names.
+        count (int): The number of controls.
+        repeat (int): How often the script gets parsed.
 
     Returns:
-        int: The combined value of the styles.
-    """
-    value = 0
-    for style in styles:
-        klass, _, member = style.partition('_')
-        if klass in STYLE_MAP:
-            value += STYLE_MAP[klass].__members__.get(member, 0)
-    return value
\ No newline at end of file
+        None
+    """
+    import time
+
+    rc_code = _example(count)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        dialogs = _Parser(rc_code).parse()
+    uncached = (time.perf_counter() - started) / repeat * 1000
+    assert len(dialogs[0].controls) == count
+
+    parse_resources(rc_code)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        parse_resources(rc_code)
+    cached = (time.perf_counter() - started) / repeat * 1000
+    print(f'{count} controls, {len(rc_code)} characters: parsed in {uncached:.1f}ms, cached in {cached:.2f}ms')
+
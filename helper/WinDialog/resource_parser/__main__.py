@@ -0,0 +1,4 @@
+from . import self_test, benchmark
+
+self_test()
+benchmark()
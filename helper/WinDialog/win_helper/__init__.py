@@ -204,6 +204,10 @@ class SWP(IntEnum):
     DEFERERASE      = 0x2000  #
     ASYNCWINDOWPOS  = 0x4000  #
 
+class DWLP(IntEnum):
+    # the result of a message processed by a dialog procedure, e.g. of WM_NOTIFY
+    MSGRESULT      = 0
+
 class GWL(IntEnum):
     WNDPROC        = -4
     HINSTANCE      = -6
@@ -1,5 +1,26 @@
-from Npp import notepad, editor, NOTIFICATION, SCINTILLANOTIFICATION, STATUSBARSECTION, MODIFICATIONFLAGS
+'''
+    Counts the words of the current document which are not in the dictionary,
+    shows the numbers in the status bar and marks those words in the visible area.
+
+    word_checker.goto_next_misspelling() selects the next misspelled word and
+    word_checker.export_report() lists the misspelled words, with their count
+    and the lines they occur in, in a new document.
+
+    Documents larger than BATCH_THRESHOLD bytes are checked by several python processes
+    while npp stays responsive, the results are shown once all are done.
+    A timer, running within npp's main thread, polls the processes,
+    so the results are merged and shown by the main thread only.
+    As npp itself cannot be used to start those processes, PYTHON_EXECUTABLE
+    needs to point to a python installation of the same version PythonScript uses.
+'''
+from Npp import (notepad, editor, editor1, editor2, NOTIFICATION, SCINTILLANOTIFICATION,
+                 STATUSBARSECTION, MODIFICATIONFLAGS, INDICATORSTYLE)
 import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from ctypes import windll, WINFUNCTYPE, c_size_t
+from ctypes.wintypes import HWND, UINT, DWORD
+import spelling_engine
 
 
 class WORD_CHECKER:
@@ -12,45 +33,201 @@ class WORD_CHECKER:
                        'Total misspelled: {4:<4}({5:.1%})  '
                        'Unique misspelled: {6:<4}({7:.1%})')
 
+        # misspelled words are marked with this indicator, within the visible area only
+        self.INDICATOR_ID = 9
+        self.INDICATOR_COLOR = (255, 0, 0)
+        for _editor in (editor1, editor2):
+            _editor.indicSetStyle(self.INDICATOR_ID, INDICATORSTYLE.SQUIGGLE)
+            _editor.indicSetFore(self.INDICATOR_ID, self.INDICATOR_COLOR)
+        # (first line, last line) painted last time, None if it needs to be painted again
+        self.painted_range = None
+
+        # e.g. r'C:\Python312\pythonw.exe', an empty string disables the batch mode
+        self.PYTHON_EXECUTABLE = ''
+        self.BATCH_THRESHOLD = 2 * 1024 * 1024
+        self.BATCH_POLL_INTERVAL_MS = 100
+        self.executor = None
+        # increased whenever a running batch is not of interest anymore
+        self.batch_generation = 0
+        self.batch_pending = False
+        # the document has been modified while the batch was running
+        self.batch_outdated = False
+        # (futures, generation) of the running batch, polled by the batch timer
+        self.batch = None
+        self.user32 = windll.user32
+        TIMERPROC = WINFUNCTYPE(None, HWND, UINT, c_size_t, DWORD)
+        self.batch_timer_proc = TIMERPROC(self.on_batch_timer)
+        self.batch_timer_id = 0
+
+        current_dict_path = os.path.join(notepad.getPluginConfigDir(), 'Hunspell')
+        current_dict_files = [os.path.join(current_dict_path, 'ES-5000.dic')]
+        # one word per line, used if it exists
+        user_words_file = os.path.join(current_dict_path, 'user_words.txt')
+        # compiled once and memory mapped, later runs of this script get the mapped one
+        self.current_dict = spelling_engine.load_dictionary(current_dict_files, user_words_file)
+        self.index = spelling_engine.WordIndex(self.current_dict)
+
         editor.callbackSync(self.on_modified, [SCINTILLANOTIFICATION.MODIFIED])
+        editor.callbackSync(self.on_updateui, [SCINTILLANOTIFICATION.UPDATEUI])
         notepad.callback(self.on_buffer_activated, [NOTIFICATION.BUFFERACTIVATED])
-        current_dict_path = os.path.join(notepad.getPluginConfigDir(), 'Hunspell')
-        current_dict_file = os.path.join(current_dict_path, 'ES-5000.dic')
-        with open(current_dict_file, 'r') as f:
-            self.current_dict = [word.decode('utf8')
-                                 for word in f.read().splitlines()[1:]]   # skip length entry
 
         self.DEBUG_MODE = False
         self.on_buffer_activated({})  # must be last line here as it triggers check_words
-        
+
 
     def check_words(self):
-        
-        words = []
-
-        def __get_words(m):
-            if m.group(2):
-                words.append(m.group(2).decode('utf8'))
-        
-        editor.research('(^//.*)|([[:alpha:]]+(?=\h|[[:punct:]]|\R|\Z))', __get_words)
-        
-        if self.DEBUG_MODE:
-            print(u'words contains:\n  {}'.format('  '.join(words)))
-            
-        error_words = [word.lower() 
-                       for word in words 
-                       if word.lower() not in self.current_dict and    # insensitive word check
-                       not word.isupper()  # ignore all uppercase only words
-                       ]
+        # indexes the whole document, edits are handled line by line by on_modified
+        self.batch_generation += 1
+        self.batch_pending = False
+        self.cancel_batch()
+        text = editor.getText()
+        # the threshold is in bytes, like the length scintilla reports
+        if self.PYTHON_EXECUTABLE and editor.getLength() > self.BATCH_THRESHOLD:
+            self.start_batch(text)
+            return
+        self.shutdown_executor()
+        self.index.rebuild(text)
+
         if self.DEBUG_MODE:
-            print(u'error_words contains:\n  {}'.format('  '.join(error_words)))
-            print(u'error_words unique contains:\n  {}'.format('  '.join(set(error_words))))
-        
-        total = len(words)
-        unique = len(set(words))
-        misspelled = len(error_words)
-        misspelled_unique = len(set(error_words))
-        notepad.setStatusBar(STATUSBARSECTION.DOCTYPE, 
+            print(u'words contains:\n  {}'.format('  '.join(self.index.words.elements())))
+            print(u'error_words contains:\n  {}'.format('  '.join(self.index.misspelled.elements())))
+            print(u'error_words unique contains:\n  {}'.format('  '.join(self.index.misspelled)))
+
+        self.painted_range = None
+        self.show_report()
+
+
+    def start_batch(self, text):
+        # the snapshot gets indexed by the worker processes, the batch timer waits for the results
+        if self.executor is None:
+            multiprocessing.set_executable(self.PYTHON_EXECUTABLE)
+            self.executor = ProcessPoolExecutor()
+        self.batch_pending = True
+        self.batch_outdated = False
+        notepad.setStatusBar(STATUSBARSECTION.DOCTYPE, 'Checking words ...')
+        futures = spelling_engine.index_in_parallel(text, self.current_dict, self.executor)
+        self.batch = (futures, self.batch_generation)
+        if not self.batch_timer_id:
+            self.batch_timer_id = self.user32.SetTimer(None, 0, self.BATCH_POLL_INTERVAL_MS, self.batch_timer_proc)
+
+
+    def cancel_batch(self):
+        # the running batch is not of interest anymore, chunks not yet started are dropped
+        if self.batch is not None:
+            for future in self.batch[0]:
+                future.cancel()
+            self.batch = None
+
+
+    def stop_batch_timer(self):
+        if self.batch_timer_id:
+            self.user32.KillTimer(None, self.batch_timer_id)
+            self.batch_timer_id = 0
+
+
+    def shutdown_executor(self):
+        # the worker processes are started again by the next batch
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+
+    def on_batch_timer(self, hwnd, msg, timer_id, tick_count):
+        # runs within npp's main thread, like on_modified, so the index is never changed concurrently
+        if self.batch is None:
+            self.stop_batch_timer()
+            return
+        futures, generation = self.batch
+        if not all(future.done() for future in futures):
+            return
+        self.batch = None
+        self.stop_batch_timer()
+        if generation != self.batch_generation:
+            # another document got activated in the meantime
+            return
+
+        try:
+            chunks = [future.result() for future in futures]
+        except Exception as e:
+            print(u'batch mode disabled: {}'.format(e))
+            self.PYTHON_EXECUTABLE = ''
+            self.shutdown_executor()
+            self.check_words()
+            return
+
+        if self.batch_outdated:
+            # modified while being checked, check the current content again
+            self.start_batch(editor.getText())
+            return
+        self.shutdown_executor()
+        self.index.merge_chunks(chunks)
+        self.batch_pending = False
+        self.painted_range = None
+        self.show_report()
+        self.paint_visible_range()
+
+
+    def paint_visible_range(self):
+        # only lines which the index knows to contain misspelled words are looked at
+        if self.batch_pending:
+            return
+        first_visible_line = editor.getFirstVisibleLine()
+        first_line = editor.docLineFromVisible(first_visible_line)
+        last_line = min(editor.docLineFromVisible(first_visible_line + editor.linesOnScreen()),
+                        editor.getLineCount() - 1)
+        if self.painted_range == (first_line, last_line):
+            return
+        self.painted_range = (first_line, last_line)
+
+        start_position = editor.positionFromLine(first_line)
+        editor.setIndicatorCurrent(self.INDICATOR_ID)
+        editor.indicatorClearRange(start_position, editor.getLineEndPosition(last_line) - start_position)
+        for line in range(first_line, last_line + 1):
+            if not self.index.lines[line][1]:
+                continue
+            text = editor.getLine(line)
+            line_start_position = editor.positionFromLine(line)
+            for column, word in self.index.misspelled_spans(line, text):
+                position = line_start_position + len(text[:column].encode('utf8'))
+                editor.indicatorFillRange(position, len(word.encode('utf8')))
+
+
+    def goto_next_misspelling(self):
+        # the next misspelled word after the caret, wrapping around at the end of the document
+        if self.batch_pending:
+            return
+        current_position = editor.getCurrentPos()
+        current_line = editor.lineFromPosition(current_position)
+        text = editor.getLine(current_line)
+        caret_column = len(editor.getTextRange(editor.positionFromLine(current_line), current_position))
+        spans = [(column, word) for column, word in self.index.misspelled_spans(current_line, text)
+                 if column > caret_column]
+        line = current_line
+        if not spans:
+            line = self.index.next_misspelled_line(current_line)
+            if line is None:
+                return
+            text = editor.getLine(line)
+            spans = self.index.misspelled_spans(line, text)
+        column, word = spans[0]
+        position = editor.positionFromLine(line) + len(text[:column].encode('utf8'))
+        editor.ensureVisible(line)
+        editor.setSel(position, position + len(word.encode('utf8')))
+
+
+    def export_report(self):
+        # the misspelled words, most frequent first, with the lines they occur in, as a new document
+        if self.batch_pending:
+            return
+        rows = [u'{}\t{}\t{}'.format(word, count, ', '.join(str(line + 1) for line in lines))
+                for word, count, lines in self.index.frequency_table()]
+        notepad.new()
+        editor.setText(u'word\tcount\tlines\r\n' + u'\r\n'.join(rows))
+
+
+    def show_report(self):
+        total, unique, misspelled, misspelled_unique = self.index.statistics()
+        notepad.setStatusBar(STATUSBARSECTION.DOCTYPE,
                              self.report.format(total,
                                                 unique,
                                                 total-misspelled,  # non-misspelled
@@ -62,13 +239,29 @@ class WORD_CHECKER:
 
 
     def on_modified(self, args):
-        if ((args['modificationType'] & MODIFICATIONFLAGS.INSERTTEXT) or 
+        if ((args['modificationType'] & MODIFICATIONFLAGS.INSERTTEXT) or
             (args['modificationType'] & MODIFICATIONFLAGS.DELETETEXT)):
-            self.check_words()
+            if self.batch_pending:
+                # the index gets replaced once the batch is done
+                self.batch_outdated = True
+                return
+            # only the lines touched by the modification get indexed again
+            first_line = editor.lineFromPosition(args['position'])
+            lines_added = args['linesAdded']
+            old_count = 1 + max(0, -lines_added)
+            new_count = 1 + max(0, lines_added)
+            new_lines = [editor.getLine(line) for line in range(first_line, first_line + new_count)]
+            self.index.replace_lines(first_line, old_count, new_lines)
+            self.painted_range = None
+            self.show_report()
+
+
+    def on_updateui(self, args):
+        self.paint_visible_range()
 
 
     def on_buffer_activated(self, args):
         self.check_words()
 
 
-WORD_CHECKER()
+word_checker = WORD_CHECKER()
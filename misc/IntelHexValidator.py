@@ -1,10 +1,22 @@
 # -*- coding: utf-8 -*-
 '''
-    IHEX_VALIDATOR calculates the checksum of a single intel hex formatted record
+    IHEX_VALIDATOR validates all records of an intel hex formatted document
+    and annotates the invalid records within the visible area.
+
+    ihex_validator.goto_next_bad_record() and ihex_validator.goto_previous_bad_record()
+    move the caret to the next or previous invalid record.
+
+    ihex_validator.build_image() saves the binary image of the document next to it,
+    with the extension .bin and the gaps filled with 0xFF, and shows its segments,
+    gaps and overlapping records in a new document.
+
+    The parsing is done by intel_hex.py, which needs to be in the same directory as this script.
 '''
 
-from Npp import notepad, editor, NOTIFICATION, SCINTILLANOTIFICATION, ANNOTATIONVISIBLE, MARGINTYPE
-import struct
+from Npp import notepad, editor, NOTIFICATION, SCINTILLANOTIFICATION, ANNOTATIONVISIBLE, MODIFICATIONFLAGS
+from bisect import bisect_left, bisect_right
+import os
+import intel_hex
 
 # Record Format
 # :LLAAAATT[DD...]CC
@@ -52,57 +64,162 @@ class IHEX_VALIDATOR:
         self.debug_mode = False
         self.ANON_STYLE = 20  # (0-18 reserved by ihex lexer)
 
+        self.SC_UPDATE_CONTENT = 1
+        self.SC_UPDATE_V_SCROLL = 4
+
+        # the parsed records and errors of the current document
+        self.document = intel_hex.HexDocument()
+        self.needs_validation = True
+        # bufferID -> (line -> text of the annotations set by this script),
+        # annotations belong to the document and stay when another one gets activated
+        self.buffer_annotations = {}
+        # the one of the current document
+        self.annotations = {}
+        # (first line, last line) annotated last time, None if it needs to be annotated again
+        self.annotated_range = None
+
         editor.callbackSync(self.on_updateui, [SCINTILLANOTIFICATION.UPDATEUI])
+        editor.callbackSync(self.on_modified, [SCINTILLANOTIFICATION.MODIFIED])
         notepad.callback(self.on_langchanged, [NOTIFICATION.LANGCHANGED])
         notepad.callback(self.on_bufferactivated, [NOTIFICATION.BUFFERACTIVATED])
+        notepad.callback(self.on_filebeforeclose, [NOTIFICATION.FILEBEFORECLOSE])
+
 
-        
     def __set_annotation(self, line, text):
         '''
-            Shows an annotated line under the caret line
+            Shows an annotated line under the given line
             Args:
-                line = integer, 0-based line number of the caret line
+                line = integer, 0-based line number
                 text = string, text to be shown
             Returns:
                 None
-        '''    
+        '''
 
-        editor.styleSetFore(self.ANON_STYLE, (128,255,0))
-        editor.styleSetBack(self.ANON_STYLE, notepad.getEditorDefaultBackgroundColor())
-        editor.annotationSetVisible(ANNOTATIONVISIBLE.STANDARD)
         editor.annotationSetText(line, text)
         editor.annotationSetStyle(line, self.ANON_STYLE)
 
 
-    def calculate_checksum(self):
+    def annotation_text(self, line):
+        '''
+            Returns the text shown under an invalid record,
+            the expected checksum is placed right under the wrong one.
+            Args:
+                line = integer, 0-based line number
+            Returns:
+                string
+        '''
+        record = self.document.records[line]
+        if isinstance(record, intel_hex.Record) and record.checksum != record.expected_checksum:
+            record_text = editor.getLine(line).rstrip()
+            return '{}{:02X}'.format(' ' * (len(record_text) - 2), record.expected_checksum)
+        return self.document.errors[line]
+
+
+    def validate_document(self):
+        '''
+            Parses and validates all records of the current document
+            Args:
+                None
+            Returns:
+                None
+        '''
+        self.document.parse(editor.getText())
+        self.needs_validation = False
+        self.annotated_range = None
+        if self.debug_mode:
+            print('{} invalid records'.format(len(self.document.bad_lines)))
+
+
+    def annotate_visible_lines(self):
         '''
-            Calculates the checksum of the caret line
+            Shows the annotations of the invalid records within the visible area
+            and removes those which are not needed anymore,
+            only the lines whose annotation changed are touched
             Args:
                 None
             Returns:
                 None
-        '''    
-        line = editor.getCurLine().strip()
-        line_length = len(line)
-        record_length = line_length-1
-        if line.startswith(':') and line_length > 10 and (record_length % 2 == 0):
-            if record_length == int(line[1:3],16) *2 + 8:
-                length_assumed = True
-                x = line[1:].decode('hex')
-            else:
-                length_assumed = False
-                x = line[1:-2].decode('hex')
-            total = sum(struct.unpack('<' + 'B'*len(x), x))
-            int_checksum = ~total & 0xFF
-            checksum = format(0 if int_checksum == 0xFF else int_checksum+1, '02X')
-            if self.debug_mode:
-                print('calculated checksum is {}'.format(checksum))
-            if checksum != line[-2:]:
-                self.__set_annotation(editor.lineFromPosition(editor.getCurrentPos()),
-                                      '{}{}'.format(' '*line_length if length_assumed else ' '*(line_length-2),
-                                                    checksum))
-            else:
-                editor.annotationClearAll()            
+        '''
+        first_visible_line = editor.getFirstVisibleLine()
+        first_line = editor.docLineFromVisible(first_visible_line)
+        last_line = editor.docLineFromVisible(first_visible_line + editor.linesOnScreen())
+        if self.annotated_range == (first_line, last_line):
+            return
+        self.annotated_range = (first_line, last_line)
+
+        bad_lines = self.document.bad_lines
+        annotations = dict((line, self.annotation_text(line))
+                           for line in bad_lines[bisect_left(bad_lines, first_line):bisect_right(bad_lines, last_line)])
+        for line in self.annotations:
+            if line not in annotations:
+                editor.annotationSetText(line, None)
+        changed = [line for line in annotations if self.annotations.get(line) != annotations[line]]
+        if changed:
+            editor.styleSetFore(self.ANON_STYLE, (128,255,0))
+            editor.styleSetBack(self.ANON_STYLE, notepad.getEditorDefaultBackgroundColor())
+            editor.annotationSetVisible(ANNOTATIONVISIBLE.STANDARD)
+        for line in changed:
+            self.__set_annotation(line, annotations[line])
+        self.annotations = annotations
+        self.buffer_annotations[notepad.getCurrentBufferID()] = annotations
+
+
+    def goto_bad_record(self, line):
+        '''
+            Moves the caret to the given line, if there is one
+            Args:
+                line = integer, 0-based line number or None
+            Returns:
+                None
+        '''
+        if line is not None:
+            editor.ensureVisible(line)
+            editor.gotoLine(line)
+
+
+    def goto_next_bad_record(self):
+        '''
+            Moves the caret to the next invalid record, wraps around at the end
+            Args:
+                None
+            Returns:
+                None
+        '''
+        self.goto_bad_record(self.document.next_bad_line(editor.lineFromPosition(editor.getCurrentPos())))
+
+
+    def goto_previous_bad_record(self):
+        '''
+            Moves the caret to the previous invalid record, wraps around at the start
+            Args:
+                None
+            Returns:
+                None
+        '''
+        self.goto_bad_record(self.document.previous_bad_line(editor.lineFromPosition(editor.getCurrentPos())))
+
+
+    def build_image(self):
+        '''
+            Builds the binary image of the current document, saves it next to the document
+            and shows the segment map in a new document
+            Args:
+                None
+            Returns:
+                None
+        '''
+        filename = notepad.getCurrentFilename()
+        if not os.path.isabs(filename):
+            notepad.messageBox('The document needs to be saved first', 'Build image')
+            return
+        image, errors = intel_hex.build_image(editor.getText().encode('ascii', 'replace'))
+        bin_path = os.path.splitext(filename)[0] + '.bin'
+        image.write_bin(bin_path)
+        report = '{}\n\n{}'.format(bin_path, image.report())
+        if errors:
+            report += '\n\n{} invalid records have been skipped'.format(len(errors))
+        notepad.new()
+        editor.setText(report)
 
 
     def check_lexer(self):
@@ -115,6 +232,17 @@ class IHEX_VALIDATOR:
                 None
         '''
         self.document_is_of_interest = notepad.getLanguageName(notepad.getLangType()) == 'Intel HEX'
+        # the annotations left from the last visit are compared with the new ones and
+        # only those no longer needed get removed, other scripts' annotations are kept
+        buffer_id = notepad.getCurrentBufferID()
+        self.annotations = self.buffer_annotations.get(buffer_id, {})
+        self.needs_validation = True
+        if not self.document_is_of_interest and self.annotations:
+            # the language has been changed
+            for line in self.annotations:
+                editor.annotationSetText(line, None)
+            self.annotations = {}
+            del self.buffer_annotations[buffer_id]
         if self.debug_mode:
             print('document is of interest:{}'.format(self.document_is_of_interest))
 
@@ -131,18 +259,65 @@ class IHEX_VALIDATOR:
         self.check_lexer()
 
 
+    def on_modified(self, args):
+        '''
+            Callback which gets called every time the document gets modified.
+            Validates the touched records only, the annotations of the following
+            lines have been moved by scintilla along with their lines.
+            Args:
+                modificationType, position and linesAdded are of interest
+            Returns:
+                None
+        '''
+        if not self.document_is_of_interest or self.needs_validation:
+            return
+        if args['modificationType'] & (MODIFICATIONFLAGS.INSERTTEXT | MODIFICATIONFLAGS.DELETETEXT):
+            first_line = editor.lineFromPosition(args['position'])
+            lines_added = args['linesAdded']
+            old_count = 1 + max(0, -lines_added)
+            new_count = 1 + max(0, lines_added)
+            new_lines = [editor.getLine(line) for line in range(first_line, first_line + new_count)]
+            changed = self.document.replace_lines(first_line, old_count, new_lines)
+
+            end_line = first_line + old_count
+            self.annotations = dict((line + lines_added if line >= end_line else line, text)
+                                    for line, text in self.annotations.items()
+                                    if line <= first_line or line >= end_line)
+            self.buffer_annotations[notepad.getCurrentBufferID()] = self.annotations
+            if changed or lines_added:
+                self.annotated_range = None
+
+
+    def on_filebeforeclose(self, args):
+        '''
+            Callback which gets called every time a document is about to be closed.
+            Forgets the annotations set in that document.
+            Args:
+                bufferID is of interest
+            Returns:
+                None
+        '''
+        self.buffer_annotations.pop(args['bufferID'], None)
+
+
     def on_updateui(self, args):
         '''
             Callback which gets called every time scintilla
             (aka the editor) changed something within the document.
-            Triggers the styling function if the document is of interest.
+            Validates the document, if needed, and annotates the visible area
+            if the document is of interest. Moving the caret costs nothing.
             Args:
-                provided by scintilla but none are of interest
+                updated is of interest
             Returns:
                 None
         '''
-        if self.document_is_of_interest:
-            self.calculate_checksum()
+        if not self.document_is_of_interest:
+            return
+        if self.needs_validation:
+            self.validate_document()
+        elif args and not args['updated'] & (self.SC_UPDATE_CONTENT | self.SC_UPDATE_V_SCROLL):
+            return
+        self.annotate_visible_lines()
 
 
     def on_langchanged(self, args):
@@ -169,7 +344,7 @@ class IHEX_VALIDATOR:
         '''
         self.on_bufferactivated(None)
         self.on_updateui(None)
-        
 
-IHEX_VALIDATOR().main()
-        
\ No newline at end of file
+
+ihex_validator = IHEX_VALIDATOR()
+ihex_validator.main()
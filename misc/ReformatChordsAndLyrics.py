@@ -1,45 +1,70 @@
-from Npp import editor
-import re
+'''
+    Reformats chords over lyrics to ChordPro or, the other way around, ChordPro to chords over lyrics.
+    Only the selected lines get reformatted if there is a selection, otherwise the whole document.
+    The conversion itself is done by chord_lyrics.py, which needs to be in the same directory.
+
+    If BATCH_FOLDER is set, the files of that folder are converted into
+    BATCH_OUTPUT_FOLDER instead and the current document stays as it is.
+'''
+from Npp import editor, notepad, MESSAGEBOXFLAGS
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import chord_lyrics
 
 # it is assumed that chords and text is correctly aligned
 # and that the ordering is always one line of chords followed by one line of lyric
-# reformats from 
+# reformats from
 #       A    B       C
 #       Some text to sing
 # to
-# [A]Some [B] text to [C] sing
-
-in_text_line = False
-new_content = ''
-chords = []
-
-for line in editor.getText().splitlines():
-
-    if line.strip():  # skip empty lines
-        
-        if in_text_line:
-            
-            if len(chords) == 1:
-                new_content += '[{0}]{1}\r\n'.format(chords[0][1], line)
-            else:
-                for i, chord in enumerate(chords[:-1]):
-                    _line = line[chords[i][0][0]:chords[i+1][0][0]]
-                    new_content += '[{0}]{1} '.format(chords[i][1], _line).replace('[]','')
-                    
-                # last element in list
-                _line = line[chords[-1][0][0]:]
-                new_content += '[{0}]{1}\r\n'.format(chords[-1][1], _line).replace('[]','')
-
-            # next line must be a chord line
-            chords = []  # .clear()
-            in_text_line = False
-            
-        else:  # in chord lines
-            chords = [(m.span(), m.group()) for m in re.finditer('[^ ]+', line)]
-            # add a dummy entry if the chord does not start at the beginning of the line
-            if chords[0][0][0] > 0:
-                chords.insert(0, ((0,0), ''))
-            # next line must be a text line
-            in_text_line = True
-        
-editor.setText(new_content)
\ No newline at end of file
+# [A]Some [B]text to [C]sing
+
+# a folder whose songbooks get converted, subfolders are not included
+BATCH_FOLDER = ''
+# where the converted songbooks are written to, a subfolder converted of BATCH_FOLDER if empty
+BATCH_OUTPUT_FOLDER = ''
+# e.g. r'C:\Python312\pythonw.exe', lets the batch mode convert the files in parallel,
+# an empty string converts them one after another
+PYTHON_EXECUTABLE = ''
+
+
+def convert_document(reverse):
+    # the selected lines, or all of them, are replaced as one target
+    if editor.getSelectionEmpty():
+        first_line, last_line = 0, editor.getLineCount() - 1
+    else:
+        first_line = editor.lineFromPosition(editor.getSelectionStart())
+        last_line = editor.lineFromPosition(editor.getSelectionEnd())
+    start = editor.positionFromLine(first_line)
+    end = editor.getLineEndPosition(last_line)
+    eol = ('\r\n', '\r', '\n')[editor.getEOLMode()]
+
+    editor.setTargetRange(start, end)
+    editor.replaceTarget(chord_lyrics.convert(editor.getTextRange(start, end), reverse, eol))
+    if not editor.getSelectionEmpty():
+        editor.setSel(editor.getTargetStart(), editor.getTargetEnd())
+
+
+def convert_folder(reverse):
+    output_folder = BATCH_OUTPUT_FOLDER or os.path.join(BATCH_FOLDER, 'converted')
+    if PYTHON_EXECUTABLE:
+        multiprocessing.set_executable(PYTHON_EXECUTABLE)
+        with ProcessPoolExecutor() as executor:
+            converted = chord_lyrics.convert_folder(BATCH_FOLDER, output_folder, reverse, executor)
+    else:
+        converted = chord_lyrics.convert_folder(BATCH_FOLDER, output_folder, reverse)
+    for path, lines in converted:
+        print('{}: {} lines'.format(path, lines))
+
+
+answer = notepad.messageBox('Convert chords over lyrics to ChordPro?\n\n'
+                            'No converts ChordPro to chords over lyrics.',
+                            '',
+                            MESSAGEBOXFLAGS.YESNOCANCEL)
+if answer != MESSAGEBOXFLAGS.RESULTCANCEL:
+    reverse = answer == MESSAGEBOXFLAGS.RESULTNO
+    if BATCH_FOLDER:
+        convert_folder(reverse)
+    else:
+        convert_document(reverse)
@@ -13,9 +13,23 @@
     v0.3 - introduced two different kind of filters
             combined_filters = sum of all defined characters per line
             unique_filters = list of the sum of each configured character per line
+    v0.4 - the tree is read once, using a stack of the open folders (see tree_aggregator.py),
+           and only the folder lines are replaced instead of the whole text.
+    v0.5 - filters are configured per file extension (FILTER_SETS) and counted in one scan per line,
+           BATCH processes the open documents or the files of a folder whose extension is in
+           FILTER_SETS, in parallel if PYTHON_EXECUTABLE is set, and writes the results back to disk.
+    v0.6 - LIVE shows the counts as annotations, which follow the edits of the document
+           without counting the whole tree again.
+    v0.7 - LIVE is limited to the document current when the script runs and to those
+           with an extension in LIVE_EXTENSIONS, only its own annotations get removed.
 
 '''
-from Npp import editor, notepad, MESSAGEBOXFLAGS
+from Npp import (editor, notepad, MESSAGEBOXFLAGS, NOTIFICATION, SCINTILLANOTIFICATION,
+                 MODIFICATIONFLAGS, ANNOTATIONVISIBLE)
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import tree_aggregator
 
 # example test data
 # work
@@ -75,113 +89,182 @@ from Npp import editor, notepad, MESSAGEBOXFLAGS
         # aaaaa
         # qqqqq
 
-class Node:
+# filters per lowercase file extension, the ones of '*' are used for all other extensions,
+# except by BATCH, which only writes files with an extension configured here
+#   combined_filters = sum of all defined characters per line
+#   unique_filters = list of the sum of each configured character per line
+FILTER_SETS = {
+    '*': tree_aggregator.FilterSet(combined_filters=['#', '×'], unique_filters=['€', '$']),
+}
+# '' processes the current document, 'open' all open documents whose extension has a filter set
+# and any other value is taken as a folder whose files having such an extension get processed
+BATCH = ''
+# e.g. r'C:\Python312\pythonw.exe', lets the batch mode process the files in parallel,
+# an empty string processes them one after another
+PYTHON_EXECUTABLE = ''
+# True shows the counts as annotations below the folder lines and keeps them up to date
+# while the documents get edited, the documents themselves are not modified.
+# Only the document which is current when the script runs and the documents with one of the
+# LIVE_EXTENSIONS, e.g. ['.tree'], are handled, other annotations are left as they are
+LIVE = False
+LIVE_EXTENSIONS = []
+
+
+def process_current_document(with_filters):
+    filters = tree_aggregator.filters_for_path(notepad.getCurrentFilename(), FILTER_SETS)
+    results = tree_aggregator.aggregate(tree_aggregator.split_lines(editor.getText()),
+                                        filters)
+
+    # only the folder lines get replaced, as one undo action
+    editor.beginUndoAction()
+    for line, text, _sum, _combined_filters, _unique_filters in results:
+        editor.setTargetRange(editor.positionFromLine(line), editor.getLineEndPosition(line))
+        editor.replaceTarget(tree_aggregator.format_result(text,
+                                                           _sum,
+                                                           _combined_filters,
+                                                           _unique_filters,
+                                                           with_filters))
+    editor.endUndoAction()
+
+
+def process_batch(with_filters):
+    # the files are read and written as utf-8
+    if BATCH == 'open':
+        documents = dict((path, buffer_id) for path, buffer_id, index, view in notepad.getFiles()
+                         if os.path.isfile(path)
+                         and tree_aggregator.filters_for_path(path, FILTER_SETS, False))
+        # unsaved changes of the processed documents would be lost by reloading them,
+        # the other documents are left as they are
+        current_buffer_id = notepad.getCurrentBufferID()
+        for buffer_id in documents.values():
+            notepad.activateBufferID(buffer_id)
+            if editor.getModify():
+                notepad.save()
+        notepad.activateBufferID(current_buffer_id)
+        paths = sorted(documents)
+    else:
+        paths = tree_aggregator.folder_files(BATCH)
+
+    if PYTHON_EXECUTABLE:
+        multiprocessing.set_executable(PYTHON_EXECUTABLE)
+        with ProcessPoolExecutor() as executor:
+            processed = tree_aggregator.process_files(paths, FILTER_SETS, with_filters, executor)
+    else:
+        processed = tree_aggregator.process_files(paths, FILTER_SETS, with_filters)
+
+    for path, folders in processed:
+        if BATCH == 'open':
+            notepad.reloadFile(path, False)
+        print('{}: {} folder lines'.format(path, folders))
+
+
+class LIVE_TREE:
     '''
-        helper class which counts the items and updates the parents recursively.
+        Keeps a tree_aggregator.LiveTree of the current document and
+        shows the counts, which changed, as annotations.
+        Only the annotations set by itself get changed or removed.
     '''
-    def __init__(self, line, parent=None):
-        '''
-            store on which line the parent is and initialze the object itself
-        '''
-        self.line = line
-        self.parent = parent
-        self.items = 0
-        self.combined_filters = 0
-        self.unique_filters = []
-
-    def add(self, combined_filters, unique_filters=None):
-        '''
-            add the current found item and call its parents recursively
-        '''
-        if self.parent:
-            self.parent.add(combined_filters, unique_filters)
-        self.items += 1
-        if combined_filters:
-            self.combined_filters += combined_filters
-        if unique_filters:
-            if not self.unique_filters:
-                self.unique_filters = unique_filters
-            else:
-                self.unique_filters = [sum(i) for i in zip(self.unique_filters, unique_filters)]
-
-
-    def result(self):
-        '''
-            return the calculated items for each parent together with the parent line
-        '''
-        if self.parent:
-            self.parent.result()
-        return self.line, self.items, self.combined_filters, self.unique_filters
-
-
-# Calculate the level
-def get_level(line): return len(line) - len(line.lstrip())
-
-
-lines = editor.getText().splitlines()
-max_lines = len(lines)-1
-current_line = 0
-level_stack = []
-save_popped_levels = []
-combined_filters = ['#', '×']
-unique_filters = ['€', '$']
-
-# loop through all lines and build the needed Node objects
-while current_line < max_lines:
-    if lines[current_line].strip() != '':
-        current_level = get_level(lines[current_line])
-
-        if current_level >= get_level(lines[current_line+1]):
-            found_additional_filters = [lines[current_line].count(x) for x in combined_filters]
-            found_unique_filters = [lines[current_line].count(u) for u in unique_filters]
-            level_stack[-1][0].add(sum(found_additional_filters), found_unique_filters)
+    def __init__(self, with_filters):
+        self.with_filters = with_filters
+        # None if the current document is not handled
+        self.tree = None
+        # buffers handled besides those with one of the LIVE_EXTENSIONS
+        self.buffers = set([notepad.getCurrentBufferID()])
+        # bufferID -> (line -> text of the annotations set by this script),
+        # annotations belong to the document and stay when another one gets activated
+        self.buffer_annotations = {}
+        # the one of the current document
+        self.annotations = {}
+        editor.callbackSync(self.on_modified, [SCINTILLANOTIFICATION.MODIFIED])
+        editor.callbackSync(self.on_updateui, [SCINTILLANOTIFICATION.UPDATEUI])
+        notepad.callback(self.on_buffer_activated, [NOTIFICATION.BUFFERACTIVATED])
+        notepad.callback(self.on_filebeforeclose, [NOTIFICATION.FILEBEFORECLOSE])
+        self.on_buffer_activated({})
+
+
+    def render(self):
+        # after a rebuild every folder line is compared, otherwise only the changed ones
+        restructured, changed = self.tree.take_changes()
+        if restructured:
+            annotations = dict((node.line, tree_aggregator.format_counts(node.items,
+                                                                         node.combined,
+                                                                         node.unique,
+                                                                         self.with_filters))
+                               for node in self.tree.folders)
+            for line in self.annotations:
+                if line not in annotations:
+                    editor.annotationSetText(line, None)
         else:
-            if current_level == 0:
-                level_stack = []
-                p = Node(current_line, None)
-            else:
-                while True:
-                    if level_stack[-1][1] >= current_level:
-                        save_popped_levels.append(level_stack.pop())
-                    else:
-                        break
-                p = Node(current_line, level_stack[-1][0])
-
-            level_stack.append((p, current_level))
-
-    current_line +=1
-
-# last line
-prev_level = current_level
-if lines[current_line].strip() != '':
-    if prev_level == get_level(lines[current_line]):
-        found_additional_filters = [lines[current_line].count(x) for x in combined_filters]
-        found_unique_filters = [lines[current_line].count(u) for u in unique_filters]
-        level_stack[-1][0].add(sum(found_additional_filters), found_unique_filters)
-
-# create a list of all Node objects
-results = [x[0].result() for x in level_stack]
-results.extend([x[0].result() for x in save_popped_levels])
-
-# reformat the resulting content
-if notepad.messageBox('Should additional filtering be applied?',
-                      '',
-                      MESSAGEBOXFLAGS.YESNO) == MESSAGEBOXFLAGS.RESULTYES:
-    for line, _sum, _additional_filters, _unique_filters in sorted(results):
-        __unique_filters = ', '.join([str(x) for x in _unique_filters])
-        __unique_filters = ', ' + __unique_filters if __unique_filters else ''
-        lines[line] = '{0:<{1}}({2}{3}{4}{5})'.format(lines[line][:80],
-                                                      80, 
-                                                      _sum,
-                                                      ', ',
-                                                      _additional_filters,
-                                                      __unique_filters
-                                                      )
+            annotations = dict(self.annotations)
+            for node in changed:
+                annotations[node.line] = tree_aggregator.format_counts(node.items,
+                                                                       node.combined,
+                                                                       node.unique,
+                                                                       self.with_filters)
+        for line, text in annotations.items():
+            if self.annotations.get(line) != text:
+                editor.annotationSetText(line, text)
+        self.annotations = annotations
+        self.buffer_annotations[notepad.getCurrentBufferID()] = annotations
+
+
+    def on_modified(self, args):
+        if self.tree is None:
+            return
+        if args['modificationType'] & (MODIFICATIONFLAGS.INSERTTEXT | MODIFICATIONFLAGS.DELETETEXT):
+            first_line = editor.lineFromPosition(args['position'])
+            lines_added = args['linesAdded']
+            old_count = 1 + max(0, -lines_added)
+            new_count = 1 + max(0, lines_added)
+            new_lines = [editor.getLine(line) for line in range(first_line, first_line + new_count)]
+            self.tree.replace_lines(first_line, old_count, new_lines)
+
+            # scintilla has moved the annotations of the following lines along with them
+            end_line = first_line + old_count
+            self.annotations = dict((line + lines_added if line >= end_line else line, text)
+                                    for line, text in self.annotations.items()
+                                    if line <= first_line or line >= end_line)
+            self.buffer_annotations[notepad.getCurrentBufferID()] = self.annotations
+
+
+    def on_updateui(self, args):
+        if self.tree is not None:
+            self.render()
+
+
+    def is_handled(self, buffer_id, path):
+        return (buffer_id in self.buffers or
+                os.path.splitext(path)[1].lower() in LIVE_EXTENSIONS)
+
+
+    def on_filebeforeclose(self, args):
+        self.buffers.discard(args['bufferID'])
+        self.buffer_annotations.pop(args['bufferID'], None)
+
+
+    def on_buffer_activated(self, args):
+        # the annotations left from the last visit are updated by the first render
+        self.tree = None
+        buffer_id = notepad.getCurrentBufferID()
+        path = notepad.getCurrentFilename()
+        self.annotations = self.buffer_annotations.get(buffer_id, {})
+        if not self.is_handled(buffer_id, path):
+            return
+        filters = tree_aggregator.filters_for_path(path, FILTER_SETS)
+        if filters is None:
+            return
+        self.tree = tree_aggregator.LiveTree(filters)
+        self.tree.rebuild(editor.getText())
+        editor.annotationSetVisible(ANNOTATIONVISIBLE.STANDARD)
+        self.render()
+
+
+with_filters = notepad.messageBox('Should additional filtering be applied?',
+                                  '',
+                                  MESSAGEBOXFLAGS.YESNO) == MESSAGEBOXFLAGS.RESULTYES
+if LIVE:
+    live_tree = LIVE_TREE(with_filters)
+elif BATCH:
+    process_batch(with_filters)
 else:
-    for line, _sum, _ in sorted(results):
-        lines[line] = '{0:<{1}}({2})'.format(lines[line][:80],
-                                             80, 
-                                             _sum)
-    
-# set the new content
-editor.setText('\r\n'.join(lines))
+    process_current_document(with_filters)
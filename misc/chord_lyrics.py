@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+'''
+    The conversions used by ReformatChordsAndLyrics.py, it needs to be in the same directory.
+
+    It has no dependency on npp.
+    Both directions are generators, lines go in and converted lines come out,
+    so a songbook is never held as a whole unless the caller does it.
+
+        A    B       C
+        Some text to sing
+    is converted to
+        [A]Some [B]text to [C]sing
+    and back.
+
+    Running it directly, e.g. python chord_lyrics.py [number of lines],
+    checks both directions and measures how long a generated songbook takes.
+'''
+import io
+import os
+import re
+import tempfile
+
+# scintilla ends lines with \r\n, \n or \r only, unlike str.splitlines
+_LINE_END = re.compile(r'\r\n|\n|\r')
+_CHORD = re.compile(r'[^ ]+')
+_CHORDPRO_CHORD = re.compile(r'\[([^\]]*)\]')
+
+
+def split_lines(text):
+    '''
+        Splits the text the way scintilla does, without the line endings.
+
+        Args:
+            text = string
+        Returns:
+            list of strings
+    '''
+    return _LINE_END.split(text)
+
+
+def parse_chord_line(line):
+    '''
+        Args:
+            line = string, a non empty line of chords
+        Returns:
+            list of (column, chord) tuples, starting with (0, '')
+            if the first chord is not at the beginning of the line
+    '''
+    chords = [(m.start(), m.group()) for m in _CHORD.finditer(line)]
+    if chords[0][0] > 0:
+        chords.insert(0, (0, ''))
+    return chords
+
+
+def to_chordpro(lines):
+    '''
+        Converts chords over lyrics to ChordPro.
+        It is assumed that chords and lyrics are correctly aligned and that
+        a line of chords is always followed by a line of lyrics, empty lines are skipped.
+
+        Args:
+            lines = iterable of strings, without line endings
+        Yields:
+            strings, one per pair of chord and lyric lines
+    '''
+    chords = None
+    for line in lines:
+        if not line.strip():
+            continue
+        if chords is None:
+            chords = parse_chord_line(line)
+            continue
+
+        # every chord is followed by the lyrics up to the next chord
+        ends = [column for column, _ in chords[1:]] + [None]
+        yield ''.join('[{0}]{1}'.format(chord, line[column:end]) if chord else line[column:end]
+                      for (column, chord), end in zip(chords, ends))
+        chords = None
+
+
+def from_chordpro(lines):
+    '''
+        Converts ChordPro to chords over lyrics.
+        Where chords would touch each other, the lyrics get padded with spaces.
+        Lines without chords, e.g. directives, and empty lines are kept as they are.
+        Lines of chords only result in an empty lyric line, which to_chordpro would skip.
+
+        Args:
+            lines = iterable of strings, without line endings
+        Yields:
+            strings, a chord and a lyric line per line with chords
+    '''
+    for line in lines:
+        if '[' not in line or not _CHORDPRO_CHORD.search(line):
+            yield line
+            continue
+
+        chord_parts = []
+        lyric_parts = []
+        chord_length = lyric_length = 0
+        position = 0
+        for match in _CHORDPRO_CHORD.finditer(line):
+            lyric = line[position:match.start()]
+            lyric_parts.append(lyric)
+            lyric_length += len(lyric)
+            # keep one space after the previous chord
+            padding = ''
+            if chord_length and lyric_length <= chord_length:
+                padding = ' ' * (chord_length + 1 - lyric_length)
+                lyric_parts.append(padding)
+                lyric_length = chord_length + 1
+            chord = match.group(1)
+            chord_parts.append(' ' * (lyric_length - chord_length))
+            chord_parts.append(chord)
+            chord_length = lyric_length + len(chord)
+            position = match.end()
+        rest = line[position:]
+        if padding and not rest:
+            # chords at the end need no lyrics below them
+            lyric_parts.pop()
+        lyric_parts.append(rest)
+
+        yield ''.join(chord_parts)
+        yield ''.join(lyric_parts)
+
+
+def convert(text, reverse=False, eol='\r\n'):
+    '''
+        Args:
+            text = string
+            reverse = boolean, True converts ChordPro to chords over lyrics
+            eol = string, the line ending of the result
+        Returns:
+            string, without a line ending after the last line
+    '''
+    converted = (from_chordpro if reverse else to_chordpro)(split_lines(text))
+    output = io.StringIO()
+    for line in converted:
+        output.write(line)
+        output.write(eol)
+    return output.getvalue()[:-len(eol) or None]
+
+
+def convert_file(source, target, reverse=False, eol='\r\n', encoding='utf-8'):
+    '''
+        Converts a file line by line into another one.
+
+        Args:
+            source = string, path of the songbook
+            target = string, path of the converted songbook, replaced if it exists
+            reverse = boolean, True converts ChordPro to chords over lyrics
+            eol = string
+            encoding = string
+        Returns:
+            tuple of the target path and the number of lines written
+    '''
+    directory = os.path.dirname(os.path.abspath(target))
+    handle, temp_path = tempfile.mkstemp(dir=directory)
+    written = 0
+    try:
+        with open(source, encoding=encoding, newline='') as f_in, \
+                open(handle, 'w', encoding=encoding, newline='') as f_out:
+            lines = (line.rstrip('\r\n') for line in f_in)
+            for line in (from_chordpro if reverse else to_chordpro)(lines):
+                f_out.write(line)
+                f_out.write(eol)
+                written += 1
+        os.replace(temp_path, target)
+    except Exception:
+        os.remove(temp_path)
+        raise
+    return target, written
+
+
+def convert_folder(folder, output_folder, reverse=False, executor=None, eol='\r\n', encoding='utf-8'):
+    '''
+        Converts every file of a folder, subfolders are not included,
+        into a file with the same name in output_folder.
+
+        Args:
+            folder = string
+            output_folder = string, created if needed
+            reverse = boolean
+            executor = concurrent.futures.Executor or None to convert the files one after another
+            eol = string
+            encoding = string
+        Returns:
+            list of (target path, number of lines) tuples, sorted by file name
+    '''
+    if not os.path.isdir(output_folder):
+        os.makedirs(output_folder)
+    jobs = sorted((entry.path, os.path.join(output_folder, entry.name))
+                  for entry in os.scandir(folder) if entry.is_file())
+    if executor is None:
+        return [convert_file(source, target, reverse, eol, encoding) for source, target in jobs]
+    futures = [executor.submit(convert_file, source, target, reverse, eol, encoding)
+               for source, target in jobs]
+    return [future.result() for future in futures]
+
+
+def self_test():
+    '''
+        Checks both directions and that they are the inverse of each other.
+
+        Args:
+            None
+        Returns:
+            None
+    '''
+    assert convert('A    B       C\nSome text to sing') == '[A]Some [B]text to [C]sing'
+    assert convert('  Am  G\n\nHello world\r\nC\nSing') == 'He[Am]llo [G]world\r\n[C]Sing'
+    # a chord line without lyrics at the end is dropped
+    assert convert('A\nla\nB', eol='\n') == '[A]la'
+    assert list(from_chordpro(['{title: x}', '', 'He[Am]llo [G]world'])) == [
+        '{title: x}', '', '  Am  G', 'Hello world']
+    # touching chords
+    assert list(from_chordpro(['[Am][G]la [C7]'])) == ['Am G  C7', '   la ']
+
+    songs = ['[A]Some [B]text to [C]sing', 'He[Am]llo [G]world', '[D]Sing', 'no chords [E]', 'x[F#m7]y']
+    for song in songs:
+        assert convert(convert(song, reverse=True)) == song, (song, convert(song, reverse=True))
+    print('conversions are ok')
+
+
+def batch_test():
+    '''
+        Converts a folder of songbooks in worker processes, forth and back.
+
+        Args:
+            None
+        Returns:
+            None
+    '''
+    import shutil
+    from concurrent.futures import ProcessPoolExecutor
+
+    folder = tempfile.mkdtemp()
+    try:
+        songbook = 'A    B       C\r\nSome text to sing\r\n\r\n  Am  G\r\nHello world\r\n'
+        for name in ('a.txt', 'b.txt'):
+            with open(os.path.join(folder, name), 'w', encoding='utf-8', newline='') as f:
+                f.write(songbook)
+        chordpro_folder = os.path.join(folder, 'chordpro')
+        lyrics_folder = os.path.join(folder, 'lyrics')
+        with ProcessPoolExecutor(2) as executor:
+            converted = convert_folder(folder, chordpro_folder, False, executor)
+            assert [(os.path.basename(path), lines) for path, lines in converted] == [
+                ('a.txt', 2), ('b.txt', 2)], converted
+            convert_folder(chordpro_folder, lyrics_folder, True, executor)
+        with open(os.path.join(chordpro_folder, 'b.txt'), encoding='utf-8', newline='') as f:
+            assert f.read() == '[A]Some [B]text to [C]sing\r\nHe[Am]llo [G]world\r\n'
+        with open(os.path.join(lyrics_folder, 'a.txt'), encoding='utf-8', newline='') as f:
+            assert f.read() == songbook.replace('\r\n\r\n', '\r\n')
+        print('batch conversion is ok')
+    finally:
+        shutil.rmtree(folder)
+
+
+def benchmark(line_count=50000):
+    '''
+        Converts a generated songbook of line_count lines to ChordPro and back.
+
+        Args:
+            line_count = integer
+        Returns:
+            None
+    '''
+    import time
+
+    pairs = ['Am      C/G        F          G7   Dm',
+             'Some of the words are sung to these chords here']
+    text = '\r\n'.join(pairs * (line_count // 2))
+
+    started = time.time()
+    chordpro = convert(text)
+    forth = time.time() - started
+    started = time.time()
+    lyrics = convert(chordpro, reverse=True)
+    back = time.time() - started
+    assert lyrics == text, (lyrics[:200], text[:200])
+    print('{} lines converted to ChordPro in {:.3f}s and back in {:.3f}s'.format(
+        len(split_lines(text)), forth, back))
+
+
+if __name__ == '__main__':
+    import sys
+    self_test()
+    batch_test()
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
@@ -0,0 +1,922 @@
+# -*- coding: utf-8 -*-
+'''
+    The intel hex parser used by IntelHexValidator.py, it needs to be in the same directory.
+
+    It has no dependency on npp.
+    HexDocument parses every line of a document once and keeps the result,
+    besides the checks of a single record, checksum, record length and record type,
+    the records are checked in their context: extended address records,
+    overlapping data records and the position of the end-of-file record.
+    The lines with errors are kept sorted, to find the next or previous one by bisection.
+    After an edit only the touched lines are parsed again. The lines of the data,
+    extended address and end-of-file records are kept sorted as well, so that only
+    the records whose context changed get checked again: the edited ones, the next
+    data record, the data records up to the next extended address record if a base
+    address changed and the records between the old and the new end-of-file record.
+
+    build_image streams the data records into a MemoryImage, a sparse memory of
+    sorted segments which get merged when written next to or over each other.
+    It can be exported as binary image and reports its segments, with their crc32,
+    the gaps between them and the ranges written more than once.
+
+    Running it directly, e.g. python intel_hex.py [size in MB],
+    checks the validation of some sample records, builds images of generated
+    hex files with known layouts and measures how long a large image takes.
+'''
+import re
+import zlib
+import binascii
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+DATA = 0
+END_OF_FILE = 1
+EXTENDED_SEGMENT_ADDRESS = 2
+START_SEGMENT_ADDRESS = 3
+EXTENDED_LINEAR_ADDRESS = 4
+START_LINEAR_ADDRESS = 5
+
+# record type -> number of data bytes it must have, None if any number is allowed
+RECORD_DATA_LENGTHS = {
+    DATA: None,
+    END_OF_FILE: 0,
+    EXTENDED_SEGMENT_ADDRESS: 2,
+    START_SEGMENT_ADDRESS: 4,
+    EXTENDED_LINEAR_ADDRESS: 2,
+    START_LINEAR_ADDRESS: 4,
+}
+
+# scintilla ends lines with \r\n, \n or \r only, unlike str.splitlines
+_LINE_END = re.compile(r'(?<=\n)|(?<=\r)(?!\n)')
+
+Record = namedtuple('Record', 'length address type data checksum expected_checksum')
+
+
+class RecordError(ValueError):
+    pass
+
+
+def split_lines(text):
+    '''
+        Splits the text the way scintilla does, there is always one more line than line endings.
+
+        Args:
+            text = string
+        Returns:
+            list of strings
+    '''
+    return _LINE_END.split(text)
+
+
+def parse_record(line):
+    '''
+        Parses a single record, the checksum is calculated but not compared.
+
+        Args:
+            line = string, a single line
+        Returns:
+            Record, None for an empty line
+        Raises:
+            RecordError if it is not a well formed record
+    '''
+    line = line.strip()
+    if not line:
+        return None
+    if not line.startswith(':'):
+        raise RecordError('record does not start with a colon')
+    try:
+        raw = bytes.fromhex(line[1:])
+    except ValueError:
+        raise RecordError('record contains an odd number of digits or other characters than hex digits')
+    if len(raw) < 5:
+        raise RecordError('record is too short')
+    length = raw[0]
+    if len(raw) != length + 5:
+        raise RecordError('record length {} does not match the {} data bytes'.format(length, len(raw) - 5))
+    expected_checksum = -sum(memoryview(raw)[:-1]) & 0xFF
+    return Record(length, raw[1] << 8 | raw[2], raw[3], raw[4:-1], raw[-1], expected_checksum)
+
+
+def parse_line(line):
+    '''
+        Returns:
+            Record, RecordError or None for an empty line
+    '''
+    try:
+        return parse_record(line)
+    except RecordError as e:
+        return e
+
+
+def record_error(record):
+    '''
+        Checks what can be checked within a single record.
+
+        Args:
+            record = Record, RecordError or None
+        Returns:
+            string, the error message, or None
+    '''
+    if record is None:
+        return None
+    if isinstance(record, RecordError):
+        return str(record)
+    if record.type not in RECORD_DATA_LENGTHS:
+        return 'unknown record type {:02X}'.format(record.type)
+    expected_length = RECORD_DATA_LENGTHS[record.type]
+    if expected_length is not None and record.length != expected_length:
+        return 'record type {:02X} needs {} data bytes'.format(record.type, expected_length)
+    if record.checksum != record.expected_checksum:
+        return 'checksum {:02X} expected'.format(record.expected_checksum)
+    return None
+
+
+MISSING_END_OF_FILE = 'end-of-file record is missing'
+
+
+def base_address_of(record):
+    '''
+        Args:
+            record = Record, RecordError or None
+        Returns:
+            integer, the base address set by an extended address record, None for other records
+    '''
+    if isinstance(record, Record) and record.length == 2:
+        if record.type == EXTENDED_SEGMENT_ADDRESS:
+            return (record.data[0] << 8 | record.data[1]) << 4
+        if record.type == EXTENDED_LINEAR_ADDRESS:
+            return (record.data[0] << 8 | record.data[1]) << 16
+    return None
+
+
+def _check_context(records, first_line, stop_line, base_address, previous, end_of_file_line, errors):
+    '''
+        Checks the records from first_line up to, not including, stop_line in their context.
+
+        Args:
+            records = list of Record, RecordError or None, one per line
+            first_line, stop_line = integer, the lines to be checked
+            base_address = integer, the base address in effect at first_line
+            previous = (start, end) tuple of the data record before first_line, or None
+            end_of_file_line = integer, the end-of-file record before first_line, or None
+            errors = dict of line number -> error message, the errors found get added
+        Returns:
+            None
+    '''
+    for line in range(first_line, stop_line):
+        record = records[line]
+        if record is None:
+            continue
+        if end_of_file_line is not None:
+            errors[line] = 'record after the end-of-file record in line {}'.format(end_of_file_line + 1)
+            continue
+        if not isinstance(record, Record):
+            continue
+        if record.type == END_OF_FILE:
+            end_of_file_line = line
+        elif record.type == DATA and record.length:
+            start = base_address + record.address
+            end = start + record.length
+            if record.address + record.length > 0x10000:
+                errors[line] = 'data exceeds the 64k boundary of its base address {:08X}'.format(base_address)
+            elif previous is not None and start < previous[1] and end > previous[0]:
+                errors[line] = 'data {:08X}-{:08X} overlaps the previous record {:08X}-{:08X}'.format(
+                    start, end - 1, previous[0], previous[1] - 1)
+            previous = (start, end)
+        else:
+            new_base_address = base_address_of(record)
+            if new_base_address is not None:
+                base_address = new_base_address
+
+
+def _last_record_line(records):
+    # usually the last line or one of the few empty lines before it
+    for line in range(len(records) - 1, -1, -1):
+        if records[line] is not None:
+            return line
+    return None
+
+
+def context_errors(records):
+    '''
+        Checks the records in their context, walks over the already parsed records only.
+
+        Args:
+            records = list of Record, RecordError or None, one per line
+        Returns:
+            dict of line number -> error message
+    '''
+    errors = {}
+    _check_context(records, 0, len(records), 0, None, None, errors)
+    if not any(isinstance(record, Record) and record.type == END_OF_FILE for record in records):
+        last_record_line = _last_record_line(records)
+        if last_record_line is not None:
+            errors.setdefault(last_record_line, MISSING_END_OF_FILE)
+    return errors
+
+
+def _replace_in_index(index, first_line, end_line, lines_added, new_lines):
+    '''
+        Replaces the line numbers of the replaced lines within a sorted index,
+        the following ones move along with their lines.
+
+        Args:
+            index = sorted list of line numbers, modified in place
+            first_line, end_line = integer, the replaced lines, end_line is not included
+            lines_added = integer, by how many lines the document has grown
+            new_lines = sorted list of line numbers, within the new lines
+        Returns:
+            None
+    '''
+    i = bisect_left(index, first_line)
+    j = bisect_left(index, end_line, i)
+    if lines_added:
+        index[i:] = new_lines + [line + lines_added for line in index[j:]]
+    else:
+        index[i:j] = new_lines
+
+
+class HexDocument:
+    '''
+        The parsed records of every line of a document and its errors.
+    '''
+    def __init__(self):
+        # Record, RecordError or None of every line
+        self.records = [None]
+        # the result of record_error of every line
+        self.record_errors = [None]
+        # line number -> error message of the context checks
+        self.context = {}
+        # the line the end-of-file record is missing after, or None
+        self.missing_end_of_file_line = None
+        # sorted line numbers of the data records with data, of the records setting a base address
+        # and of the end-of-file records
+        self.data_lines = []
+        self.address_lines = []
+        self.end_of_file_lines = []
+        # line number -> error message
+        self.errors = {}
+        # sorted line numbers of self.errors
+        self.bad_lines = []
+
+    @staticmethod
+    def _index_entries(records, first_line):
+        # the entries of the sorted indexes for records starting at first_line
+        data_lines = []
+        address_lines = []
+        end_of_file_lines = []
+        for line, record in enumerate(records, first_line):
+            if isinstance(record, Record):
+                if record.type == DATA:
+                    if record.length:
+                        data_lines.append(line)
+                elif record.type == END_OF_FILE:
+                    end_of_file_lines.append(line)
+                elif base_address_of(record) is not None:
+                    address_lines.append(line)
+        return data_lines, address_lines, end_of_file_lines
+
+    def parse(self, text):
+        '''
+            Parses the whole document.
+
+            Args:
+                text = string, the content of the document
+            Returns:
+                set of the line numbers whose error changed
+        '''
+        self.records = [parse_line(line) for line in split_lines(text)]
+        self.record_errors = [record_error(record) for record in self.records]
+        self.data_lines, self.address_lines, self.end_of_file_lines = self._index_entries(self.records, 0)
+        return self.update_errors()
+
+    def replace_lines(self, first_line, old_count, new_lines):
+        '''
+            Replaces old_count lines, starting at first_line, with the new lines,
+            only those get parsed. The errors of the following lines move along with them,
+            only the records whose context changed get checked again.
+
+            Args:
+                first_line = integer, 0-based line number
+                old_count = integer, number of lines to be replaced
+                new_lines = list of strings, the new content of those lines
+            Returns:
+                set of the line numbers, after the replacement, whose error changed,
+                the new lines count as changed if they have an error
+        '''
+        end_line = first_line + old_count
+        new_end_line = first_line + len(new_lines)
+        lines_added = len(new_lines) - old_count
+
+        def moved(line):
+            # where a line is after the replacement, None if it has been replaced
+            if line is None or line < first_line:
+                return line
+            return line + lines_added if line >= end_line else None
+
+        records = [parse_line(line) for line in new_lines]
+        base_address_changed = any(base_address_of(record) is not None
+                                   for record in self.records[first_line:end_line] + records)
+        old_end_of_file_line = self.end_of_file_lines[0] if self.end_of_file_lines else None
+
+        self.records[first_line:end_line] = records
+        self.record_errors[first_line:end_line] = [record_error(record) for record in records]
+        for index, entries in zip((self.data_lines, self.address_lines, self.end_of_file_lines),
+                                  self._index_entries(records, first_line)):
+            _replace_in_index(index, first_line, end_line, lines_added, entries)
+        _replace_in_index(self.bad_lines, first_line, end_line, lines_added, [])
+        self.errors = dict((moved(line), error) for line, error in self.errors.items()
+                           if moved(line) is not None)
+        self.context = dict((moved(line), error) for line, error in self.context.items()
+                            if moved(line) is not None)
+        missing_end_of_file_line = moved(self.missing_end_of_file_line)
+
+        # the lines whose context might have changed
+        stop_line = new_end_line
+        if base_address_changed:
+            # the data records up to the next extended address record
+            i = bisect_left(self.address_lines, new_end_line)
+            stop_line = self.address_lines[i] if i < len(self.address_lines) else len(self.records)
+        # the data record after them has got another previous one
+        i = bisect_left(self.data_lines, stop_line)
+        if i < len(self.data_lines):
+            stop_line = self.data_lines[i] + 1
+        end_of_file_line = self.end_of_file_lines[0] if self.end_of_file_lines else None
+        after_end_of_file_line = len(self.records)
+        if end_of_file_line is None or old_end_of_file_line is None:
+            if end_of_file_line != old_end_of_file_line:
+                stop_line = len(self.records)
+        elif first_line <= old_end_of_file_line < end_line or first_line <= end_of_file_line < new_end_line:
+            # another end-of-file record, the records between the old and the new one are checked again
+            stop_line = max(stop_line, end_of_file_line + 1, (moved(old_end_of_file_line) or 0) + 1)
+        if end_of_file_line is not None and end_of_file_line != old_end_of_file_line:
+            # the records after it are reported with its line number
+            after_end_of_file_line = max(end_of_file_line + 1, stop_line)
+        stop_line = min(stop_line, len(self.records))
+        self.check_context(first_line, stop_line)
+        self.check_context(after_end_of_file_line, len(self.records))
+
+        candidates = set(range(first_line, stop_line))
+        candidates.update(range(after_end_of_file_line, len(self.records)))
+        if missing_end_of_file_line is not None:
+            candidates.add(missing_end_of_file_line)
+            if (not first_line <= missing_end_of_file_line < stop_line and
+                    self.context.get(missing_end_of_file_line) == MISSING_END_OF_FILE):
+                del self.context[missing_end_of_file_line]
+        self.missing_end_of_file_line = None
+        if end_of_file_line is None:
+            self.missing_end_of_file_line = _last_record_line(self.records)
+            if self.missing_end_of_file_line is not None:
+                self.context.setdefault(self.missing_end_of_file_line, MISSING_END_OF_FILE)
+                candidates.add(self.missing_end_of_file_line)
+        return self.update_lines(candidates)
+
+    def check_context(self, first_line, stop_line):
+        '''
+            Checks the context of the records from first_line up to, not including, stop_line,
+            the state before first_line is taken from the sorted indexes.
+
+            Args:
+                first_line, stop_line = integer, line numbers
+            Returns:
+                None
+        '''
+        for line in range(first_line, stop_line):
+            self.context.pop(line, None)
+        i = bisect_left(self.address_lines, first_line)
+        base_address = base_address_of(self.records[self.address_lines[i - 1]]) if i else 0
+        previous = None
+        i = bisect_left(self.data_lines, first_line)
+        if i:
+            line = self.data_lines[i - 1]
+            record = self.records[line]
+            j = bisect_left(self.address_lines, line)
+            start = (base_address_of(self.records[self.address_lines[j - 1]]) if j else 0) + record.address
+            previous = (start, start + record.length)
+        end_of_file_line = None
+        if self.end_of_file_lines and self.end_of_file_lines[0] < first_line:
+            end_of_file_line = self.end_of_file_lines[0]
+        _check_context(self.records, first_line, stop_line, base_address, previous, end_of_file_line, self.context)
+
+    def update_lines(self, lines):
+        '''
+            Merges the record errors and the context errors of the given lines into self.errors.
+
+            Args:
+                lines = iterable of line numbers
+            Returns:
+                set of the line numbers whose error changed
+        '''
+        changed = set()
+        for line in lines:
+            error = self.record_errors[line]
+            if error is None:
+                error = self.context.get(line)
+            if error != self.errors.get(line):
+                changed.add(line)
+                if error is None:
+                    del self.errors[line]
+                else:
+                    self.errors[line] = error
+        if len(changed) > 64:
+            self.bad_lines = sorted(self.errors)
+        else:
+            for line in changed:
+                i = bisect_left(self.bad_lines, line)
+                has_error = line in self.errors
+                if i < len(self.bad_lines) and self.bad_lines[i] == line:
+                    if not has_error:
+                        del self.bad_lines[i]
+                elif has_error:
+                    self.bad_lines.insert(i, line)
+        return changed
+
+    def update_errors(self):
+        '''
+            Checks all parsed records.
+
+            Returns:
+                set of the line numbers whose error changed
+        '''
+        self.context = context_errors(self.records)
+        self.missing_end_of_file_line = None
+        if not self.end_of_file_lines:
+            self.missing_end_of_file_line = _last_record_line(self.records)
+        errors = dict(self.context)
+        for line, error in enumerate(self.record_errors):
+            if error is not None:
+                errors[line] = error
+        changed = set(line for line in set(errors) | set(self.errors)
+                      if errors.get(line) != self.errors.get(line))
+        self.errors = errors
+        self.bad_lines = sorted(errors)
+        return changed
+
+    def next_bad_line(self, line):
+        '''
+            Args:
+                line = integer, 0-based line number
+            Returns:
+                integer, the next line with an error, wrapping around, or None
+        '''
+        if not self.bad_lines:
+            return None
+        i = bisect_right(self.bad_lines, line)
+        return self.bad_lines[i % len(self.bad_lines)]
+
+    def previous_bad_line(self, line):
+        '''
+            Args:
+                line = integer, 0-based line number
+            Returns:
+                integer, the previous line with an error, wrapping around, or None
+        '''
+        if not self.bad_lines:
+            return None
+        return self.bad_lines[bisect_left(self.bad_lines, line) - 1]
+
+
+class MemoryImage:
+    '''
+        A sparse memory, sorted segments which neither overlap nor touch each other.
+        Data written over existing data replaces it, the range is remembered as overlap,
+        an overlap continuing the previous one extends it, so that writing a run of data
+        at once or record by record results in the same overlaps.
+    '''
+    def __init__(self):
+        # start addresses of the segments, sorted
+        self.starts = []
+        # bytearray of every segment, in the order of self.starts
+        self.segments = []
+        # (start, end) ranges which have been written more than once, end is exclusive
+        self.overlaps = []
+        # from a start segment or start linear address record, if any
+        self.start_address = None
+
+    def write(self, address, data):
+        '''
+            Writes the data, merges all segments it overlaps or touches into one.
+
+            Args:
+                address = integer, absolute address
+                data = bytes
+            Returns:
+                None
+        '''
+        if not data:
+            return
+        starts = self.starts
+        segments = self.segments
+        if segments and address == starts[-1] + len(segments[-1]):
+            # continues the last segment, the usual case
+            segments[-1] += data
+            return
+
+        end = address + len(data)
+        first = bisect_right(starts, address) - 1
+        if first < 0 or starts[first] + len(segments[first]) < address:
+            first += 1
+        last = bisect_right(starts, end) - 1
+        if first > last:
+            starts.insert(first, address)
+            segments.insert(first, bytearray(data))
+            return
+
+        merged_start = min(address, starts[first])
+        merged_end = max(end, starts[last] + len(segments[last]))
+        merged = bytearray(merged_end - merged_start)
+        for start, segment in zip(starts[first:last + 1], segments[first:last + 1]):
+            merged[start - merged_start:start - merged_start + len(segment)] = segment
+            overlap_start = max(start, address)
+            overlap_end = min(start + len(segment), end)
+            if overlap_start < overlap_end:
+                if self.overlaps and self.overlaps[-1][1] == overlap_start:
+                    # continues the last overlap, e.g. the next record of the same run
+                    self.overlaps[-1] = (self.overlaps[-1][0], overlap_end)
+                else:
+                    self.overlaps.append((overlap_start, overlap_end))
+        merged[address - merged_start:end - merged_start] = data
+        starts[first:last + 1] = [merged_start]
+        segments[first:last + 1] = [merged]
+
+    def regions(self):
+        '''
+            Returns:
+                list of (start, end, crc32) tuples of the segments, end is exclusive
+        '''
+        return [(start, start + len(segment), zlib.crc32(segment) & 0xFFFFFFFF)
+                for start, segment in zip(self.starts, self.segments)]
+
+    def gaps(self):
+        '''
+            Returns:
+                list of (start, end) tuples of the unwritten ranges between the segments
+        '''
+        return [(start + len(segment), next_start)
+                for start, segment, next_start in zip(self.starts, self.segments, self.starts[1:])]
+
+    def to_bin(self, fill=0xFF):
+        '''
+            Returns:
+                bytes, the memory from the first to the last written address,
+                the gaps filled with the fill byte
+        '''
+        if not self.segments:
+            return b''
+        image = bytearray([fill]) * (self.starts[-1] + len(self.segments[-1]) - self.starts[0])
+        for start, segment in zip(self.starts, self.segments):
+            image[start - self.starts[0]:start - self.starts[0] + len(segment)] = segment
+        return bytes(image)
+
+    def write_bin(self, path, fill=0xFF):
+        '''
+            Writes the binary image, see to_bin.
+
+            Args:
+                path = string, the binary file
+                fill = integer, the byte used for the gaps
+            Returns:
+                None
+        '''
+        with open(path, 'wb') as f:
+            f.write(self.to_bin(fill))
+
+    def report(self):
+        '''
+            Returns:
+                string, the segment map with the crc32 of every segment, the gaps and the overlaps
+        '''
+        lines = ['segment                 size        crc32']
+        lines.extend('{:08X}-{:08X}  {:>10}  {:08X}'.format(start, end - 1, end - start, crc)
+                     for start, end, crc in self.regions())
+        lines.append('')
+        lines.append('gap                     size')
+        lines.extend('{:08X}-{:08X}  {:>10}'.format(start, end - 1, end - start) for start, end in self.gaps())
+        lines.append('')
+        lines.append('overlap                 size')
+        lines.extend('{:08X}-{:08X}  {:>10}'.format(start, end - 1, end - start) for start, end in self.overlaps)
+        if self.start_address is not None:
+            lines.append('')
+            lines.append('start address {:08X}'.format(self.start_address))
+        return '\n'.join(lines)
+
+
+def _apply_record(image, record_type, address, data, base_address):
+    '''
+        Applies a well formed record to the image.
+
+        Returns:
+            integer, the base address for the following records
+    '''
+    if record_type == DATA:
+        image.write(base_address + address, data)
+    elif record_type == EXTENDED_SEGMENT_ADDRESS:
+        base_address = (data[0] << 8 | data[1]) << 4
+    elif record_type == EXTENDED_LINEAR_ADDRESS:
+        base_address = (data[0] << 8 | data[1]) << 16
+    elif record_type == START_SEGMENT_ADDRESS:
+        image.start_address = ((data[0] << 8 | data[1]) << 4) + (data[2] << 8 | data[3])
+    elif record_type == START_LINEAR_ADDRESS:
+        image.start_address = data[0] << 24 | data[1] << 16 | data[2] << 8 | data[3]
+    return base_address
+
+
+def _build_image_fast(content):
+    '''
+        Decodes all records in one go, which works only if every line is a well formed record.
+
+        Returns:
+            MemoryImage or None if anything is unusual
+    '''
+    try:
+        blob = binascii.unhexlify(content.translate(None, b': \t\r\n'))
+    except (binascii.Error, ValueError):
+        return None
+    image = MemoryImage()
+    base_address = 0
+    # contiguous data is collected first and written to the image in one go
+    run_start = run_end = 0
+    run = bytearray()
+    count = 0
+    position = 0
+    size = len(blob)
+    while position < size:
+        end = position + blob[position] + 5
+        record = blob[position:end]
+        if len(record) < 5 or sum(record) & 0xFF:
+            return None
+        record_type = record[3]
+        if record_type == DATA:
+            address = base_address + (record[1] << 8 | record[2])
+            if address != run_end:
+                image.write(run_start, run)
+                run_start = run_end = address
+                run = bytearray()
+            run += record[4:-1]
+            run_end += record[0]
+        else:
+            expected_length = RECORD_DATA_LENGTHS.get(record_type, -1)
+            if expected_length == -1 or expected_length != record[0]:
+                return None
+            if record_type == END_OF_FILE and end != size:
+                # nothing but the line endings may follow
+                return None
+            base_address = _apply_record(image, record_type, record[1] << 8 | record[2],
+                                         record[4:-1], base_address)
+        position = end
+        count += 1
+    if count != content.count(b':'):
+        return None
+    image.write(run_start, run)
+    return image
+
+
+def build_image(content):
+    '''
+        Builds the memory image of a hex file.
+        Records with an error of their own, e.g. a wrong checksum, and records after
+        the end-of-file record are skipped. Everything else is applied, overlapping data
+        replaces the data written before and is reported by the image, data crossing
+        a 64k boundary continues at the next address and a missing end-of-file record is ignored.
+
+        Args:
+            content = bytes, the hex file
+        Returns:
+            tuple of the MemoryImage and a dict of line number -> error message of the skipped records
+    '''
+    image = _build_image_fast(content)
+    if image is not None:
+        return image, {}
+
+    # something is wrong, go line by line to know where
+    document = HexDocument()
+    document.parse(content.decode('ascii', 'replace'))
+    image = MemoryImage()
+    skipped = {}
+    base_address = 0
+    end_of_file_line = None
+    for line, record in enumerate(document.records):
+        if record is None:
+            continue
+        error = document.record_errors[line]
+        if error is not None:
+            skipped[line] = error
+        elif end_of_file_line is not None:
+            skipped[line] = 'record after the end-of-file record in line {}'.format(end_of_file_line + 1)
+        elif record.type == END_OF_FILE:
+            end_of_file_line = line
+        else:
+            base_address = _apply_record(image, record.type, record.address, record.data, base_address)
+    return image, skipped
+
+
+def format_record(record_type, address, data):
+    '''
+        Args:
+            record_type = integer
+            address = integer, the 16 bit address field
+            data = bytes
+        Returns:
+            bytes, the record with its checksum, without line ending
+    '''
+    raw = bytes(bytearray([len(data), address >> 8 & 0xFF, address & 0xFF, record_type])) + data
+    return b':' + binascii.hexlify(raw + bytes(bytearray([-sum(bytearray(raw)) & 0xFF]))).upper()
+
+
+def generate_hex(layout, record_size=32):
+    '''
+        Generates a hex file, with extended linear address records where needed.
+
+        Args:
+            layout = list of (address, data) tuples, written in this order
+            record_size = integer, max number of data bytes per record
+        Returns:
+            bytes
+    '''
+    record = format_record
+    records = []
+    base_address = None
+    for address, data in layout:
+        offset = 0
+        while offset < len(data):
+            record_address = address + offset
+            # a record must not cross a 64k boundary
+            chunk = data[offset:offset + min(record_size, 0x10000 - (record_address & 0xFFFF))]
+            if record_address >> 16 != base_address:
+                base_address = record_address >> 16
+                records.append(record(EXTENDED_LINEAR_ADDRESS, 0,
+                                      bytes(bytearray([base_address >> 8, base_address & 0xFF]))))
+            records.append(record(DATA, record_address & 0xFFFF, chunk))
+            offset += len(chunk)
+    records.append(record(END_OF_FILE, 0, b''))
+    return b'\r\n'.join(records) + b'\r\n'
+
+
+def image_test(size_mb=16):
+    '''
+        Builds the images of generated hex files with known layouts
+        and measures the time needed for an image of size_mb megabytes.
+
+        Args:
+            size_mb = integer, size of the large image
+        Returns:
+            None
+    '''
+    import os
+    import time
+
+    first = os.urandom(1000)
+    second = os.urandom(70000)   # crosses a 64k boundary
+    third = os.urandom(16)
+    layout = [(0x08000000, first), (0x08010000 - 100, second), (0x20000000, third)]
+    image, errors = build_image(generate_hex(layout))
+    assert errors == {}
+    assert image.regions() == [(0x08000000, 0x08000000 + 1000, zlib.crc32(first) & 0xFFFFFFFF),
+                               (0x08010000 - 100, 0x08010000 - 100 + 70000, zlib.crc32(second) & 0xFFFFFFFF),
+                               (0x20000000, 0x20000010, zlib.crc32(third) & 0xFFFFFFFF)]
+    assert image.gaps() == [(0x08000000 + 1000, 0x08010000 - 100), (0x08010000 - 100 + 70000, 0x20000000)]
+    assert image.overlaps == []
+
+    # out of order, touching and overlapping writes get merged into one segment
+    layout = [(0x100, b'\x01' * 16), (0x0F0, b'\x02' * 16), (0x108, b'\x03' * 16), (0x200, b'\x04' * 4)]
+    image, errors = build_image(generate_hex(layout, record_size=16))
+    assert errors == {}
+    assert [(start, end) for start, end, _ in image.regions()] == [(0x0F0, 0x118), (0x200, 0x204)]
+    assert image.overlaps == [(0x108, 0x110)]
+    binary = image.to_bin(fill=0xFF)
+    assert binary == b'\x02' * 16 + b'\x01' * 8 + b'\x03' * 16 + b'\xff' * (0x200 - 0x118) + b'\x04' * 4
+
+    # a broken record is reported and skipped, the rest is still built
+    content = generate_hex([(0, b'\x05' * 96)]).split(b'\r\n')
+    content[2] = content[2][:-2] + b'00'
+    image, errors = build_image(b'\r\n'.join(content))
+    assert list(errors) == [2] and image.gaps() == [(32, 64)]
+
+    # the fast path and the line based one, forced by a junk line, build the same image
+    overlapping = generate_hex([(0x100, b'\x01' * 16), (0x108, b'\x02' * 16)], record_size=8)
+    crossing = (format_record(EXTENDED_LINEAR_ADDRESS, 0, b'\x00\x01') + b'\r\n' +
+                format_record(DATA, 0xFFF8, bytes(bytearray(range(16)))) + b'\r\n' +
+                format_record(START_LINEAR_ADDRESS, 0, b'\x00\x01\x00\x00') + b'\r\n' +
+                format_record(END_OF_FILE, 0, b'') + b'\r\n')
+    missing_end_of_file = generate_hex([(0, os.urandom(32)), (64, os.urandom(16))], record_size=16)
+    missing_end_of_file = missing_end_of_file[:missing_end_of_file.rindex(b':')]
+    for content in (overlapping, crossing, missing_end_of_file):
+        fast_image, fast_errors = build_image(content)
+        assert _build_image_fast(content) is not None and fast_errors == {}
+        image, errors = build_image(content + b'junk\r\n')
+        assert list(errors) == [content.count(b'\n')]
+        assert image.regions() == fast_image.regions(), (image.regions(), fast_image.regions())
+        assert image.overlaps == fast_image.overlaps and image.start_address == fast_image.start_address
+    assert fast_image.regions()[0][:2] == (0, 32) and image.gaps() == [(32, 64)]
+    image, errors = build_image(overlapping + b'junk\r\n')
+    assert image.regions()[0][:2] == (0x100, 0x118) and image.overlaps == [(0x108, 0x110)]
+    image, errors = build_image(crossing + b'junk\r\n')
+    assert image.regions()[0][:2] == (0x1FFF8, 0x20008) and image.start_address == 0x10000
+    # records after the end-of-file record are skipped by both
+    image, errors = build_image(overlapping + overlapping)
+    assert image.regions()[0][:2] == (0x100, 0x118) and len(errors) == overlapping.count(b'\n')
+
+    data = os.urandom(size_mb * 1024 * 1024)
+    content = generate_hex([(0x08000000, data)])
+    started = time.time()
+    image, errors = build_image(content)
+    elapsed = time.time() - started
+    assert errors == {} and image.to_bin() == data
+    print('images of the generated layouts are ok, '
+          '{} MB image built in {:.2f}s'.format(size_mb, elapsed))
+
+
+SAMPLE = '''\
+:10001300AC12AD13AE10AF1112002F8E0E8F0F2244
+:10000300E50B250DF509E50A350CF5081200132259
+:03000000020023D8
+:0C002300787FE4F6D8FD7581130200031D
+:10002F00EFF88DF0A4FFEDC5F0CEA42EFEEC88F016
+:04003F00A42EFE22CB
+:00000001FF
+'''
+
+
+def self_test():
+    '''
+        Checks the validation of the sample records and of some broken ones.
+
+        Args:
+            None
+        Returns:
+            None
+    '''
+    document = HexDocument()
+    assert document.parse(SAMPLE) == set() and document.bad_lines == []
+
+    broken = SAMPLE.splitlines()
+    broken[0] = broken[0][:-2] + '45'            # wrong checksum
+    broken[2] = broken[2].replace(':03', ':04')  # wrong record length
+    broken[3] = broken[3][1:]                    # missing colon
+    broken.insert(5, ':10003000' + '00' * 16 + 'C0')  # overlaps the records in line 5 and 7
+    broken.append(':00000001FF')                 # a second end-of-file record
+    changed = document.parse('\r\n'.join(broken))
+    assert document.bad_lines == [0, 2, 3, 5, 6, 8], document.errors
+    assert changed == set(document.bad_lines)
+    assert document.errors[0] == 'checksum 44 expected'
+    assert document.errors[5].startswith('data 00000030-0000003F overlaps')
+    assert document.next_bad_line(3) == 5 and document.next_bad_line(8) == 0
+    assert document.errors[6].endswith('overlaps the previous record 00000030-0000003F')
+    assert document.previous_bad_line(5) == 3 and document.previous_bad_line(0) == 8
+
+    assert document.parse(':020000040800F2\n:0400000001020304F2\n') == {0, 1, 2, 3, 5, 6, 8}
+    assert document.errors == {1: 'end-of-file record is missing'}
+
+    # editing line by line gives the same result as parsing everything again
+    lines = SAMPLE.splitlines(True)
+    bad_checksum = lines[1][:-2] + '0\n'
+    document.parse(SAMPLE)
+    assert document.replace_lines(1, 1, [bad_checksum]) == {1}
+    # an end-of-file record inserted at line 2 makes the following records invalid
+    assert document.replace_lines(2, 0, [':00000001FF\n']) == {3, 4, 5, 6, 7}
+    # replacing it and the line after it with that line again makes them valid again
+    assert document.replace_lines(2, 2, [lines[2]]) == {3, 4, 5, 6}
+    assert document.bad_lines == [1]
+    expected = HexDocument()
+    expected.parse(''.join(lines[:1] + [bad_checksum] + lines[2:]))
+    assert document.records == expected.records and document.errors == expected.errors
+    edit_test()
+    print('validation of the sample records is ok')
+
+
+def edit_test(edits=3000):
+    '''
+        Applies random edits, with records which change base addresses, overlap
+        or end the file, line by line and compares the errors with a full check afterwards.
+
+        Args:
+            edits = integer, number of random edits
+        Returns:
+            None
+    '''
+    import random
+
+    pieces = [':020000040800F2', ':020000040000FA', ':020000021000EC', ':00000001FF', '', 'junk',
+              ':0400000001020304F2', ':0400020001020304F0', ':04FFFE0001020304F5', ':0400000001020304F3']
+    lines = [random.choice(pieces) for _ in range(60)]
+    document = HexDocument()
+    document.parse('\n'.join(lines))
+    for _ in range(edits):
+        first_line = random.randrange(len(lines))
+        old_count = random.randint(1, min(3, len(lines) - first_line))
+        new_lines = [random.choice(pieces) for _ in range(random.randint(1 if old_count == len(lines) else 0, 3))]
+        lines[first_line:first_line + old_count] = new_lines
+        document.replace_lines(first_line, old_count, new_lines)
+        if not lines:
+            lines.append('')
+            document.replace_lines(0, 0, [''])
+        expected = HexDocument()
+        expected.parse('\n'.join(lines))
+        assert document.errors == expected.errors, (lines, document.errors, expected.errors)
+        assert document.bad_lines == expected.bad_lines
+
+
+if __name__ == '__main__':
+    import sys
+    self_test()
+    image_test(int(sys.argv[1]) if len(sys.argv) > 1 else 16)
@@ -0,0 +1,596 @@
+# -*- coding: utf-8 -*-
+'''
+    The spelling engine used by CheckUnUsualWords.py, it needs to be in the same directory.
+
+    It has no dependency on npp.
+    Dictionaries are compiled into a sorted binary file, an offset table followed by
+    the utf8 encoded words, which gets memory mapped and searched binary.
+    Several hunspell .dic files and a user word list can be merged into one compiled file,
+    it gets recompiled only if one of its sources changed.
+    A recompiled dictionary gets a new file name, derived from the modification times
+    of its sources, as windows does not allow to replace a file which is still mapped,
+    e.g. by the worker processes of a running batch. Outdated files are removed once unmapped.
+    The mapped dictionaries are kept by this module, as python imports a module only once,
+    they are shared by all checkers and across script runs.
+    WordIndex keeps the words of every line together with running counters,
+    an edit therefore costs work proportional to the edited lines, not to the document.
+    It also knows which lines contain misspelled words, which is used to paint them,
+    to jump to the next one and to report how often, and in which lines, they occur.
+    Very large documents can be indexed by several processes, see index_in_parallel,
+    each one maps the same compiled dictionary.
+
+    Running it directly, e.g. python spelling_engine.py,
+    checks that random edits keep the index equal to a full recount and
+    that a compiled dictionary finds its words, compares the parallel indexing
+    with the sequential one,
+    python spelling_engine.py output.dicx input.dic [input2.dic ...]
+    compiles dictionaries explicitly.
+'''
+import os
+import re
+import mmap
+import struct
+import hashlib
+from collections import Counter
+
+# a run of letters followed by whitespace, punctuation or the end of the line,
+# what [[:alpha:]]+(?=\h|[[:punct:]]|\R|\Z) matches in boost's syntax
+WORD = re.compile(r'[^\W\d_]+(?=[\W_]|\Z)')
+# lines starting with it are not checked
+COMMENT = '//'
+# scintilla ends lines with \r\n, \n or \r only, unlike str.splitlines
+_LINE_END = re.compile(r'(?<=\n)|(?<=\r)(?!\n)')
+
+# file header of a compiled dictionary, followed by the number of words
+MAGIC = b'NPPDICT1'
+_HEADER = struct.Struct('<8sI')
+_OFFSET = struct.Struct('<I')
+
+# compiled path -> CompiledDictionary
+_DICTIONARIES = {}
+
+
+def read_words(path, skip_count=True):
+    '''
+        Reads the words of a hunspell .dic file, or of a word list,
+        the affix flags are removed.
+
+        Args:
+            path = string, the .dic file
+            skip_count = bool, whether the first line is the number of entries
+        Returns:
+            set of lower case words
+    '''
+    with open(path, 'rb') as f:
+        entries = f.read().decode('utf8').splitlines()
+    if skip_count:
+        entries = entries[1:]
+    words = set(entry.partition('/')[0].strip().lower() for entry in entries)
+    words.discard('')
+    return words
+
+
+def compile_dictionary(words, output_path):
+    '''
+        Writes the words sorted by their utf8 encoding into a compiled dictionary.
+        The file is replaced atomically, which fails on windows while it is mapped,
+        load_dictionary therefore never compiles into an existing file.
+
+        Args:
+            words = iterable of strings
+            output_path = string, the compiled dictionary
+        Returns:
+            None
+    '''
+    encoded = sorted(set(word.encode('utf8') for word in words))
+    offsets = [0]
+    for word in encoded:
+        offsets.append(offsets[-1] + len(word))
+    temporary_path = output_path + '.tmp'
+    with open(temporary_path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, len(encoded)))
+        f.write(struct.pack('<{}I'.format(len(offsets)), *offsets))
+        f.write(b''.join(encoded))
+    try:
+        os.replace(temporary_path, output_path)
+    except OSError:
+        os.remove(temporary_path)
+        raise
+
+
+class CompiledDictionary:
+    '''
+        A memory mapped compiled dictionary,
+        membership is tested by a binary search over the sorted words.
+    '''
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = _HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            self.map.close()
+            raise ValueError('{} is not a compiled dictionary'.format(path))
+        self.offsets_start = _HEADER.size
+        self.words_start = self.offsets_start + (self.count + 1) * _OFFSET.size
+
+    def __len__(self):
+        return self.count
+
+    def word(self, i):
+        '''
+            Returns:
+                bytes, the utf8 encoded i-th word
+        '''
+        start, end = struct.unpack_from('<2I', self.map, self.offsets_start + i * _OFFSET.size)
+        return self.map[self.words_start + start:self.words_start + end]
+
+    def __contains__(self, word):
+        encoded = word.encode('utf8')
+        low = 0
+        high = self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.word(middle) < encoded:
+                low = middle + 1
+            else:
+                high = middle
+        return low < self.count and self.word(low) == encoded
+
+    def close(self):
+        self.map.close()
+
+
+def _compiled_prefix(path):
+    # the part of a compiled dictionary's file name which identifies its sources
+    return os.path.basename(path).rpartition('-')[0]
+
+
+def remove_outdated_dictionaries(compiled_path):
+    '''
+        Removes the files compiled from the same sources as compiled_path, but from older versions.
+        A file still mapped by a process can not be removed on windows,
+        it is kept and tried again the next time.
+
+        Args:
+            compiled_path = string, the current compiled dictionary
+        Returns:
+            None
+    '''
+    directory = os.path.dirname(compiled_path)
+    prefix = _compiled_prefix(compiled_path)
+    for file_name in os.listdir(directory):
+        path = os.path.join(directory, file_name)
+        if (file_name.endswith('.dicx') and _compiled_prefix(file_name) == prefix and
+                path != compiled_path):
+            _DICTIONARIES.pop(path, None)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def load_dictionary(paths, user_words=None, cache_dir=None):
+    '''
+        Returns the compiled dictionary of the merged .dic files and user word list,
+        compiles it first if it does not exist for the current modification times of the sources.
+        The mapped dictionary is cached, a compiled file never changes.
+
+        Args:
+            paths = list of strings, the hunspell .dic files
+            user_words = string, a file with one word per line, optional
+            cache_dir = string, where the compiled dictionary is stored,
+                        by default next to the first .dic file
+        Returns:
+            CompiledDictionary
+    '''
+    sources = [os.path.abspath(source) for source in
+               list(paths) + ([user_words] if user_words and os.path.exists(user_words) else [])]
+    name = hashlib.sha1('\n'.join(sources).encode('utf8')).hexdigest()
+    version = hashlib.sha1(repr([os.path.getmtime(source) for source in sources]).encode('utf8')).hexdigest()
+    compiled_path = os.path.join(cache_dir or os.path.dirname(sources[0]),
+                                 '{}-{}.dicx'.format(name[:16], version[:8]))
+
+    if not os.path.exists(compiled_path):
+        words = set()
+        for path in paths:
+            words |= read_words(path)
+        if len(sources) > len(paths):
+            words |= read_words(user_words, skip_count=False)
+        compile_dictionary(words, compiled_path)
+        remove_outdated_dictionaries(compiled_path)
+
+    cached = _DICTIONARIES.get(compiled_path)
+    if cached is None:
+        cached = _DICTIONARIES[compiled_path] = CompiledDictionary(compiled_path)
+    return cached
+
+
+def split_lines(text):
+    '''
+        Splits the text the way scintilla does, the line endings are kept
+        and there is always one more line than line endings.
+
+        Args:
+            text = string
+        Returns:
+            list of strings
+    '''
+    return _LINE_END.split(text)
+
+
+def line_words(line):
+    '''
+        Args:
+            line = string, a single line
+        Returns:
+            list of the words of the line, empty for comment lines
+    '''
+    if line.startswith(COMMENT):
+        return []
+    return WORD.findall(line)
+
+
+class WordIndex:
+    '''
+        The words of every line of a document and the counters derived from them.
+        Words written in capital letters only are never considered misspelled,
+        all others are checked case insensitive.
+    '''
+    def __init__(self, dictionary):
+        self.dictionary = dictionary
+        # word -> result of is_misspelled, a text uses far fewer words than it contains
+        self.checked = {}
+        self.clear()
+
+    def clear(self):
+        # (words, lower case misspelled words) of every line
+        self.lines = [([], [])]
+        # word, as written -> count
+        self.words = Counter()
+        # misspelled word, lower case -> count
+        self.misspelled = Counter()
+        self.total = 0
+        self.total_misspelled = 0
+
+    def is_misspelled(self, word):
+        result = self.checked.get(word)
+        if result is None:
+            result = self.checked[word] = not word.isupper() and word.lower() not in self.dictionary
+        return result
+
+    def _index_line(self, line):
+        '''
+            Returns:
+                tuple of the words and the lower case misspelled words of the line
+        '''
+        words = line_words(line)
+        return words, [word.lower() for word in words if self.is_misspelled(word)]
+
+    def _count(self, line_entry, delta):
+        '''
+            Adds, delta = 1, or removes, delta = -1, the words of a line to and from the counters.
+        '''
+        words, misspelled = line_entry
+        for word in words:
+            count = self.words[word] + delta
+            if count:
+                self.words[word] = count
+            else:
+                del self.words[word]
+        for word in misspelled:
+            count = self.misspelled[word] + delta
+            if count:
+                self.misspelled[word] = count
+            else:
+                del self.misspelled[word]
+        self.total += delta * len(words)
+        self.total_misspelled += delta * len(misspelled)
+
+    def replace_lines(self, first_line, old_count, new_lines):
+        '''
+            Replaces old_count lines, starting at first_line, with the new lines.
+
+            Args:
+                first_line = integer, 0-based line number
+                old_count = integer, number of lines to be replaced
+                new_lines = list of strings, the new content of those lines
+            Returns:
+                None
+        '''
+        new_entries = [self._index_line(line) for line in new_lines]
+        for line_entry in self.lines[first_line:first_line + old_count]:
+            self._count(line_entry, -1)
+        for line_entry in new_entries:
+            self._count(line_entry, 1)
+        self.lines[first_line:first_line + old_count] = new_entries
+
+    def rebuild(self, text):
+        '''
+            Indexes the whole document.
+
+            Args:
+                text = string, the content of the document
+            Returns:
+                None
+        '''
+        self.clear()
+        self.replace_lines(0, 1, split_lines(text))
+
+    def merge_chunks(self, chunks):
+        '''
+            Replaces the index with the results of index_chunk,
+            the chunks must cover the whole document, in order.
+
+            Args:
+                chunks = list of the results of index_chunk
+            Returns:
+                None
+        '''
+        self.clear()
+        self.lines = []
+        for lines, words, misspelled, total, total_misspelled in chunks:
+            self.lines.extend(lines)
+            self.words.update(words)
+            self.misspelled.update(misspelled)
+            self.total += total
+            self.total_misspelled += total_misspelled
+
+    def statistics(self):
+        '''
+            Returns:
+                tuple of total, unique, misspelled and unique misspelled number of words
+        '''
+        return self.total, len(self.words), self.total_misspelled, len(self.misspelled)
+
+    def misspelled_spans(self, line_number, line):
+        '''
+            Finds the misspelled words of an indexed line,
+            lines without misspelled words are not searched at all.
+
+            Args:
+                line_number = integer, 0-based line number
+                line = string, the current content of that line
+            Returns:
+                list of (column, word) tuples, column counts characters
+        '''
+        if not self.lines[line_number][1]:
+            return []
+        return [(match.start(), match.group()) for match in WORD.finditer(line)
+                if self.is_misspelled(match.group())]
+
+    def next_misspelled_line(self, line_number):
+        '''
+            Args:
+                line_number = integer, 0-based line number
+            Returns:
+                integer, the next line, after line_number and wrapping around,
+                which contains misspelled words, or None
+        '''
+        count = len(self.lines)
+        for offset in range(1, count + 1):
+            candidate = (line_number + offset) % count
+            if self.lines[candidate][1]:
+                return candidate
+        return None
+
+    def frequency_table(self):
+        '''
+            Returns:
+                list of (word, count, line numbers) tuples of the misspelled words,
+                the most frequent first
+        '''
+        word_lines = {}
+        for line_number, (_, misspelled) in enumerate(self.lines):
+            for word in misspelled:
+                lines = word_lines.setdefault(word, [])
+                if not lines or lines[-1] != line_number:
+                    lines.append(line_number)
+        return [(word, count, word_lines[word])
+                for word, count in sorted(self.misspelled.items(), key=lambda item: (-item[1], item[0]))]
+
+
+def index_chunk(dictionary_path, lines):
+    '''
+        Indexes a chunk of lines, runs in a worker process of index_in_parallel.
+
+        Args:
+            dictionary_path = string, the compiled dictionary
+            lines = list of strings
+        Returns:
+            tuple of the line entries, word counts, misspelled word counts,
+            total and total misspelled number of words, see WordIndex.merge_chunks
+    '''
+    dictionary = _DICTIONARIES.get(dictionary_path)
+    if dictionary is None:
+        # a recompiled dictionary, unmap the outdated one so that it can be removed
+        prefix = _compiled_prefix(dictionary_path)
+        for path in [path for path in _DICTIONARIES if _compiled_prefix(path) == prefix]:
+            _DICTIONARIES.pop(path).close()
+        dictionary = _DICTIONARIES[dictionary_path] = CompiledDictionary(dictionary_path)
+    index = WordIndex(dictionary)
+    index.clear()
+    index.lines = []
+    index.replace_lines(0, 0, lines)
+    return index.lines, index.words, index.misspelled, index.total, index.total_misspelled
+
+
+def index_in_parallel(text, dictionary, executor, chunk_lines=20000):
+    '''
+        Splits the text at line boundaries into chunks which get indexed by the executor.
+
+        Args:
+            text = string, a snapshot of the document
+            dictionary = CompiledDictionary, mapped by every worker
+            executor = concurrent.futures.ProcessPoolExecutor
+            chunk_lines = integer, number of lines per chunk
+        Returns:
+            list of futures, in document order, their results are meant for WordIndex.merge_chunks
+    '''
+    lines = split_lines(text)
+    return [executor.submit(index_chunk, dictionary.path, lines[start:start + chunk_lines])
+            for start in range(0, len(lines), chunk_lines)]
+
+
+def self_test(edits=2000):
+    '''
+        Applies random edits, the way scintilla reports them, to a document and its index
+        and compares the index with one built from scratch afterwards.
+
+        Args:
+            edits = integer, number of random edits
+        Returns:
+            None
+    '''
+    import random
+
+    dictionary = frozenset(['hola', 'mundo', 'casa', 'perro'])
+    pieces = ['hola ', 'Mundo', 'casa\n', 'perro, ', 'gato ', 'NASA ', 'x1 ', '// comment\n', '\r\n', 'caza.']
+    document = ''.join(random.choice(pieces) for _ in range(200))
+    index = WordIndex(dictionary)
+    index.rebuild(document)
+    for _ in range(edits):
+        position = random.randint(0, len(document))
+        old_line_count = len(split_lines(document))
+        if random.random() < 0.5:
+            text = ''.join(random.choice(pieces) for _ in range(random.randint(1, 3)))
+            document = document[:position] + text + document[position:]
+        else:
+            document = document[:position] + document[position + random.randint(1, 20):]
+        # what on_modified does with position and linesAdded
+        lines = split_lines(document)
+        first_line = len(split_lines(document[:position])) - 1
+        lines_added = len(lines) - old_line_count
+        old_count = 1 + max(0, -lines_added)
+        new_count = 1 + max(0, lines_added)
+        index.replace_lines(first_line, old_count, lines[first_line:first_line + new_count])
+
+    expected = WordIndex(dictionary)
+    expected.rebuild(document)
+    assert index.lines == expected.lines
+    assert index.words == expected.words and index.misspelled == expected.misspelled
+    assert index.statistics() == expected.statistics(), (index.statistics(), expected.statistics())
+    assert [word for word, _, _ in index.frequency_table()] == [word for word, _, _ in expected.frequency_table()]
+    print('index after {} random edits is ok, {}'.format(edits, index.statistics()))
+
+    index.rebuild('hola mundo\n// gato\nNASA casa\nGato perro gato\n')
+    assert index.next_misspelled_line(0) == 3 and index.next_misspelled_line(3) == 3
+    assert index.misspelled_spans(3, 'Gato perro gato\n') == [(0, 'Gato'), (11, 'gato')]
+    assert index.frequency_table() == [('gato', 2, [3])]
+
+
+def dictionary_test(size=100000):
+    '''
+        Compiles a generated dictionary merged with a user word list,
+        checks lookups and measures loading and lookup times.
+
+        Args:
+            size = integer, number of generated words
+        Returns:
+            None
+    '''
+    import time
+    import random
+    import shutil
+    import tempfile
+
+    directory = tempfile.mkdtemp()
+    try:
+        words = set(''.join(random.choice('abcdefghijklmnopqrstuvwxyzñáéíóú') for _ in range(random.randint(2, 12)))
+                    for _ in range(size))
+        dic_path = os.path.join(directory, 'generated.dic')
+        with open(dic_path, 'wb') as f:
+            f.write('{}\n'.format(len(words)).encode('utf8'))
+            f.write('\n'.join(word + '/SF' for word in words).encode('utf8'))
+        user_words_path = os.path.join(directory, 'user_words.txt')
+        with open(user_words_path, 'wb') as f:
+            f.write('Notepad\nPythonScript\n'.encode('utf8'))
+
+        started = time.time()
+        dictionary = load_dictionary([dic_path], user_words_path)
+        compiled = time.time() - started
+        started = time.time()
+        assert load_dictionary([dic_path], user_words_path) is dictionary
+        cached = time.time() - started
+        started = time.time()
+        CompiledDictionary(dictionary.path).close()
+        mapped = time.time() - started
+
+        assert len(dictionary) == len(words) + 2
+        assert 'notepad' in dictionary and 'pythonscript' in dictionary
+        assert '' not in dictionary and 'aaaaaaaaaaaaaaaaaaaa' not in dictionary
+        samples = random.sample(sorted(words), min(len(words), 10000))
+        started = time.time()
+        assert all(word in dictionary for word in samples)
+        looked_up = time.time() - started
+        print('{} words, compiled in {:.2f}s, mapped in {:.4f}s, cached in {:.6f}s, '
+              '{:.1f} lookups/ms'.format(len(dictionary), compiled, mapped, cached,
+                                         len(samples) / (looked_up * 1000)))
+
+        parallel_test(dictionary, words)
+
+        # recompiling while the outdated dictionary is still mapped
+        with open(user_words_path, 'ab') as f:
+            f.write('\nScintilla'.encode('utf8'))
+        modified = os.path.getmtime(user_words_path) + 1
+        os.utime(user_words_path, (modified, modified))
+        recompiled = load_dictionary([dic_path], user_words_path)
+        assert recompiled.path != dictionary.path and 'scintilla' in recompiled
+        assert 'notepad' in dictionary and 'scintilla' not in dictionary
+        assert os.name == 'nt' or not os.path.exists(dictionary.path)
+        dictionary.close()
+        recompiled.close()
+        _DICTIONARIES.clear()
+    finally:
+        shutil.rmtree(directory)
+
+
+def parallel_test(dictionary, words, size_mb=4):
+    '''
+        Indexes a generated text of about size_mb megabytes sequentially
+        and in parallel and compares the results.
+
+        Args:
+            dictionary = CompiledDictionary
+            words = set of strings, the words of the dictionary
+            size_mb = integer, size of the generated text
+        Returns:
+            None
+    '''
+    import time
+    import random
+    from concurrent.futures import ProcessPoolExecutor
+
+    vocabulary = random.sample(sorted(words), 200) + ['Misspeled', 'wrods', 'NASA']
+    line_count = size_mb * 1024 * 1024 // 60
+    text = '\n'.join(' '.join(random.choice(vocabulary) for _ in range(8)) + '.' for _ in range(line_count))
+
+    started = time.time()
+    expected = WordIndex(dictionary)
+    expected.rebuild(text)
+    sequential = time.time() - started
+
+    with ProcessPoolExecutor() as executor:
+        # the first round starts the worker processes
+        index_in_parallel('warm up', dictionary, executor)[0].result()
+        started = time.time()
+        index = WordIndex(dictionary)
+        index.merge_chunks([future.result() for future in index_in_parallel(text, dictionary, executor)])
+        parallel = time.time() - started
+
+    assert index.lines == expected.lines
+    assert index.words == expected.words and index.misspelled == expected.misspelled
+    assert index.statistics() == expected.statistics()
+    print('{} lines indexed in {:.2f}s sequentially, in {:.2f}s in parallel'.format(line_count, sequential, parallel))
+
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) > 2:
+        compiled_words = set()
+        for dic_path in sys.argv[2:]:
+            compiled_words |= read_words(dic_path)
+        compile_dictionary(compiled_words, sys.argv[1])
+    else:
+        self_test()
+        dictionary_test()
@@ -0,0 +1,691 @@
+# -*- coding: utf-8 -*-
+'''
+    The aggregation used by TreeNodeCalculator.py, it needs to be in the same directory.
+
+    It has no dependency on npp.
+    aggregate walks the lines of a tree once, keeping only the currently open folders
+    on a stack. The counts of a folder are added to its parent when the folder gets closed,
+    so every item is counted once, regardless of its depth.
+    The lines can come from any iterable, e.g. a file, only two of them are held at a time.
+    A FilterSet counts all of its filters with a single scan of a line.
+    A LiveTree keeps the counts of a document up to date while it gets edited.
+
+    process_files writes the counts into files on disk, one worker process per file
+    if an executor is given. Only files with an explicitly configured extension get written.
+
+    Running it directly, e.g. python tree_aggregator.py [number of lines],
+    checks the result of the example tree and measures how long a generated tree takes.
+'''
+import os
+import re
+import tempfile
+
+# scintilla ends lines with \r\n, \n or \r only, unlike str.splitlines
+_LINE_END = re.compile(r'\r\n|\n|\r')
+_LINE_END_KEPT = re.compile(r'(\r\n|\n|\r)')
+
+
+def split_lines(text):
+    '''
+        Splits the text the way scintilla does, without the line endings.
+
+        Args:
+            text = string
+        Returns:
+            list of strings
+    '''
+    return _LINE_END.split(text)
+
+
+def get_level(line):
+    '''
+        Returns:
+            integer, the number of leading whitespace characters
+    '''
+    return len(line) - len(line.lstrip())
+
+
+class FilterSet:
+    '''
+        The strings counted in the item lines, compiled into one regular expression.
+        Where filters overlap, the longest one starting at a position is counted.
+    '''
+    def __init__(self, combined_filters=(), unique_filters=()):
+        '''
+            Args:
+                combined_filters = list of strings, their occurrences are summed up
+                unique_filters = list of strings, counted separately
+        '''
+        self.combined_filters = tuple(combined_filters)
+        self.unique_filters = tuple(unique_filters)
+        # filter -> (weight in the combined count, indexes of the unique counts)
+        self.slots = {}
+        for _filter in set(self.combined_filters + self.unique_filters):
+            self.slots[_filter] = (self.combined_filters.count(_filter),
+                                   [i for i, u in enumerate(self.unique_filters) if u == _filter])
+        filters = sorted((f for f in self.slots if f), key=len, reverse=True)
+        self.pattern = re.compile('|'.join(re.escape(f) for f in filters)) if filters else None
+        # tuple of the found filters -> counts
+        self.counted = {}
+
+
+    def count(self, line):
+        '''
+            Returns:
+                tuple of the combined count and the tuple of the unique counts
+        '''
+        if self.pattern is None:
+            return 0, (0,) * len(self.unique_filters)
+        matches = tuple(self.pattern.findall(line))
+        # lines tend to contain the same filters, their counts are computed once
+        counts = self.counted.get(matches)
+        if counts is None:
+            combined = 0
+            unique = [0] * len(self.unique_filters)
+            for match in matches:
+                weight, indexes = self.slots[match]
+                combined += weight
+                for i in indexes:
+                    unique[i] += 1
+            counts = self.counted[matches] = combined, tuple(unique)
+        return counts
+
+
+def aggregate(lines, filters=None):
+    '''
+        Counts the items of every folder in a single pass.
+        A line is an item if the next line is not indented deeper,
+        the last line is an item if it has the same level as the line before.
+        Empty lines are skipped.
+
+        Args:
+            lines = iterable of strings, without line endings
+            filters = FilterSet or None
+        Returns:
+            list of (line number, line, items, combined filters, unique filters list)
+            tuples of the folder lines, in line order
+    '''
+    results = []
+    # (level, result entry) of the open folders, the innermost last
+    stack = []
+    if filters is None:
+        filters = FilterSet()
+    unique_range = range(len(filters.unique_filters))
+    findall = filters.pattern.findall if filters.pattern is not None else None
+    slots = filters.slots
+
+    def close_folder():
+        level, entry = stack.pop()
+        if stack:
+            parent = stack[-1][1]
+            parent[2] += entry[2]
+            parent[3] += entry[3]
+            parent_unique, unique = parent[4], entry[4]
+            for i in unique_range:
+                parent_unique[i] += unique[i]
+
+    def add_item(line):
+        # items are only counted by the innermost folder, its parents get them on close
+        if stack:
+            entry = stack[-1][1]
+            entry[2] += 1
+            if findall is not None:
+                unique = entry[4]
+                for match in findall(line):
+                    weight, indexes = slots[match]
+                    entry[3] += weight
+                    for i in indexes:
+                        unique[i] += 1
+
+    iterator = iter(lines)
+    current = next(iterator, None)
+    if current is None:
+        return results
+    stripped = current.lstrip()
+    line_number = 0
+    previous_level = None
+    for following in iterator:
+        following_stripped = following.lstrip()
+        if stripped:
+            level = len(current) - len(stripped)
+            if level >= len(following) - len(following_stripped):
+                add_item(current)
+            else:
+                while stack and stack[-1][0] >= level:
+                    close_folder()
+                entry = [line_number, current, 0, 0, [0] * len(filters.unique_filters)]
+                results.append(entry)
+                stack.append((level, entry))
+            previous_level = level
+        current, stripped = following, following_stripped
+        line_number += 1
+
+    # last line
+    if stripped and len(current) - len(stripped) == previous_level:
+        add_item(current)
+    while stack:
+        close_folder()
+    return [tuple(entry) for entry in results]
+
+
+def format_counts(items, combined, unique, with_filters):
+    '''
+        Returns:
+            string, e.g. (23, 17, 4, 0) or (23) without the filter counts
+    '''
+    if with_filters:
+        return '({})'.format(', '.join(str(x) for x in [items, combined] + list(unique)))
+    return '({})'.format(items)
+
+
+def format_result(line, items, combined, unique, with_filters, column=80):
+    '''
+        Returns:
+            string, the folder line cut or padded to column characters followed by the counts
+    '''
+    return '{0:<{1}}{2}'.format(line[:column], column,
+                                format_counts(items, combined, unique, with_filters))
+
+
+# kinds of lines of a LiveTree
+_NONE, _ITEM, _FOLDER = 0, 1, 2
+
+
+class TreeNode:
+    '''
+        A folder line of a LiveTree, its counts include the items of all its subfolders.
+    '''
+    __slots__ = ('line', 'level', 'parent', 'items', 'combined', 'unique')
+
+    def __init__(self, line, level, parent, unique_count):
+        self.line = line
+        self.level = level
+        self.parent = parent
+        self.items = 0
+        self.combined = 0
+        self.unique = [0] * unique_count
+
+
+class LiveTree:
+    '''
+        The folders of a document, kept up to date line by line, with the same counts as aggregate.
+
+        Every line knows its folder, the nearest folder line above it, and every folder
+        its parent, the nearest folder line above it with a smaller level.
+        Editing item lines only updates the folders above them, an edit which adds,
+        removes or reindents a folder line rebuilds the folders from the stored lines.
+    '''
+    def __init__(self, filters=None):
+        self.filters = filters if filters is not None else FilterSet()
+        self.clear()
+
+
+    def clear(self):
+        '''
+            Forgets the document.
+
+            Args:
+                None
+            Returns:
+                None
+        '''
+        # per line
+        self.levels = []
+        self.blank = []
+        # (combined, unique) filter counts, None if no filter occurs
+        self.matches = []
+        self.kinds = []
+        # the nearest folder at or above the line, None above the first folder
+        self.owners = []
+
+        # in line order
+        self.folders = []
+        # folders whose counts changed since take_changes was called
+        self.changed = set()
+        self.restructured = True
+
+
+    def _line_info(self, text):
+        text = text.rstrip('\r\n')
+        stripped = text.lstrip()
+        if not stripped:
+            return len(text), True, None
+        combined, unique = self.filters.count(text)
+        return len(text) - len(stripped), False, (combined, unique) if combined or any(unique) else None
+
+
+    def _kind(self, line):
+        if self.blank[line]:
+            return _NONE
+        if line < len(self.levels) - 1:
+            return _FOLDER if self.levels[line] < self.levels[line + 1] else _ITEM
+        # the last line counts if it is on the level of the last line which is not blank
+        previous = line - 1
+        while previous >= 0 and self.blank[previous]:
+            previous -= 1
+        return _ITEM if previous >= 0 and self.levels[previous] == self.levels[line] else _NONE
+
+
+    def _add(self, line, sign):
+        # adds or removes the counts of an item line to or from its folders
+        if self.kinds[line] != _ITEM:
+            return
+        node = self.owners[line]
+        match = self.matches[line]
+        while node is not None:
+            node.items += sign
+            if match is not None:
+                node.combined += sign * match[0]
+                unique = node.unique
+                for i, count in enumerate(match[1]):
+                    unique[i] += sign * count
+            self.changed.add(node)
+            node = node.parent
+
+
+    def _restructure(self):
+        levels = self.levels
+        blank = self.blank
+        line_count = len(levels)
+        self.kinds = kinds = [_NONE if blank[line] else _FOLDER if levels[line] < levels[line + 1] else _ITEM
+                              for line in range(line_count - 1)]
+        if line_count:
+            kinds.append(self._kind(line_count - 1))
+        self.owners = owners = [None] * line_count
+        self.folders = folders = []
+        unique_count = len(self.filters.unique_filters)
+        stack = []
+        owner = None
+        for line in range(line_count):
+            kind = kinds[line]
+            if kind == _FOLDER:
+                level = levels[line]
+                while stack and stack[-1].level >= level:
+                    stack.pop()
+                owner = TreeNode(line, level, stack[-1] if stack else None, unique_count)
+                stack.append(owner)
+                folders.append(owner)
+            owners[line] = owner
+            if kind == _ITEM and owner is not None:
+                owner.items += 1
+                match = self.matches[line]
+                if match is not None:
+                    owner.combined += match[0]
+                    unique = owner.unique
+                    for i, count in enumerate(match[1]):
+                        unique[i] += count
+
+        # subfolders come after their parent
+        for node in reversed(folders):
+            parent = node.parent
+            if parent is not None:
+                parent.items += node.items
+                parent.combined += node.combined
+                parent.unique = [a + b for a, b in zip(parent.unique, node.unique)]
+        self.changed = set(folders)
+        self.restructured = True
+
+
+    def rebuild(self, text):
+        '''
+            Indexes the whole document.
+
+            Args:
+                text = string
+            Returns:
+                None
+        '''
+        self.clear()
+        lines = split_lines(text)
+        stripped = [line.lstrip() for line in lines]
+        self.levels = [len(line) - len(rest) for line, rest in zip(lines, stripped)]
+        self.blank = [not rest for rest in stripped]
+        self.matches = [None] * len(lines)
+        if self.filters.pattern is not None:
+            count = self.filters.count
+            nothing = count('')
+            for line, text in enumerate(lines):
+                counts = count(text)
+                if counts != nothing:
+                    self.matches[line] = counts
+        self._restructure()
+
+
+    def replace_lines(self, first_line, old_count, new_lines):
+        '''
+            Replaces old_count lines, starting at first_line, by new_lines,
+            the way scintilla reports a modification.
+
+            Args:
+                first_line = integer
+                old_count = integer, number of lines replaced
+                new_lines = list of strings, line endings are ignored
+            Returns:
+                boolean, True if the folders have been rebuilt
+        '''
+        new_count = len(new_lines)
+        infos = [self._line_info(text) for text in new_lines]
+        start = max(0, first_line - 1)
+        # the kind of the line above depends on the level of the first edited line
+        # and the one of the last line on the level of the line above it
+        old_affected = set(range(start, first_line + old_count))
+        old_affected.add(len(self.levels) - 1)
+        structural = any(self.kinds[line] == _FOLDER for line in old_affected)
+        if not structural:
+            for line in old_affected:
+                self._add(line, -1)
+
+        end_line = first_line + old_count
+        self.levels[first_line:end_line] = [info[0] for info in infos]
+        self.blank[first_line:end_line] = [info[1] for info in infos]
+        self.matches[first_line:end_line] = [info[2] for info in infos]
+        self.kinds[first_line:end_line] = [_NONE] * new_count
+        self.owners[first_line:end_line] = [None] * new_count
+
+        new_affected = set(range(start, first_line + new_count))
+        new_affected.add(len(self.levels) - 1)
+        for line in new_affected:
+            self.kinds[line] = self._kind(line)
+        if structural or any(self.kinds[line] == _FOLDER for line in new_affected):
+            self._restructure()
+            return True
+
+        lines_added = new_count - old_count
+        if lines_added:
+            for node in reversed(self.folders):
+                if node.line < end_line:
+                    break
+                node.line += lines_added
+        for line in range(first_line, first_line + new_count):
+            self.owners[line] = self.owners[line - 1] if line else None
+        for line in new_affected:
+            self._add(line, 1)
+        return False
+
+
+    def take_changes(self):
+        '''
+            Returns the folders changed since the last call and forgets them.
+
+            Args:
+                None
+            Returns:
+                tuple of a boolean, True if the folders have been rebuilt,
+                and the list of the changed folders
+        '''
+        changes = self.restructured, sorted(self.changed, key=lambda node: node.line)
+        self.restructured = False
+        self.changed = set()
+        return changes
+
+
+def filters_for_path(path, filter_sets, use_fallback=True):
+    '''
+        Args:
+            path = string
+            filter_sets = dict of lowercase file extension, e.g. '.txt', to FilterSet,
+                          the one of '*' is used for all other extensions
+            use_fallback = boolean, False ignores the one of '*'
+        Returns:
+            FilterSet or None if the file is not meant to be processed
+    '''
+    extension = os.path.splitext(path)[1].lower()
+    if use_fallback:
+        return filter_sets.get(extension, filter_sets.get('*'))
+    return filter_sets.get(extension)
+
+
+def process_file(path, filters, with_filters, encoding='utf-8'):
+    '''
+        Writes the counts into the folder lines of a file, keeping its line endings.
+
+        Args:
+            path = string
+            filters = FilterSet
+            with_filters = boolean, whether the filter counts are written as well
+            encoding = string
+        Returns:
+            tuple of the path and the number of folder lines
+    '''
+    with open(path, encoding=encoding, newline='') as f:
+        parts = _LINE_END_KEPT.split(f.read())
+    # lines are at the even indexes, their line endings in between
+    results = aggregate(parts[0::2], filters)
+    for line, text, items, combined, unique in results:
+        parts[2 * line] = format_result(text, items, combined, unique, with_filters)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    handle, temp_path = tempfile.mkstemp(dir=directory)
+    try:
+        with open(handle, 'w', encoding=encoding, newline='') as f:
+            f.write(''.join(parts))
+        os.replace(temp_path, path)
+    except Exception:
+        os.remove(temp_path)
+        raise
+    return path, len(results)
+
+
+def process_files(paths, filter_sets, with_filters, executor=None, encoding='utf-8'):
+    '''
+        Processes every file whose extension has a filter set, see filters_for_path.
+        The one of '*' is ignored, as any file, e.g. source code or configuration, would
+        be rewritten otherwise.
+
+        Args:
+            paths = list of strings
+            filter_sets = dict of file extension to FilterSet
+            with_filters = boolean
+            executor = concurrent.futures.Executor or None to process the files one after another
+            encoding = string
+        Returns:
+            list of (path, number of folder lines) tuples, in the order of paths
+    '''
+    jobs = [(path, filters_for_path(path, filter_sets, False)) for path in paths]
+    jobs = [(path, filters) for path, filters in jobs if filters is not None]
+    if executor is None:
+        return [process_file(path, filters, with_filters, encoding) for path, filters in jobs]
+    futures = [executor.submit(process_file, path, filters, with_filters, encoding)
+               for path, filters in jobs]
+    return [future.result() for future in futures]
+
+
+def folder_files(folder):
+    '''
+        Returns:
+            sorted list of the paths of the files in the folder, subfolders are not included
+    '''
+    return sorted(entry.path for entry in os.scandir(folder) if entry.is_file())
+
+
+EXAMPLE = u'''\
+work
+    names 1
+        × antonio
+        bernard #
+        joseph
+        alex
+        # francisco
+        suzana
+        × victor
+        amanda #
+        # victoria
+        xxxxx
+        yy # yyy
+        aaaa
+    names 2
+        aaaaa
+        qqqqq #
+        × wwwww
+        a111111
+        b222222
+        c3333 # 33
+        # wwwww
+        wwwww
+        1111111€  -  # 12121212  -  # 5555555€  -  # 323232323  -  # 444€  -  #11  -  # 88888€
+    names 3
+        aaaaa
+        qqqqq'''
+
+
+def self_test():
+    '''
+        Checks the counts of the example tree.
+
+        Args:
+            None
+        Returns:
+            None
+    '''
+    filters = FilterSet(['#', u'×'], [u'€', '$'])
+    results = aggregate(split_lines(EXAMPLE), filters)
+    assert [(line, items, combined, unique) for line, _, items, combined, unique in results] == [
+        (0, 23, 17, [4, 0]), (1, 12, 7, [0, 0]), (14, 9, 10, [4, 0]), (24, 2, 0, [0, 0])], results
+    assert format_result('    names 3', 2, 0, [0, 0], True).endswith(' ' * 69 + '(2, 0, 0, 0)')
+    assert format_result('    names 3', 2, 0, [0, 0], False) == '{:<80}(2)'.format('    names 3')
+    assert filters.count(u'a # b × c €€ $') == (2, (2, 1))
+    # overlapping filters, a filter in both lists and an empty one
+    assert FilterSet(['#', '##', '$'], ['##', '$', '']).count('### $') == (3, (1, 1, 0))
+    assert aggregate([]) == [] and aggregate(['a', ' b', ' c'])[0][2:] == (2, 0, [])
+    print('counts of the example tree are ok')
+
+
+def live_test(edits=3000):
+    '''
+        Applies random edits, the way scintilla reports them, to a document and its LiveTree
+        and compares the folders with the ones of aggregate after every edit.
+
+        Args:
+            edits = integer, number of random edits
+        Returns:
+            None
+    '''
+    import random
+
+    random.seed(7)
+    filters = FilterSet(['#', u'×'], [u'€', '$'])
+    tree = LiveTree(filters)
+    text = EXAMPLE
+    tree.rebuild(text)
+    assert tree.take_changes()[0]
+    pieces = ['\n', '\n    ', '\n        ', '\n            ', 'a', '# ', u'€', '$ ', '  ', '\r\n']
+    restructured = 0
+    for _ in range(edits):
+        lines = split_lines(text)
+        position = random.randint(0, len(text))
+        if random.random() < 0.5 or not text:
+            removed = ''
+            inserted = ''.join(random.choice(pieces) for _ in range(random.randint(1, 3)))
+        else:
+            removed = text[position:position + random.randint(1, 12)]
+            inserted = ''
+        # never split a \r\n, scintilla does not allow it either
+        if text[position - 1:position + 1] == '\r\n' or removed.endswith('\r') and \
+                text[position + len(removed):position + len(removed) + 1] == '\n':
+            continue
+        new_text = text[:position] + inserted + text[position + len(removed):]
+        first_line = len(split_lines(text[:position])) - 1
+        lines_added = len(split_lines(new_text)) - len(lines)
+        new_lines = split_lines(new_text)[first_line:first_line + 1 + max(0, lines_added)]
+        restructured += tree.replace_lines(first_line, 1 + max(0, -lines_added), new_lines)
+        text = new_text
+
+        expected = [(line, items, combined, unique)
+                    for line, _, items, combined, unique in aggregate(split_lines(text), filters)]
+        folders = [(node.line, node.items, node.combined, node.unique) for node in tree.folders]
+        assert folders == expected, (folders, expected)
+        _, changed = tree.take_changes()
+        assert all(node in tree.folders for node in changed)
+    print('{} live edits are ok, {} of them rebuilt the folders'.format(edits, restructured))
+
+
+def batch_test():
+    '''
+        Processes copies of the example tree in worker processes and checks the written files.
+
+        Args:
+            None
+        Returns:
+            None
+    '''
+    import shutil
+    from concurrent.futures import ProcessPoolExecutor
+
+    folder = tempfile.mkdtemp()
+    try:
+        for name, line_end in (('a.txt', '\r\n'), ('b.tree', '\n'), ('c.log', '\r')):
+            with open(os.path.join(folder, name), 'w', encoding='utf-8', newline='') as f:
+                f.write(line_end.join(split_lines(EXAMPLE)))
+        filter_sets = {'.txt': FilterSet(['#', u'×'], [u'€', '$']), '.tree': FilterSet(['#']),
+                       '*': FilterSet(['#'])}
+        with ProcessPoolExecutor(2) as executor:
+            processed = process_files(folder_files(folder), filter_sets, True, executor)
+        assert [(os.path.basename(path), count) for path, count in processed] == [
+            ('a.txt', 4), ('b.tree', 4)], processed
+
+        with open(os.path.join(folder, 'a.txt'), encoding='utf-8', newline='') as f:
+            lines = f.read().split('\r\n')
+        assert len(lines) == 27 and lines[0] == '{:<80}(23, 17, 4, 0)'.format('work'), lines[0]
+        with open(os.path.join(folder, 'b.tree'), encoding='utf-8', newline='') as f:
+            assert f.read().split('\n')[1] == '{:<80}(12, 5)'.format('    names 1')
+        with open(os.path.join(folder, 'c.log'), encoding='utf-8', newline='') as f:
+            assert f.read() == '\r'.join(split_lines(EXAMPLE))
+        print('batch processing is ok')
+    finally:
+        shutil.rmtree(folder)
+
+
+def benchmark(line_count=1000000):
+    '''
+        Aggregates a generated tree of about line_count lines, but at least 30101,
+        with three folder levels and two or more items per folder.
+
+        Args:
+            line_count = integer
+        Returns:
+            None
+    '''
+    import time
+
+    # at least two, a lone last item is not counted and editing it changes the folder above it
+    items_per_folder = max(2, line_count // 10000 - 1)
+
+    def generate():
+        yield 'root'
+        for i in range(100):
+            yield '    folder {}'.format(i)
+            for j in range(100):
+                yield '        folder {}.{}'.format(i, j)
+                for k in range(items_per_folder):
+                    yield '            item # {} €'.format(k)
+
+    expected_items = 100 * 100 * items_per_folder
+
+    started = time.time()
+    results = aggregate(generate(), FilterSet(['#', u'×'], [u'€', '$']))
+    elapsed = time.time() - started
+    lines = sum(1 for _ in generate())
+    assert results[0][2] == expected_items, (results[0][2], expected_items)
+    print('{} lines, {} folders aggregated in {:.2f}s'.format(lines, len(results), elapsed))
+
+    tree = LiveTree(FilterSet(['#', u'×'], [u'€', '$']))
+    started = time.time()
+    tree.rebuild('\n'.join(generate()))
+    print('live tree built in {:.2f}s'.format(time.time() - started))
+    tree.take_changes()
+    started = time.time()
+    for i in range(1000):
+        # a new item below the last one and removing it again
+        line = lines - 1
+        tree.replace_lines(line, 1, ['            item # {} €\n'.format(i), '            item'])
+        tree.replace_lines(line, 2, ['            item'])
+    assert not tree.take_changes()[0] and tree.folders[0].items == expected_items
+    print('2000 live item edits took {:.3f}s'.format(time.time() - started))
+
+
+if __name__ == '__main__':
+    import sys
+    self_test()
+    live_test()
+    batch_test()
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
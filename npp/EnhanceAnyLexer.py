@@ -10,16 +10,43 @@
     because the class uses the flag SC_INDICFLAG_VALUEFORE.
     See https://www.scintilla.org/ScintillaDoc.html#Indicators for more information on that topic
 
+    If BACKGROUND_PAINTING is enabled, the rest of the document is colored
+    in small time slices while npp is idle, see usage notes at the end of the script.
+
 '''
+import os
 import sys
-from Npp import (notepad, editor, editor1, editor2,
-                 NOTIFICATION, SCINTILLANOTIFICATION,
-                 INDICATORSTYLE, INDICFLAG, INDICVALUE)
+import json
+import time
+import bisect
+from collections import deque
+from ctypes import WinDLL, WINFUNCTYPE, c_size_t
+from ctypes.wintypes import HWND, UINT, DWORD
+from Npp import (notepad, editor, editor1, editor2, console,
+                 NOTIFICATION, SCINTILLANOTIFICATION, MODIFICATIONFLAGS,
+                 INDICATORSTYLE, INDICFLAG, INDICVALUE, FOLDLEVEL)
 
 if sys.version_info[0] == 2:
     from collections import OrderedDict as _dict
+    # on windows, time.clock is backed by the performance counter
+    _clock = time.clock
 else:
     _dict = dict
+    _clock = time.perf_counter
+
+try:
+    import tomllib
+except ImportError:
+    tomllib = None
+
+# an own instance so that the argtypes set here do not clash with those of other scripts
+user32 = WinDLL('user32')
+TIMERPROC = WINFUNCTYPE(None, HWND, UINT, c_size_t, DWORD)
+SetTimer = user32.SetTimer
+SetTimer.restype = c_size_t
+SetTimer.argtypes = [HWND, c_size_t, UINT, TIMERPROC]
+KillTimer = user32.KillTimer
+KillTimer.argtypes = [HWND, c_size_t]
 
 
 class EnhanceLexer:
@@ -36,21 +63,56 @@ class EnhanceLexer:
             return
 
         self.INDICATOR_ID = 0
+        # how many lines, at most, the scan may start before the first visible line
+        # to find matches which span multiple lines - 0 disables it
+        self.MAX_LOOKBACK_LINES = 100
         self.registered_lexers = _dict()
+        # bufferID -> sorted list of lines known to be safe restart points
+        self.checkpoints = {}
+
+        # directory with the rule packs, one LEXERNAME.json or LEXERNAME.toml per lexer
+        self.RULE_PACK_DIR = os.path.join(notepad.getPluginConfigDir(), 'EnhanceAnyLexer')
+        # lexer name -> path of a rule pack which has not been loaded yet
+        self.rule_packs = {}
+
+        # colors the whole document in time slices while npp is idle
+        self.BACKGROUND_PAINTING = False
+        self.SLICE_BUDGET_MS = 10       # max time spent per timer tick
+        self.TIMER_INTERVAL_MS = 100    # how often the timer ticks
+        self.IDLE_DELAY_MS = 300        # no background work while scrolling or typing
+        self.CHUNK_LINES = 200          # number of lines colored in one go
+        # bufferID -> {'position': first position not yet colored, 'dirty': [(start, end), ...]}
+        self.background_state = {}
+        # duration, in ms, of the most recent slices, used to tune SLICE_BUDGET_MS
+        self.slice_timings = deque(maxlen=100)
+        self.last_ui_time = 0
+        self.timer_id = 0
+        self.timer_proc = TIMERPROC(self.on_timer)
+
+        # one painting context per view, index 0 = editor1, index 1 = editor2
+        self.views = [self.view_context(editor1), self.view_context(editor2)]
+        # bufferID -> number of modifications, used to detect stale views
+        self.modification_counts = {}
 
         self.document_is_of_interest = False
-        self.regexes = None
         self.excluded_styles = None
+        # styles of the range currently being painted and the position of its first byte
+        self.styles = bytearray()
+        self.styles_start_position = 0
 
         editor1.indicSetStyle(self.INDICATOR_ID, INDICATORSTYLE.TEXTFORE)
         editor1.indicSetFlags(self.INDICATOR_ID, INDICFLAG.VALUEFORE)
         editor2.indicSetStyle(self.INDICATOR_ID, INDICATORSTYLE.TEXTFORE)
         editor2.indicSetFlags(self.INDICATOR_ID, INDICFLAG.VALUEFORE)
 
+        self.scan_rule_packs()
+
         editor.callbackSync(self.on_updateui, [SCINTILLANOTIFICATION.UPDATEUI])
         editor.callbackSync(self.on_marginclick, [SCINTILLANOTIFICATION.MARGINCLICK])
+        editor.callbackSync(self.on_modified, [SCINTILLANOTIFICATION.MODIFIED])
         notepad.callback(self.on_langchanged, [NOTIFICATION.LANGCHANGED])
         notepad.callback(self.on_bufferactivated, [NOTIFICATION.BUFFERACTIVATED])
+        notepad.callback(self.on_filebeforeclose, [NOTIFICATION.FILEBEFORECLOSE])
 
 
     @staticmethod
@@ -70,6 +132,26 @@ class EnhanceLexer:
         return (b << 16) + (g << 8) + r
 
 
+    @staticmethod
+    def view_context(_editor):
+        '''
+            Helper function
+            Creates the painting context of a view.
+
+            Args:
+                _editor = editor1 or editor2
+            Returns:
+                dict, the editor of the view, the buffer it shows, its language, the regexes and
+                      excluded styles of its lexer and what has been painted last
+        '''
+        return {'editor': _editor,
+                'buffer_id': None,
+                'language': None,
+                'regexes': None,
+                'excluded_styles': None,
+                'painted': None}
+
+
     def register_lexer(self, lexer_name, _regexes, excluded_styles):
         '''
             reformat provided regexes and cache everything
@@ -87,19 +169,134 @@ class EnhanceLexer:
         regexes = _dict()
         for k, v in _regexes.items():
             regexes[(k[0], self.rgb(*k[1]) | INDICVALUE.BIT)] = v
-        self.registered_lexers[lexer_name.lower()] = (regexes, excluded_styles)
+        self.registered_lexers[lexer_name.lower()] = (regexes, self.exclusion_table(excluded_styles))
+
+
+    def scan_rule_packs(self):
+        '''
+            Collects the rule packs found in RULE_PACK_DIR.
+            Only the file names are read, the lexer name is taken from it,
+            a rule pack is loaded when a buffer of that lexer gets activated the first time.
+
+            Args:
+                None
+            Returns:
+                None
+        '''
+        if not os.path.isdir(self.RULE_PACK_DIR):
+            return
+        for file_name in os.listdir(self.RULE_PACK_DIR):
+            lexer_name, extension = os.path.splitext(file_name)
+            if extension == '.json' or (extension == '.toml' and tomllib):
+                self.rule_packs[lexer_name.lower()] = os.path.join(self.RULE_PACK_DIR, file_name)
+
+
+    def load_rule_pack(self, path):
+        '''
+            Loads a rule pack and converts it into the form used by registered_lexers.
+            The regexes are checked by the engine which runs them, see regex_error,
+            to report errors now instead of while painting.
+            A rule pack which cannot be read or is malformed is reported in the console.
+
+            A rule pack looks like this, the order of the regexes is kept
+                {
+                    "excluded_styles": [1, 3, 4],
+                    "regexes": [
+                        {"color": [224, 108, 117], "regex": "\\b(cls|self)\\b", "group": 0}
+                    ]
+                }
+
+            Args:
+                path = string, the full path of a .json or .toml rule pack
+            Returns:
+                tuple, (regexes, excluded_styles) as stored in registered_lexers
+                or None if the rule pack could not be loaded
+        '''
+        try:
+            with open(path, 'rb') as f:
+                content = f.read().decode('utf8')
+            if path.endswith('.toml'):
+                rule_pack = tomllib.loads(content)
+            else:
+                rule_pack = json.loads(content)
+            regexes = _dict()
+            for i, rule in enumerate(rule_pack.get('regexes', [])):
+                error = self.regex_error(rule['regex'])
+                if error is not None:
+                    raise ValueError('invalid regex {}: {}'.format(rule['regex'], error))
+                regexes[(i, self.rgb(*rule['color']) | INDICVALUE.BIT)] = (rule['regex'], rule.get('group', 0))
+            return regexes, self.exclusion_table(rule_pack.get('excluded_styles', []))
+        except (IOError, OSError, ValueError, KeyError, TypeError, IndexError, AttributeError) as e:
+            console.writeError('EnhanceAnyLexer: rule pack {} could not be loaded: {}\n'.format(path, e))
+            return None
 
 
-    def paint_it(self, color, match_position, length, start_position, end_position):
+    @staticmethod
+    def regex_error(regex):
+        '''
+            Helper function
+            Checks a regex with boost, the engine editor.research uses,
+            by searching an empty range, python's re rejects valid boost syntax like \h.
+
+            Args:
+                regex = string
+            Returns:
+                string, the error message or None if the regex is valid
+        '''
+        try:
+            editor.research(regex, lambda m: None, 0, 0, 0, 1)
+        except Exception as e:
+            return str(e)
+        return None
+
+
+    @staticmethod
+    def exclusion_table(excluded_styles):
+        '''
+            Helper function
+            Converts the list of excluded styles into a lookup table
+            which can be indexed by the style id directly.
+
+            Args:
+                excluded_styles = list of integers in range of 0-255
+            Returns:
+                bytes, 256 entries, 1 for an excluded style, 0 otherwise
+        '''
+        table = bytearray(256)
+        for style in excluded_styles:
+            table[style] = 1
+        return bytes(table)
+
+
+    def is_excluded(self, position):
+        '''
+            Checks, without calling scintilla, whether the style at position
+            is one of the excluded styles.
+            Uses the styles fetched by paint_range, a position outside
+            of that range is never excluded.
+
+            Args:
+                position = integer, denotes the position to be checked
+            Returns:
+                bool
+        '''
+        index = position - self.styles_start_position
+        return 0 <= index < len(self.styles) and self.excluded_styles[self.styles[index]] == 1
+
+
+    def paint_it(self, _editor, match_position, length, start_position, end_position):
         '''
             This is where the actual coloring takes place.
-            Color, the position of the first character and
-            the length of the text to be colored must be provided.
+            The position of the first character and
+            the length of the text to be colored must be provided,
+            the color is expected to be set already by paint_range.
             Coloring occurs only if the character at the current position
             has not a style from the excluded styles list assigned.
+            A match starting before, e.g. found in the look-back region,
+            or ending after the given area is colored only within it.
 
             Args:
-                color = integer, expected in range of 0-16777215
+                _editor = editor1 or editor2, the view to be colored
                 match_position = integer,  denotes the start position of a match
                 length = integer, denotes how many chars need to be colored.
                 start_position = integer,  denotes the start position of the visual area
@@ -107,65 +304,287 @@ class EnhanceLexer:
             Returns:
                 None
         '''
-        if (match_position + length < start_position or
-            match_position > end_position or
-            editor.getStyleAt(match_position) in self.excluded_styles):
+        match_end = min(match_position + length, end_position)
+        fill_start = max(match_position, start_position)
+        if fill_start >= match_end or self.is_excluded(match_position):
             return
 
-        editor.setIndicatorCurrent(0)
-        editor.setIndicatorValue(color)
-        editor.indicatorFillRange(match_position, length)
+        _editor.indicatorFillRange(fill_start, match_end - fill_start)
+
 
+    def restart_position(self, view, start_line):
+        '''
+            Calculates the position from which the regexes have to be run
+            so that matches spanning multiple lines are still found
+            when their first line has been scrolled out of view.
+            A line with a lexer provided fold level of 0 is a safe restart point.
+            Found restart points are cached per buffer and the search backwards
+            never goes further than MAX_LOOKBACK_LINES.
 
-    def style(self):
+            Args:
+                view = dict, the painting context of the view
+                start_line = integer, the first visible document line
+            Returns:
+                integer, the position of the line to start scanning from
         '''
-            Calculates the text area to be searched for in the current document.
+        _editor = view['editor']
+        if self.MAX_LOOKBACK_LINES <= 0 or start_line == 0:
+            return _editor.positionFromLine(start_line)
+
+        lower_limit = max(0, start_line - self.MAX_LOOKBACK_LINES)
+        checkpoints = self.checkpoints.setdefault(view['buffer_id'], [])
+        index = bisect.bisect_right(checkpoints, start_line)
+        if index and checkpoints[index - 1] >= lower_limit:
+            return _editor.positionFromLine(checkpoints[index - 1])
+
+        restart_line = lower_limit
+        for line in range(start_line, lower_limit - 1, -1):
+            level = _editor.getFoldLevel(line)
+            if not level & FOLDLEVEL.WHITEFLAG and (level & FOLDLEVEL.NUMBERMASK) == FOLDLEVEL.BASE:
+                restart_line = line
+                bisect.insort(checkpoints, line)
+                break
+        return _editor.positionFromLine(restart_line)
+
+
+    def paint_range(self, view, scan_start_position, start_position, end_position):
+        '''
+            Deletes the old indicators of the given range and
+            runs all regexes to set the new ones.
+            The styles of the range are fetched once and used by all regexes.
+
+            Args:
+                view = dict, the painting context of the view
+                scan_start_position = integer, denotes where the regexes start searching
+                start_position = integer, denotes the start position of the area to be colored
+                end_position = integer, denotes the end position of the area to be colored
+            Returns:
+                None
+        '''
+        _editor = view['editor']
+        if _editor.getEndStyled() < end_position:
+            _editor.colourise(_editor.getEndStyled(), end_position)
+        self.styles = bytearray(_editor.getStyledText(scan_start_position, end_position)[1])
+        self.styles_start_position = scan_start_position
+        self.excluded_styles = view['excluded_styles']
+
+        _editor.setIndicatorCurrent(self.INDICATOR_ID)
+        _editor.indicatorClearRange(start_position, end_position - start_position)
+        for color, regex in view['regexes'].items():
+            _editor.setIndicatorValue(color[1])
+            _editor.research(regex[0],
+                             lambda m: self.paint_it(_editor,
+                                                     m.span(regex[1])[0],
+                                                     m.span(regex[1])[1] - m.span(regex[1])[0],
+                                                     start_position,
+                                                     end_position),
+                             0,
+                             scan_start_position,
+                             end_position)
+
+
+    def visible_lines(self, view):
+        '''
+            Calculates the document lines currently shown by a view.
+
+            Args:
+                view = dict, the painting context of the view
+            Returns:
+                tuple, (first line, last line)
+        '''
+        _editor = view['editor']
+        start_line = _editor.docLineFromVisible(_editor.getFirstVisibleLine())
+        end_line = _editor.docLineFromVisible(start_line + _editor.linesOnScreen())
+        if _editor.getWrapMode():
+            end_line = sum([_editor.wrapCount(x) for x in range(end_line)])
+        return start_line, end_line
+
+
+    def style(self, view=None):
+        '''
+            Calculates the text area to be searched for in the document of a view,
+            by default the active one.
             Calls up the regexes to find the position and
             calculates the length of the text to be colored.
-            Deletes the old indicators before setting new ones.
+            The search starts at a restart point before the visible area
+            but only the visible area gets colored.
+            Deletes the old indicators of the visible area before setting new ones.
+
+            Args:
+                view = dict, the painting context of the view, None means the active view
+            Returns:
+                tuple, (start position, end position) of the colored area
+        '''
+        if view is None:
+            view = self.views[notepad.getCurrentView()]
+        _editor = view['editor']
+        start_line, end_line = self.visible_lines(view)
+
+        onscreen_start_position = _editor.positionFromLine(start_line)
+        onscreen_end_pos = _editor.getLineEndPosition(end_line)
+        scan_start_position = self.restart_position(view, start_line)
+
+        self.paint_range(view, scan_start_position, onscreen_start_position, onscreen_end_pos)
+        view['painted'] = self.view_state(view, start_line, end_line)
+        return onscreen_start_position, onscreen_end_pos
+
+
+    def view_state(self, view, start_line, end_line):
+        '''
+            Helper function
+            Describes what a view shows, if it is still the same
+            after the next update, there is no need to color it again.
+
+            Args:
+                view = dict, the painting context of the view
+                start_line = integer, the first visible document line
+                end_line = integer, the last visible document line
+            Returns:
+                tuple
+        '''
+        return (view['buffer_id'], start_line, end_line,
+                self.modification_counts.get(view['buffer_id'], 0))
+
+
+    def refresh_inactive_view(self, view, painted_range):
+        '''
+            Colors the inactive view, but only if the document it shows
+            or its visible area has changed since it has been colored last.
+            If it shows the same document as the active view and its visible area
+            has just been colored for the active view, this is reused,
+            as indicators belong to the document and not to the view.
+
+            Args:
+                view = dict, the painting context of the inactive view
+                painted_range = tuple, (start position, end position) colored for the active view
+                                or None if the active view has not been colored
+            Returns:
+                None
+        '''
+        if view['regexes'] is None:
+            return
+        start_line, end_line = self.visible_lines(view)
+        state = self.view_state(view, start_line, end_line)
+        if state == view['painted']:
+            return
+
+        _editor = view['editor']
+        active_view = self.views[notepad.getCurrentView()]
+        if (painted_range and
+            view['buffer_id'] == active_view['buffer_id'] and
+            painted_range[0] <= _editor.positionFromLine(start_line) and
+            _editor.getLineEndPosition(end_line) <= painted_range[1]):
+            view['painted'] = state
+        else:
+            self.style(view)
+
+
+    def paint_next_slice(self):
+        '''
+            Colors the document of the active view in chunks of CHUNK_LINES lines
+            until SLICE_BUDGET_MS is used up.
+            Ranges modified behind the already colored part are done first,
+            afterwards the pass continues where it stopped the last time.
 
             Args:
                 None
             Returns:
                 None
         '''
+        view = self.views[notepad.getCurrentView()]
+        _editor = view['editor']
+        state = self.background_state.setdefault(view['buffer_id'], {'position': 0, 'dirty': []})
+        text_length = _editor.getTextLength()
+        started = _clock()
+        deadline = started + self.SLICE_BUDGET_MS / 1000.0
+        painted = False
+        while _clock() < deadline:
+            if state['dirty']:
+                start_position, end_position = state['dirty'].pop()
+                start_line = _editor.lineFromPosition(start_position)
+                end_line = _editor.lineFromPosition(end_position)
+            elif state['position'] < text_length:
+                start_line = _editor.lineFromPosition(state['position'])
+                end_line = start_line + self.CHUNK_LINES
+            else:
+                break
+            start_position = _editor.positionFromLine(start_line)
+            end_position = _editor.getLineEndPosition(end_line)
+            self.paint_range(view, self.restart_position(view, start_line), start_position, end_position)
+            state['position'] = max(state['position'], end_position + 1)
+            painted = True
+
+        if painted:
+            self.slice_timings.append((_clock() - started) * 1000)
+
+
+    def background_progress(self):
+        '''
+            Reports how much of the current document has been colored
+            by the background painting.
+
+            Args:
+                None
+            Returns:
+                float, in the range of 0.0-1.0
+        '''
+        text_length = editor.getTextLength()
+        if not text_length:
+            return 1.0
+        state = self.background_state.get(notepad.getCurrentBufferID())
+        return min(state['position'], text_length) / float(text_length) if state else 0.0
 
-        start_line = editor.docLineFromVisible(editor.getFirstVisibleLine())
-        end_line = editor.docLineFromVisible(start_line + editor.linesOnScreen())
-        if editor.getWrapMode():
-            end_line = sum([editor.wrapCount(x) for x in range(end_line)])
 
-        onscreen_start_position = editor.positionFromLine(start_line)
-        onscreen_end_pos = editor.getLineEndPosition(end_line)
+    def on_timer(self, hwnd, msg, timer_id, tick_count):
+        '''
+            Callback which gets called by the timer, from npp's message loop,
+            every TIMER_INTERVAL_MS milliseconds.
+            Triggers the next background slice if the document is of interest
+            and nothing happened within the last IDLE_DELAY_MS milliseconds.
+            Stops the timer if BACKGROUND_PAINTING has been disabled in the meantime.
+
+            Args:
+                provided by the timer but none are of interest
+            Returns:
+                None
+        '''
+        if not self.BACKGROUND_PAINTING:
+            KillTimer(None, self.timer_id)
+            self.timer_id = 0
+        elif (self.document_is_of_interest and
+              (_clock() - self.last_ui_time) * 1000 >= self.IDLE_DELAY_MS):
+            self.paint_next_slice()
 
-        editor.setIndicatorCurrent(0)
-        editor.indicatorClearRange(0, editor.getTextLength())
-        for color, regex in self.regexes.items():
-            editor.research(regex[0],
-                            lambda m: self.paint_it(color[1],
-                                                    m.span(regex[1])[0],
-                                                    m.span(regex[1])[1] - m.span(regex[1])[0],
-                                                    onscreen_start_position,
-                                                    onscreen_end_pos),
-                            0,
-                            onscreen_start_position,
-                            onscreen_end_pos)
 
     def check_lexers(self):
         '''
             Checks if the current document of each view is of interest
-            and sets the flag accordingly
+            and sets the flag accordingly.
+            A not yet loaded rule pack for the lexer gets loaded now.
+            Only a view whose language or regexes changed needs to be colored again,
+            a view showing another buffer is detected by its painted state anyway.
 
             Args:
                 None
             Returns:
                 None
         '''
-
-        current_language = notepad.getLanguageName(notepad.getLangType()).replace('udf - ','').lower()
-        self.document_is_of_interest = current_language in self.registered_lexers
-        if self.document_is_of_interest:
-            self.regexes, self.excluded_styles = self.registered_lexers[current_language]
+        for view in self.views:
+            if view['buffer_id'] is None:
+                continue
+            language = notepad.getLanguageName(notepad.getLangType(view['buffer_id'])).replace('udf - ','').lower()
+            if language not in self.registered_lexers and language in self.rule_packs:
+                rule_pack = self.load_rule_pack(self.rule_packs[language])
+                if rule_pack is not None:
+                    self.registered_lexers[language] = rule_pack
+                    del self.rule_packs[language]
+            regexes, excluded_styles = self.registered_lexers.get(language, (None, None))
+            if language != view['language'] or regexes is not view['regexes']:
+                view['painted'] = None
+            view['language'] = language
+            view['regexes'], view['excluded_styles'] = regexes, excluded_styles
+
+        self.document_is_of_interest = self.views[notepad.getCurrentView()]['regexes'] is not None
 
 
     def on_marginclick(self, args):
@@ -183,16 +602,68 @@ class EnhanceLexer:
             self.style()
 
 
+    def on_modified(self, args):
+        '''
+            Callback which gets called every time the document gets modified.
+            Drops all cached restart points from the modified line onwards
+            as those might not be valid anymore.
+            Keeps the background painting state in sync with the modification,
+            a modified range behind the already colored part gets marked as dirty.
+
+            Args:
+                position, length and modificationType are of interest
+            Returns:
+                None
+        '''
+        modification_type = args['modificationType']
+        if modification_type & (MODIFICATIONFLAGS.INSERTTEXT | MODIFICATIONFLAGS.DELETETEXT):
+            buffer_id = notepad.getCurrentBufferID()
+            position = args['position']
+            self.modification_counts[buffer_id] = self.modification_counts.get(buffer_id, 0) + 1
+            checkpoints = self.checkpoints.get(buffer_id)
+            if checkpoints:
+                line = editor.lineFromPosition(position)
+                del checkpoints[bisect.bisect_left(checkpoints, line):]
+
+            state = self.background_state.get(buffer_id)
+            if state and position < state['position']:
+                delta = args['length'] if modification_type & MODIFICATIONFLAGS.INSERTTEXT else -args['length']
+
+                def shift(value):
+                    return value if value <= position else max(position, value + delta)
+
+                state['position'] = shift(state['position'])
+                state['dirty'] = [(shift(start), shift(end)) for start, end in state['dirty']]
+                state['dirty'].append((position, position + max(delta, 0)))
+
+
+    def on_filebeforeclose(self, args):
+        '''
+            Callback which gets called every time a document is about to be closed.
+            Removes the cached restart points and background painting state of that buffer.
+
+            Args:
+                bufferID is of interest
+            Returns:
+                None
+        '''
+        self.checkpoints.pop(args['bufferID'], None)
+        self.background_state.pop(args['bufferID'], None)
+        self.modification_counts.pop(args['bufferID'], None)
+
+
     def on_bufferactivated(self, args):
         '''
             Callback which gets called every time one switches a document.
-            Triggers the check if the document is of interest.
+            Remembers which buffer the active view shows and
+            triggers the check if the document is of interest.
 
             Args:
                 provided by notepad object but none are of interest
             Returns:
                 None
         '''
+        self.views[notepad.getCurrentView()]['buffer_id'] = notepad.getCurrentBufferID()
         self.check_lexers()
 
 
@@ -201,34 +672,46 @@ class EnhanceLexer:
             Callback which gets called every time scintilla
             (aka the editor) changed something within the document.
 
-            Triggers the styling function if the document is of interest.
+            Triggers the styling function if the document is of interest
+            and starts the background painting timer if requested.
+            As this runs within npp's main thread, so does the timer.
+            Afterwards the inactive view gets colored, if needed.
 
             Args:
                 provided by scintilla but none are of interest
             Returns:
                 None
         '''
+        active_view = notepad.getCurrentView()
+        painted_range = None
         if self.document_is_of_interest:
-            self.style()
+            self.last_ui_time = _clock()
+            painted_range = self.style(self.views[active_view])
+            if self.BACKGROUND_PAINTING and not self.timer_id:
+                self.timer_id = SetTimer(None, 0, self.TIMER_INTERVAL_MS, self.timer_proc)
+        self.refresh_inactive_view(self.views[1 - active_view], painted_range)
 
 
     def on_langchanged(self, args):
         '''
             Callback gets called every time one uses the Language menu to set a lexer
-            Triggers the check if the document is of interest
+            Triggers the check if the document is of interest and
+            restarts the background painting as other regexes might be used now.
 
             Args:
                 provided by notepad object but none are of interest
             Returns:
                 None
         '''
+        self.background_state.pop(notepad.getCurrentBufferID(), None)
         self.check_lexers()
 
 
     def main(self):
         '''
             Main function entry point.
-            Simulates two events to enforce detection of current document
+            Finds out which buffer each view shows and
+            simulates two events to enforce detection of current document
             and potential styling.
 
             Args:
@@ -236,6 +719,9 @@ class EnhanceLexer:
             Returns:
                 None
         '''
+        for _, buffer_id, index, view in notepad.getFiles():
+            if index == notepad.getCurrentDocIndex(view):
+                self.views[view]['buffer_id'] = buffer_id
         self.on_bufferactivated(None)
         self.on_updateui(None)
 
@@ -243,10 +729,10 @@ class EnhanceLexer:
 
 # Usage:
 #
-#   Only the active document and for performance reasons, only the currently visible area
-#   is scanned and colored.
-#   This means, that a regular expression match is assumed to reflect only one line of code
-#   and not to extend over multiple lines.
+#   Only the documents shown by the two views and for performance reasons,
+#   only the currently visible area is colored.
+#   The inactive view is colored only if the document it shows or its visible area has changed.
+#   If both views show the same document, the area already colored for the active view is reused.
 #   As an illustration, in python one can define, for example, a function like this
 #
 #       def my_function(param1, param2, param3, param4):
@@ -260,15 +746,30 @@ class EnhanceLexer:
 #                       param4):
 #           pass
 #
-#   Now, if a regular expression like "(?:(?:def)\s\w+)\s*\((.+)\):" were used to color all parameters,
-#   then this would only work as long as the line "def my_function(param1," is visible.
+#   Now, if a regular expression like "(?:(?:def)\s\w+)\s*\(([^)]+)\):" were used to color all parameters,
+#   then this would only work as long as the line "def my_function(param1," is visible,
+#   if the scan would start at the first visible line.
 #
-#   A possible approach to avoid this would be to define an offset range.
+#   Therefore the scan starts at the nearest line before the visible area which has
+#   a fold level of 0, as reported by the lexer, e.g. the "def my_function(param1," line.
+#   Such restart points are cached per buffer and the look-back is limited by MAX_LOOKBACK_LINES,
+#   so a match is found as long as it does not start more than MAX_LOOKBACK_LINES lines
+#   before the first visible line. Setting MAX_LOOKBACK_LINES to 0 restores the old behavior.
+#   Note, the regexes are run by editor.research, to be on the safe side, prefer something
+#   like [^)] over "." if a match should span multiple lines. The bundled python rule below
+#   still uses (.+) and therefore colors single line definitions only, replace it with
+#   ([^)]+) to color the parameters of definitions spanning multiple lines as well.
 #
-#   offset_start_line = start_line - offset
-#   if offset_start_line < 0 then offset_start_line = 0
+#   Setting BACKGROUND_PAINTING to True colors the rest of the document as well,
+#   e.g. to get a colored document map, without slowing down the visible area.
+#   The visible area is still colored immediately, the rest is colored by a timer,
+#   which ticks every TIMER_INTERVAL_MS milliseconds but only does something
+#   if there was no scrolling or typing within the last IDLE_DELAY_MS milliseconds,
+#   and spends at most SLICE_BUDGET_MS milliseconds per tick.
+#   Modifications do not restart the whole pass, only the modified ranges are redone.
+#   To tune SLICE_BUDGET_MS, check the timings of the recent slices and the progress, like
 #
-#   Not sure if this is the best approach - still investigating.
+#       print(list(_enhance_lexer.slice_timings), _enhance_lexer.background_progress())
 #
 # Definition of colors and regular expressions
 #   Note, the order in which a regular expressions will be processed is determined by its creation,
@@ -285,6 +786,33 @@ class EnhanceLexer:
 #   b = color tuple in the form of (r,g,b). Example (255,0,0) for the color red.
 #   c = raw byte string, describes the regular expression. Example r'\w+'
 #   d = integer, denotes which match group should be considered
+#
+#   Instead of editing this script, the same can be defined in rule packs, one file per lexer,
+#   stored in RULE_PACK_DIR (PythonScript's plugin config directory + EnhanceAnyLexer).
+#   The file name, without extension, is the lexer name, e.g. python.json or "markdown (default).json".
+#   The order of the regexes within a rule pack determines the processing order.
+#
+#       {
+#           "excluded_styles": [1, 3, 4, 6, 7, 12, 16, 17, 18, 19],
+#           "regexes": [
+#               {"color": [224, 108, 117], "regex": "\\b(cls|self)\\b", "group": 0},
+#               {"color": [86, 182, 194], "regex": "(\\*|\\*\\*)(?=\\w)", "group": 0}
+#           ]
+#       }
+#
+#   With python 3.11 and newer, rule packs can be written in toml as well
+#
+#       excluded_styles = [1, 3, 4, 6, 7, 12, 16, 17, 18, 19]
+#       [[regexes]]
+#       color = [224, 108, 117]
+#       regex = '\b(cls|self)\b'
+#       group = 0
+#
+#   At startup only the file names are read, a rule pack is loaded the first time
+#   a document using its lexer gets activated. A rule pack which cannot be loaded,
+#   e.g. because of a syntax error or an invalid regex, is reported in the console
+#   and tried again the next time such a document gets activated.
+#   Lexers registered via register_lexer take precedence.
 
 # Example
 # builtin lexers - like python
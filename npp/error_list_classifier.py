@@ -0,0 +1,568 @@
+# -*- coding: utf-8 -*-
+'''
+    A pure python version of the classification done by scintilla's errorlist lexer.
+
+    Used by error_list_lexer_support.py and error_list_lexer_support2.py
+    as a container lexer if the builtin errorlist lexer is not available.
+    It needs to be in the same directory as those scripts.
+
+    It has no dependency on npp, it works on bytes and can therefore be used
+    to classify, or strip the escape sequences of, log files of any size, line by line.
+
+    ErrorIndex keeps the line numbers of the error lines, per style, sorted,
+    so that the next or previous error can be found by bisection.
+
+    Running it directly, e.g. python error_list_classifier.py [size in MB],
+    checks the classification of some sample lines and measures
+    how long it takes to classify a generated build log.
+'''
+import re
+from bisect import bisect_left, bisect_right
+
+SCE_ERR_DEFAULT = 0
+SCE_ERR_PYTHON = 1
+SCE_ERR_GCC = 2
+SCE_ERR_MS = 3
+SCE_ERR_CMD = 4
+SCE_ERR_BORLAND = 5
+SCE_ERR_PERL = 6
+SCE_ERR_NET = 7
+SCE_ERR_LUA = 8
+SCE_ERR_CTAG = 9
+SCE_ERR_DIFF_CHANGED = 10
+SCE_ERR_DIFF_ADDITION = 11
+SCE_ERR_DIFF_DELETION = 12
+SCE_ERR_DIFF_MESSAGE = 13
+SCE_ERR_PHP = 14
+SCE_ERR_ELF = 15
+SCE_ERR_IFC = 16
+SCE_ERR_IFORT = 17
+SCE_ERR_ABSF = 18
+SCE_ERR_TIDY = 19
+SCE_ERR_JAVA_STACK = 20
+SCE_ERR_VALUE = 21
+SCE_ERR_GCC_INCLUDED_FROM = 22
+SCE_ERR_ESCSEQ = 23
+SCE_ERR_ESCSEQ_UNKNOWN = 24
+SCE_ERR_ES_BLACK = 40
+
+# the styles of lines which refer to a location, and their names shown in the status bar
+ERROR_STYLES = {
+    SCE_ERR_PYTHON: 'python',
+    SCE_ERR_GCC: 'gcc',
+    SCE_ERR_MS: 'msvc',
+    SCE_ERR_BORLAND: 'borland',
+    SCE_ERR_PERL: 'perl',
+    SCE_ERR_NET: '.net',
+    SCE_ERR_LUA: 'lua',
+    SCE_ERR_PHP: 'php',
+    SCE_ERR_ELF: 'elf',
+    SCE_ERR_IFC: 'ifc',
+    SCE_ERR_IFORT: 'ifort',
+    SCE_ERR_ABSF: 'absf',
+    SCE_ERR_TIDY: 'tidy',
+    SCE_ERR_JAVA_STACK: 'java',
+    SCE_ERR_GCC_INCLUDED_FROM: 'included from',
+}
+
+CSI = b'\x1b['
+_MS_WORDS = (b'error', b'warning', b'fatal', b'catastrophic', b'note', b'remark')
+_FIRST_CANDIDATE = re.compile(b'[:(\t]')
+_ALPHA = re.compile(b'[A-Za-z]*')
+_ESCAPE_SEQUENCE = re.compile(b'\x1b\\[[^\x40-\x7e]*(?:[\x40-\x7e]|\\Z)')
+_TERMINATED_ESCAPE_SEQUENCE = re.compile(b'\x1b\\[[^\x40-\x7e\r\n]*[\x40-\x7e]')
+_LOCATIONS = {
+    SCE_ERR_PYTHON: re.compile(b'File "([^"]+)", line (\\d+)'),
+    SCE_ERR_GCC: re.compile(b'^\\s*(.+?):(\\d+)'),
+    SCE_ERR_MS: re.compile(b'^\\s*(.+?)\\((\\d+)'),
+    SCE_ERR_PERL: re.compile(b' at (.+) line (\\d+)'),
+    SCE_ERR_NET: re.compile(b' in (.+):line (\\d+)'),
+    SCE_ERR_LUA: re.compile(b'file (.+) at line (\\d+)'),
+    SCE_ERR_PHP: re.compile(b' in (.+) on line (\\d+)'),
+    SCE_ERR_ELF: re.compile(b'Line (\\d+), file (.+?)(?:\\s*$|:)'),
+    SCE_ERR_JAVA_STACK: re.compile(b'\\((\\S+\\.java):(\\d+)\\)'),
+    SCE_ERR_GCC_INCLUDED_FROM: re.compile(b'from (.+?):(\\d+)'),
+}
+
+
+def _is_digit(ch):
+    return 48 <= ch <= 57
+
+
+def _generic_style(line):
+    '''
+        Mimics the state machine scintilla uses to detect
+        gcc, microsoft and ctags like lines.
+        Only the positions of : ( and tab can start a match,
+        so it jumps from one to the next instead of checking every byte.
+
+        Args:
+            line = bytes, a single line including its line ending
+        Returns:
+            integer, one of the SCE_ERR_* styles
+    '''
+    length = len(line)
+    first_space = line.find(b' ')
+    # lines starting with a tab, e.g. a Lua traceback, are neither microsoft nor ctags lines
+    initial_tab = line[:1] == b'\t'
+    initial_colon_part = False
+    state = None
+
+    position = 0
+    while True:
+        match = _FIRST_CANDIDATE.search(line, position)
+        if match is None:
+            break
+        i = match.start()
+        ch = line[i]
+        ch_next = line[i + 1] if i + 1 < length else 32
+        is_space = 0 <= first_space < i
+        position = i + 1
+
+        if ch == 58:  # :
+            if ch_next not in (92, 47, 32):  # \ / space
+                state = 'gcc'
+                break
+            elif ch_next == 32:  # indicates a Lua 5.1 error message
+                initial_colon_part = True
+        elif ch == 40:  # (
+            if 49 <= ch_next <= 57 and not initial_tab:
+                state = 'ms'
+                break
+        elif not is_space and not initial_tab:  # tab
+            state = 'ctags'
+            break
+
+    if state == 'gcc':
+        # <filename>:<line>:<column>
+        j = i + 1
+        if j < length and (line[j] == 45 or _is_digit(line[j])):
+            j += 1
+            while j < length and _is_digit(line[j]):
+                j += 1
+            if j < length and line[j] == 58:
+                j += 1
+                while j < length and _is_digit(line[j]):
+                    j += 1
+                if j < length:
+                    return SCE_ERR_LUA if initial_colon_part else SCE_ERR_GCC
+
+    elif state == 'ms':
+        # <filename>(<line>) : or <filename>(<line>,<column>)
+        j = i + 2
+        while j < length and (_is_digit(line[j]) or line[j] == 32):
+            j += 1
+        if j < length and line[j] == 44:  # ,
+            j += 1
+            while j < length and (_is_digit(line[j]) or line[j] == 32):
+                j += 1
+            if j < length and line[j] == 41:
+                return SCE_ERR_MS
+        elif j < length and line[j] == 41:  # )
+            j += 1
+            ch = line[j] if j < length else 0
+            ch_next = line[j + 1] if j + 1 < length else 32
+            if ch == 32 and ch_next == 58:
+                return SCE_ERR_MS
+            elif (ch == 58 and ch_next == 32) or ch == 32:
+                word = _ALPHA.match(line, j + (1 if ch == 32 else 2)).group().lower()
+                if word in _MS_WORDS:
+                    return SCE_ERR_MS
+
+    elif state == 'ctags':
+        # <identifier>\t<filename>\t<message>
+        j = line.find(b'\t', i + 1)
+        if j != -1:
+            j += 1
+            if j < length and (_is_digit(line[j]) or line[j:j + 2] == b'/^'):
+                return SCE_ERR_CTAG
+            start_string = line.find(b'/^', j)
+            if start_string != -1 and line.find(b'$/', start_string) != -1:
+                return SCE_ERR_CTAG
+
+    if initial_colon_part and b': warning C' in line:
+        # Microsoft warning without line number
+        return SCE_ERR_MS
+    return SCE_ERR_DEFAULT
+
+
+def classify_line(line):
+    '''
+        Classifies a line the same way scintilla's errorlist lexer does.
+
+        Args:
+            line = bytes, a single line including its line ending
+        Returns:
+            integer, one of the SCE_ERR_* styles
+    '''
+    if not line:
+        return SCE_ERR_DEFAULT
+    first = line[0]
+    if first == 62:  # >
+        return SCE_ERR_CMD
+    elif first == 60:  # <
+        return SCE_ERR_DIFF_DELETION
+    elif first == 33:  # !
+        return SCE_ERR_DIFF_CHANGED
+    elif first == 43:  # +
+        return SCE_ERR_DIFF_MESSAGE if line.startswith(b'+++ ') else SCE_ERR_DIFF_ADDITION
+    elif first == 45:  # -
+        return SCE_ERR_DIFF_MESSAGE if line.startswith(b'--- ') else SCE_ERR_DIFF_DELETION
+    elif line.startswith(b'cf90-'):
+        return SCE_ERR_ABSF
+    elif line.startswith(b'fortcom:'):
+        return SCE_ERR_IFORT
+    elif b'File "' in line and b', line ' in line:
+        return SCE_ERR_PYTHON
+    elif b' in ' in line and b' on line ' in line:
+        return SCE_ERR_PHP
+    elif ((b'Error ' in line or b'Warning ' in line) and
+          b' at (' in line and b') : ' in line and
+          line.find(b' at (') < line.find(b') : ')):
+        return SCE_ERR_IFC
+    elif line.startswith(b'Error ') or line.startswith(b'Warning '):
+        return SCE_ERR_BORLAND
+    elif b'at line ' in line and b'file ' in line:
+        return SCE_ERR_LUA
+    elif b' at ' in line and b' line ' in line and line.find(b' at ') + 4 < line.find(b' line '):
+        return SCE_ERR_PERL
+    elif line.startswith(b'   at ') and b':line ' in line:
+        return SCE_ERR_NET
+    elif line.startswith(b'Line ') and b', file ' in line:
+        return SCE_ERR_ELF
+    elif line.startswith(b'line ') and b' column ' in line:
+        return SCE_ERR_TIDY
+    elif line.startswith(b'\tat ') and b'(' in line and b'.java:' in line:
+        return SCE_ERR_JAVA_STACK
+    elif line.startswith(b'In file included from ') or line.startswith(b'                 from '):
+        return SCE_ERR_GCC_INCLUDED_FROM
+    elif b'warning LNK' in line:
+        return SCE_ERR_MS
+    return _generic_style(line)
+
+
+def _style_from_sequence(sequence):
+    '''
+        Converts the parameters of a color escape sequence into a SCE_ERR_ES_* style.
+
+        Args:
+            sequence = bytes, the parameters between CSI and the final m
+        Returns:
+            integer
+    '''
+    bold = 0
+    colour = 0
+    for parameter in re.findall(b'[0-9]{1,2}', sequence):
+        value = int(parameter)
+        if value == 0:
+            colour = 0
+            bold = 0
+        elif value == 1:
+            bold = 1
+        elif 30 <= value <= 37:
+            colour = value - 30
+    return SCE_ERR_ES_BLACK + bold * 8 + colour
+
+
+def line_style_runs(line, escape_sequences=True):
+    '''
+        Calculates the styles of a line.
+
+        Args:
+            line = bytes, a single line including its line ending
+            escape_sequences = bool, whether ansi escape sequences should be interpreted
+        Returns:
+            list of (length, style) tuples which cover the whole line
+    '''
+    style = classify_line(line)
+    if not escape_sequences or CSI not in line:
+        return [(len(line), style)]
+
+    runs = []
+    portion_style = style
+    position = 0
+    for match in _ESCAPE_SEQUENCE.finditer(line):
+        if match.start() > position:
+            runs.append((match.start() - position, portion_style))
+        sequence = match.group()
+        final = sequence[-1:]
+        if len(sequence) == 2 or not b'\x40' <= final <= b'\x7e':
+            # sequence not terminated
+            runs.append((len(line) - match.start(), SCE_ERR_ESCSEQ_UNKNOWN))
+            return runs
+        elif final == b'm':
+            runs.append((len(sequence), SCE_ERR_ESCSEQ))
+            portion_style = _style_from_sequence(sequence[2:-1])
+        elif final == b'K':  # erase to end of line
+            runs.append((len(sequence), SCE_ERR_ESCSEQ))
+        else:
+            runs.append((len(sequence), SCE_ERR_ESCSEQ_UNKNOWN))
+            portion_style = style
+        position = match.end()
+    if position < len(line):
+        runs.append((len(line) - position, portion_style))
+    return runs
+
+
+def iter_style_runs(lines, escape_sequences=True):
+    '''
+        Calculates the styles of many lines, consecutive runs
+        with the same style are merged to keep the number of setStyling calls low.
+
+        Args:
+            lines = iterable of bytes, each line including its line ending
+            escape_sequences = bool, whether ansi escape sequences should be interpreted
+        Returns:
+            generator of (length, style) tuples
+    '''
+    current_length = 0
+    current_style = SCE_ERR_DEFAULT
+    for line in lines:
+        for length, style in line_style_runs(line, escape_sequences):
+            if style == current_style:
+                current_length += length
+            else:
+                if current_length:
+                    yield current_length, current_style
+                current_length = length
+                current_style = style
+    if current_length:
+        yield current_length, current_style
+
+
+def iter_file_style_runs(path, escape_sequences=True):
+    '''
+        Streams the style runs of a file, only one line is held in memory at a time.
+
+        Args:
+            path = string, the log file to be classified
+            escape_sequences = bool, whether ansi escape sequences should be interpreted
+        Returns:
+            generator of (length, style) tuples
+    '''
+    with open(path, 'rb') as f:
+        for run in iter_style_runs(f, escape_sequences):
+            yield run
+
+
+def strip_escape_sequences(data):
+    '''
+        Removes all ansi escape sequences, e.g. to be able to search the plain text.
+
+        Args:
+            data = bytes
+        Returns:
+            bytes
+    '''
+    return _TERMINATED_ESCAPE_SEQUENCE.sub(b'', data)
+
+
+def error_location(line):
+    '''
+        Extracts the file and line number an error line refers to.
+
+        Args:
+            line = bytes, a single line including its line ending
+        Returns:
+            (bytes, integer) tuple of path and 1-based line number, or None
+    '''
+    line = strip_escape_sequences(line)
+    style = classify_line(line)
+    pattern = _LOCATIONS.get(style)
+    match = pattern.search(line) if pattern else None
+    if match is None:
+        return None
+    if style == SCE_ERR_ELF:
+        line_number, path = match.groups()
+    else:
+        path, line_number = match.groups()
+    return path.strip(), int(line_number)
+
+
+class ErrorIndex:
+    '''
+        Sorted line numbers of the error lines of a document, per style.
+        Lines get added in ascending order, chunk by chunk, and if the document
+        gets modified, everything from the modified line onwards is dropped
+        and added again.
+    '''
+    def __init__(self):
+        self.lines = {style: [] for style in ERROR_STYLES}
+        # number of lines, from the start of the document, which have been indexed
+        self.indexed_lines = 0
+
+    def add_lines(self, lines):
+        '''
+            Classifies the lines following the already indexed ones.
+
+            Args:
+                lines = iterable of bytes, each line including its line ending
+            Returns:
+                None
+        '''
+        line_number = self.indexed_lines
+        for line in lines:
+            numbers = self.lines.get(classify_line(line))
+            if numbers is not None:
+                numbers.append(line_number)
+            line_number += 1
+        self.indexed_lines = line_number
+
+    def truncate(self, line):
+        '''
+            Forgets everything from line onwards.
+
+            Args:
+                line = integer, 0-based line number
+            Returns:
+                None
+        '''
+        if line >= self.indexed_lines:
+            return
+        for numbers in self.lines.values():
+            del numbers[bisect_left(numbers, line):]
+        self.indexed_lines = line
+
+    def next_line(self, line):
+        '''
+            Args:
+                line = integer, 0-based line number
+            Returns:
+                integer, the first indexed error line after line, or None
+        '''
+        candidates = []
+        for numbers in self.lines.values():
+            i = bisect_right(numbers, line)
+            if i < len(numbers):
+                candidates.append(numbers[i])
+        return min(candidates) if candidates else None
+
+    def previous_line(self, line):
+        '''
+            Args:
+                line = integer, 0-based line number
+            Returns:
+                integer, the last indexed error line before line, or None
+        '''
+        candidates = []
+        for numbers in self.lines.values():
+            i = bisect_left(numbers, line)
+            if i:
+                candidates.append(numbers[i - 1])
+        return max(candidates) if candidates else None
+
+    def counts(self):
+        '''
+            Returns:
+                list of (name, count) tuples of the styles found so far
+        '''
+        return [(ERROR_STYLES[style], len(numbers))
+                for style, numbers in sorted(self.lines.items()) if numbers]
+
+
+SAMPLES = [
+    (b'>make all\n', SCE_ERR_CMD),
+    (b'+++ b/main.c\n', SCE_ERR_DIFF_MESSAGE),
+    (b'+ added line\n', SCE_ERR_DIFF_ADDITION),
+    (b'- removed line\n', SCE_ERR_DIFF_DELETION),
+    (b'! changed line\n', SCE_ERR_DIFF_CHANGED),
+    (b'  File "main.py", line 12, in <module>\n', SCE_ERR_PYTHON),
+    (b'Fatal error: oops in /var/www/index.php on line 3\n', SCE_ERR_PHP),
+    (b'Error E2451 main.cpp 12: Undefined symbol\n', SCE_ERR_BORLAND),
+    (b'Died at script.pl line 42.\n', SCE_ERR_PERL),
+    (b'   at Program.Main() in C:\\src\\Program.cs:line 7\n', SCE_ERR_NET),
+    (b'line 42 column 1 - Warning: missing <li>\n', SCE_ERR_TIDY),
+    (b'\tat com.example.Main.run(Main.java:12)\n', SCE_ERR_JAVA_STACK),
+    (b'In file included from main.c:1:\n', SCE_ERR_GCC_INCLUDED_FROM),
+    (b'main.c:12:5: error: expected ; before }\n', SCE_ERR_GCC),
+    (b'lua: test.lua:3: attempt to call a nil value\n', SCE_ERR_LUA),
+    (b'main.cpp(12) : error C2065: undeclared identifier\n', SCE_ERR_MS),
+    (b'main.cpp(12): warning C4996: deprecated\n', SCE_ERR_MS),
+    (b'Program.cs(12,5): error CS1002: ; expected\n', SCE_ERR_MS),
+    (b'main\tmain.c\t/^int main()$/;"\tf\n', SCE_ERR_CTAG),
+    (b'link.obj : warning LNK4075: ignoring /EDITANDCONTINUE\n', SCE_ERR_MS),
+    (b'C:\\Program Files\\x\\main.cpp(12): error C2065: x\n', SCE_ERR_MS),
+    (b'my file.cpp(12) : error C1: x\n', SCE_ERR_MS),
+    (b'\tstdin:1: in main chunk\n', SCE_ERR_GCC),
+    (b'Compiling main.c\n', SCE_ERR_DEFAULT),
+    (b'call foo(0) returned\n', SCE_ERR_DEFAULT),
+]
+
+
+def self_test():
+    '''
+        Checks the classification of the sample lines and of an escape sequence line.
+
+        Args:
+            None
+        Returns:
+            None
+    '''
+    for line, expected in SAMPLES:
+        assert classify_line(line) == expected, (line, classify_line(line), expected)
+    runs = line_style_runs(b'ok \x1b[1;31mfailed\x1b[0m done\n')
+    assert runs == [(3, SCE_ERR_DEFAULT), (7, SCE_ERR_ESCSEQ), (6, SCE_ERR_ES_BLACK + 9),
+                    (4, SCE_ERR_ESCSEQ), (6, SCE_ERR_ES_BLACK)], runs
+    assert strip_escape_sequences(b'ok \x1b[1;31mfailed\x1b[0m\n') == b'ok failed\n'
+
+    assert error_location(b'  File "main.py", line 12, in <module>\n') == (b'main.py', 12)
+    assert error_location(b'src/main.c:42:5: error: expected \';\'\n') == (b'src/main.c', 42)
+    assert error_location(b'\tat com.example.Main.run(Main.java:12)\n') == (b'Main.java', 12)
+    assert error_location(b'2024-01-01 nothing to see here\n') is None
+
+    index = ErrorIndex()
+    lines = [line for line, _ in SAMPLES]
+    index.add_lines(lines[:5])
+    index.add_lines([])
+    index.add_lines(lines[5:])
+    assert index.indexed_lines == len(lines)
+    python_line = lines.index(b'  File "main.py", line 12, in <module>\n')
+    assert index.lines[SCE_ERR_PYTHON] == [python_line]
+    assert index.next_line(python_line) == python_line + 1
+    assert index.previous_line(python_line) is None
+    assert index.next_line(python_line - 1) == python_line
+    index.truncate(python_line)
+    assert index.indexed_lines == python_line and index.next_line(0) is None
+    print('classification of {} sample lines is ok'.format(len(SAMPLES)))
+
+
+def benchmark(size_mb=200):
+    '''
+        Classifies a generated build log of about size_mb megabytes.
+
+        Args:
+            size_mb = integer, size of the generated log
+        Returns:
+            None
+    '''
+    import os
+    import time
+    import tempfile
+
+    block = b''.join(line for line, _ in SAMPLES)
+    block += b'[build] \x1b[32mok\x1b[0m compiled unit 42\n' * 20
+    block += b'2024-01-01 some ordinary progress message without anything special\n' * 60
+    fd, path = tempfile.mkstemp(suffix='.log')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for _ in range(size_mb * 1024 * 1024 // len(block) + 1):
+                f.write(block)
+        size = os.path.getsize(path)
+        started = time.time()
+        runs = 0
+        styled = 0
+        for length, _ in iter_file_style_runs(path):
+            runs += 1
+            styled += length
+        elapsed = time.time() - started
+        assert styled == size
+        print('{:.0f} MB, {} runs in {:.2f}s ({:.1f} MB/s)'.format(size / 1048576.0, runs,
+                                                                  elapsed, size / 1048576.0 / elapsed))
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    import sys
+    self_test()
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -8,9 +8,45 @@
     error_list_lexer.show_escape_chars = not error_list_lexer.show_escape_chars
     editor.styleSetVisible(error_list_lexer.SCE_ERR_ESCSEQ, error_list_lexer.show_escape_chars)
 
+    The colours are defined in the theme table, to change them, e.g.
+    
+    error_list_lexer.theme[error_list_lexer.SCE_ERR_PYTHON] = (255,128,0)
+    error_list_lexer.load_theme()
+
+    the new theme is applied when a document of interest gets activated.
+    None stands for the default foreground colour of npp's current theme,
+    which is looked up every time the styles get applied.
+
+    If the builtin errorlist lexer is not available, the document is styled
+    by error_list_classifier.py, which needs to be in the same directory as this script.
+
+    To search a log without being disturbed by the escape sequences, use
+    error_list_lexer.show_without_escape_sequences()
+    to get a copy of the current document without them.
+
+    Documents larger than large_file_threshold bytes are styled by the python fallback as well,
+    but only the visible area plus large_file_margin_lines lines above and below,
+    further areas get styled while scrolling.
+    A log file which is still being written to can be followed with
+    error_list_lexer.toggle_tail()
+    which appends new content to the current document as the file grows,
+    npp's own file monitoring should not be used at the same time.
+
+    The error lines of a document are indexed in the background, while the log grows as well,
+    and the number of errors per kind is shown in the status bar.
+    error_list_lexer.goto_next_error()
+    error_list_lexer.goto_previous_error()
+    move the caret to the next or previous error line and
+    error_list_lexer.open_error_location()
+    opens the file, the error under the caret refers to, at the reported line.
+
 '''
 
-from Npp import notepad, editor, NOTIFICATION
+from Npp import notepad, editor, NOTIFICATION, SCINTILLANOTIFICATION, MODIFICATIONFLAGS, STATUSBARSECTION
+import os
+import error_list_classifier
+from ctypes import windll, WINFUNCTYPE, c_size_t
+from ctypes.wintypes import HWND, UINT, DWORD
 
 
 class ErrorListLexer:
@@ -28,7 +64,35 @@ class ErrorListLexer:
         self.show_escape_chars = False
         self.separate_path_and_line_number = '0'
         self.interpret_escape_sequences = '1'
+        # number of lines styled in one go if the python fallback is used
+        self.styling_chunk_lines = 5000
+        # documents larger than this, in bytes, get styled only around the visible area
+        self.large_file_threshold = 50 * 1024 * 1024
+        # number of lines styled above and below the visible area in large file mode
+        self.large_file_margin_lines = 500
+        # how often, in milliseconds, tailed files are checked for new content
+        self.tail_interval_ms = 1000
+        # number of lines indexed in one go and the pause, in milliseconds, between two goes
+        self.index_chunk_lines = 2000
+        self.index_interval_ms = 20
         # ****************************************************
+
+        # buffers whose lexer has been set by init_lexer and not changed via the Language menu since
+        self.lexed_buffers = set()
+        # buffers styled by the python fallback instead of the builtin lexer
+        self.fallback_buffers = set()
+        # bufferID -> sorted list of already styled (start_line, end_line) ranges of a large file
+        self.large_file_buffers = {}
+        # bufferID -> (path, file offset up to which the content is shown)
+        self.tailed_buffers = {}
+        self.user32 = windll.user32
+        TIMERPROC = WINFUNCTYPE(None, HWND, UINT, c_size_t, DWORD)
+        self.timer_proc = TIMERPROC(self.on_timer)
+        self.timer_id = 0
+        # bufferID -> error_list_classifier.ErrorIndex of the documents of interest
+        self.error_indexes = {}
+        self.index_timer_proc = TIMERPROC(self.on_index_timer)
+        self.index_timer_id = 0
         
         self.SCE_ERR_DEFAULT =0
         self.SCE_ERR_PYTHON =1
@@ -72,68 +136,396 @@ class ErrorListLexer:
         self.SCE_ERR_ES_BRIGHT_CYAN = 54
         self.SCE_ERR_ES_WHITE = 55
 
+        # style -> foreground colour, None means the default foreground colour of the editor,
+        # call load_theme() after changing it
+        self.theme = {
+            self.SCE_ERR_DEFAULT: None,
+            self.SCE_ERR_PYTHON: (255,0,0),
+            self.SCE_ERR_GCC: (255,0,0),
+            self.SCE_ERR_MS: (255,0,0),
+            self.SCE_ERR_CMD: (255,0,0),
+            self.SCE_ERR_BORLAND: (255,0,0),
+            self.SCE_ERR_PERL: (255,0,0),
+            self.SCE_ERR_NET: (255,0,0),
+            self.SCE_ERR_LUA: (255,0,0),
+            self.SCE_ERR_CTAG: (255,0,0),
+            self.SCE_ERR_DIFF_CHANGED: (255,0,0),
+            self.SCE_ERR_DIFF_ADDITION: (255,0,0),
+            self.SCE_ERR_DIFF_DELETION: (255,0,0),
+            self.SCE_ERR_DIFF_MESSAGE: (255,0,0),
+            self.SCE_ERR_PHP: (255,0,0),
+            self.SCE_ERR_ELF: (255,0,0),
+            self.SCE_ERR_IFC: (255,0,0),
+            self.SCE_ERR_IFORT: (255,0,0),
+            self.SCE_ERR_ABSF: (255,0,0),
+            self.SCE_ERR_TIDY: (255,0,0),
+            self.SCE_ERR_JAVA_STACK: (255,0,0),
+            self.SCE_ERR_VALUE: (255,0,0),
+            self.SCE_ERR_GCC_INCLUDED_FROM: (255,0,0),
+
+            self.SCE_ERR_ESCSEQ: (30,30,30),
+            self.SCE_ERR_ESCSEQ_UNKNOWN: (255,255,120),
+
+            self.SCE_ERR_ES_BLACK: (0,0,0),
+            self.SCE_ERR_ES_RED: (255,0,0),
+            self.SCE_ERR_ES_GREEN: (0,255,0),
+            self.SCE_ERR_ES_BROWN: (150,75,0),
+            self.SCE_ERR_ES_BLUE: (0,0,255),
+            self.SCE_ERR_ES_MAGENTA: (255,200,255),
+            self.SCE_ERR_ES_CYAN: (255,200,100),
+            self.SCE_ERR_ES_GRAY: (128,128,128),
+            self.SCE_ERR_ES_DARK_GRAY: (255,200,100),
+            self.SCE_ERR_ES_BRIGHT_RED: (170, 1, 20),
+            self.SCE_ERR_ES_BRIGHT_GREEN: (255,200,100),
+            self.SCE_ERR_ES_YELLOW: (255,255,0),
+            self.SCE_ERR_ES_BRIGHT_BLUE: (9,84,190),
+            self.SCE_ERR_ES_BRIGHT_MAGENTA: (229,8,194),
+            self.SCE_ERR_ES_BRIGHT_CYAN: (27,244,207),
+            self.SCE_ERR_ES_WHITE: (255,255,255),
+        }
+        # (style, colour) pairs of the theme, see load_theme
+        self.theme_styles = ()
+        self.theme_version = 0
+        # view -> (theme_version, probe style, its colour) the view got last time,
+        # styles belong to the view and npp might reset them, see theme_applied
+        self.applied_themes = {}
+        self.load_theme()
+
         notepad.callback(self.on_langchanged, [NOTIFICATION.LANGCHANGED])
         notepad.callback(self.on_bufferactivated, [NOTIFICATION.BUFFERACTIVATED])
+        notepad.callback(self.on_filebeforeclose, [NOTIFICATION.FILEBEFORECLOSE])
+        notepad.callback(self.on_wordstylesupdated, [NOTIFICATION.WORDSTYLESUPDATED])
+        editor.callbackSync(self.on_styleneeded, [SCINTILLANOTIFICATION.STYLENEEDED])
+        editor.callbackSync(self.on_updateui, [SCINTILLANOTIFICATION.UPDATEUI])
+        editor.callbackSync(self.on_modified, [SCINTILLANOTIFICATION.MODIFIED])
 
 
-    def init_lexer(self):
+    def load_theme(self):
         '''
-            Initializes the lexer and its properties
+            Resolves the theme into the cached (style, colour) table
+            and marks the styles applied so far as outdated.
+
+            Args:
+                None
+            Returns:
+                None
+        '''
+        self.theme_styles = tuple(sorted(self.theme.items()))
+        self.theme_version += 1
+
+
+    def apply_theme(self):
+        '''
+            Applies the cached theme table to the styles of the current view
+            and remembers which theme the view got.
+            The default foreground colour is looked up here, as npp's theme might have changed.
+
             Args:
                 None
             Returns:
                 None
         '''
-        editor.styleSetFore(self.SCE_ERR_DEFAULT, notepad.getEditorDefaultForegroundColor())
-        editor.styleSetFore(self.SCE_ERR_PYTHON, (255,0,0))
-        editor.styleSetFore(self.SCE_ERR_GCC, (255,0,0))
-        editor.styleSetFore(self.SCE_ERR_MS, (255,0,0))
-        editor.styleSetFore(self.SCE_ERR_CMD, (255,0,0))
-        editor.styleSetFore(self.SCE_ERR_BORLAND, (255,0,0))
-        editor.styleSetFore(self.SCE_ERR_PERL, (255,0,0))
-        editor.styleSetFore(self.SCE_ERR_NET, (255,0,0))
-        editor.styleSetFore(self.SCE_ERR_LUA, (255,0,0))
-        editor.styleSetFore(self.SCE_ERR_CTAG, (255,0,0))
-        editor.styleSetFore(self.SCE_ERR_DIFF_CHANGED, (255,0,0))
-        editor.styleSetFore(self.SCE_ERR_DIFF_ADDITION, (255,0,0))
-        editor.styleSetFore(self.SCE_ERR_DIFF_DELETION, (255,0,0))
-        editor.styleSetFore(self.SCE_ERR_DIFF_MESSAGE, (255,0,0))
-        editor.styleSetFore(self.SCE_ERR_PHP, (255,0,0))
-        editor.styleSetFore(self.SCE_ERR_ELF, (255,0,0))
-        editor.styleSetFore(self.SCE_ERR_IFC, (255,0,0))
-        editor.styleSetFore(self.SCE_ERR_IFORT, (255,0,0))
-        editor.styleSetFore(self.SCE_ERR_ABSF, (255,0,0))
-        editor.styleSetFore(self.SCE_ERR_TIDY, (255,0,0))
-        editor.styleSetFore(self.SCE_ERR_JAVA_STACK, (255,0,0))
-        editor.styleSetFore(self.SCE_ERR_VALUE, (255,0,0))
-        editor.styleSetFore(self.SCE_ERR_GCC_INCLUDED_FROM, (255,0,0))
-
-        editor.styleSetFore(self.SCE_ERR_ESCSEQ, (30,30,30))
+        default_foreground = notepad.getEditorDefaultForegroundColor()
+        probe = (None, None)
+        for style, colour in self.theme_styles:
+            editor.styleSetFore(style, default_foreground if colour is None else colour)
+            if probe[0] is None and colour is not None and tuple(colour) != tuple(default_foreground):
+                probe = (style, tuple(colour))
         editor.styleSetVisible(self.SCE_ERR_ESCSEQ, self.show_escape_chars)
-        editor.styleSetFore(self.SCE_ERR_ESCSEQ_UNKNOWN, (255,255,120))
         editor.styleSetVisible(self.SCE_ERR_ESCSEQ_UNKNOWN, self.show_escape_chars)
+        self.applied_themes[notepad.getCurrentView()] = (self.theme_version,) + probe
+
 
-        editor.styleSetFore(self.SCE_ERR_ES_BLACK, (0,0,0))
-        editor.styleSetFore(self.SCE_ERR_ES_RED, (255,0,0))
-        editor.styleSetFore(self.SCE_ERR_ES_GREEN, (0,255,0))
-        editor.styleSetFore(self.SCE_ERR_ES_BROWN, (150,75,0))
-        editor.styleSetFore(self.SCE_ERR_ES_BLUE, (0,0,255))
-        editor.styleSetFore(self.SCE_ERR_ES_MAGENTA, (255,200,255))
-        editor.styleSetFore(self.SCE_ERR_ES_CYAN, (255,200,100))
-        editor.styleSetFore(self.SCE_ERR_ES_GRAY, (128,128,128))
-        editor.styleSetFore(self.SCE_ERR_ES_DARK_GRAY, (255,200,100))
-        editor.styleSetFore(self.SCE_ERR_ES_BRIGHT_RED, (170, 1, 20))
-        editor.styleSetFore(self.SCE_ERR_ES_BRIGHT_GREEN, (255,200,100))
-        editor.styleSetFore(self.SCE_ERR_ES_YELLOW, (255,255,0))
-        editor.styleSetFore(self.SCE_ERR_ES_BRIGHT_BLUE, (9,84,190))
-        editor.styleSetFore(self.SCE_ERR_ES_BRIGHT_MAGENTA, (229,8,194))
-        editor.styleSetFore(self.SCE_ERR_ES_BRIGHT_CYAN, (27,244,207))
-        editor.styleSetFore(self.SCE_ERR_ES_WHITE, (255,255,255))
+    def theme_applied(self):
+        '''
+            Checks if the current view still has the styles of the current theme.
+            npp resets the styles of a view to its default colour, e.g. when it activates
+            a buffer, so one style whose theme colour differs from that is read back.
+
+            Args:
+                None
+            Returns:
+                boolean, False if apply_theme needs to be called
+        '''
+        applied = self.applied_themes.get(notepad.getCurrentView())
+        if applied is None or applied[0] != self.theme_version:
+            return False
+        _, style, colour = applied
+        return style is None or tuple(editor.styleGetFore(style)) == colour
+
+
+    def init_lexer(self):
+        '''
+            Initializes the lexer and its properties
+            Args:
+                None
+            Returns:
+                None
+        '''
+        if not self.theme_applied():
+            self.apply_theme()
+        self.lexed_buffers.add(notepad.getCurrentBufferID())
+        self.error_indexes.setdefault(notepad.getCurrentBufferID(), error_list_classifier.ErrorIndex())
+
+        if editor.getLength() > self.large_file_threshold:
+            # large file mode, the python fallback styles only what is needed, 0 = SCLEX_CONTAINER
+            self.large_file_buffers[notepad.getCurrentBufferID()] = []
+            editor.setLexer(0)
+            return
 
         editor.setLexer(10)
-        # ordering is important
-        editor.setProperty('lexer.errorlist.value.separate', self.separate_path_and_line_number)
-        editor.setProperty('lexer.errorlist.escape.sequences', self.interpret_escape_sequences)
+        if editor.getLexer() == 10:
+            self.fallback_buffers.discard(notepad.getCurrentBufferID())
+            # ordering is important
+            editor.setProperty('lexer.errorlist.value.separate', self.separate_path_and_line_number)
+            editor.setProperty('lexer.errorlist.escape.sequences', self.interpret_escape_sequences)
+        else:
+            # no errorlist lexer available, 0 = SCLEX_CONTAINER
+            self.fallback_buffers.add(notepad.getCurrentBufferID())
+            editor.setLexer(0)
+
+
+    def style_range(self, start_line, end_line):
+        '''
+            Styles the lines with the python fallback, chunk by chunk,
+            the style runs are applied with one setStyling call per run.
+
+            Args:
+                start_line = integer, first line to be styled
+                end_line = integer, last line to be styled
+            Returns:
+                None
+        '''
+        line_count = editor.getLineCount()
+        escape_sequences = self.interpret_escape_sequences == '1'
+        for chunk_start in range(start_line, end_line + 1, self.styling_chunk_lines):
+            chunk_end = chunk_start + self.styling_chunk_lines
+            start_position = editor.positionFromLine(chunk_start)
+            if min(chunk_end, end_line + 1) < line_count:
+                end_position = editor.positionFromLine(min(chunk_end, end_line + 1))
+            else:
+                end_position = editor.getTextLength()
+            text = editor.getTextRange(start_position, end_position).encode('utf8')
+            editor.startStyling(start_position, 0)
+            for length, style in error_list_classifier.iter_style_runs(text.splitlines(True),
+                                                                       escape_sequences):
+                editor.setStyling(length, style)
+
+
+    def style_visible_area(self, buffer_id):
+        '''
+            Large file mode, styles those lines of the visible area, plus margin,
+            which have not been styled yet and remembers them as styled.
+
+            Args:
+                buffer_id = integer, the buffer of the current document
+            Returns:
+                None
+        '''
+        first_line = editor.docLineFromVisible(editor.getFirstVisibleLine())
+        start_line = max(0, first_line - self.large_file_margin_lines)
+        end_line = min(editor.getLineCount() - 1,
+                       first_line + editor.linesOnScreen() + self.large_file_margin_lines)
+
+        styled_ranges = self.large_file_buffers[buffer_id]
+        line = start_line
+        for styled_start, styled_end in styled_ranges:
+            if styled_end < line:
+                continue
+            if styled_start > end_line:
+                break
+            if styled_start > line:
+                self.style_range(line, styled_start - 1)
+            line = styled_end + 1
+        if line <= end_line:
+            self.style_range(line, end_line)
+
+        merged = []
+        for styled_start, styled_end in sorted(styled_ranges + [(start_line, end_line)]):
+            if merged and styled_start <= merged[-1][1] + 1:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], styled_end))
+            else:
+                merged.append((styled_start, styled_end))
+        self.large_file_buffers[buffer_id] = merged
+
+
+    def toggle_tail(self):
+        '''
+            Starts or stops following the file of the current document.
+            While followed, content appended to the file is appended to the document,
+            the document is neither reloaded nor restyled completely.
+
+            Args:
+                None
+            Returns:
+                None
+        '''
+        buffer_id = notepad.getCurrentBufferID()
+        if buffer_id in self.tailed_buffers:
+            del self.tailed_buffers[buffer_id]
+        else:
+            path = notepad.getCurrentFilename()
+            self.tailed_buffers[buffer_id] = (path, os.path.getsize(path))
+
+
+    def append_new_content(self, buffer_id):
+        '''
+            Appends the complete lines written to the followed file
+            since the last check to the current document.
+
+            Args:
+                buffer_id = integer, the buffer of the current document
+            Returns:
+                None
+        '''
+        path, offset = self.tailed_buffers[buffer_id]
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        if size < offset:
+            # file got truncated, follow it from its new end
+            self.tailed_buffers[buffer_id] = (path, size)
+            return
+        if size == offset:
+            return
+
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read(size - offset)
+        complete_lines = data.rfind(b'\n') + 1
+        if not complete_lines:
+            return
+
+        at_end = editor.getCurrentPos() == editor.getLength()
+        editor.appendText(data[:complete_lines].decode('utf8', 'replace'))
+        editor.setSavePoint()
+        self.tailed_buffers[buffer_id] = (path, offset + complete_lines)
+        if at_end:
+            editor.documentEnd()
+
+
+    def index_next_chunk(self, buffer_id):
+        '''
+            Adds the next index_chunk_lines lines of the current document to its error index.
+
+            Args:
+                buffer_id = integer, the buffer of the current document
+            Returns:
+                bool, True if there are still lines to be indexed
+        '''
+        index = self.error_indexes[buffer_id]
+        line_count = editor.getLineCount()
+        if index.indexed_lines >= line_count:
+            return False
+        end_line = min(index.indexed_lines + self.index_chunk_lines, line_count)
+        end_position = editor.positionFromLine(end_line) if end_line < line_count else editor.getTextLength()
+        text = editor.getTextRange(editor.positionFromLine(index.indexed_lines), end_position)
+        index.add_lines(text.encode('utf8').splitlines(True))
+        self.show_error_counts(buffer_id)
+        return end_line < line_count
+
+
+    def show_error_counts(self, buffer_id):
+        '''
+            Shows the number of errors per kind found so far in the status bar.
+
+            Args:
+                buffer_id = integer, the buffer of the current document
+            Returns:
+                None
+        '''
+        index = self.error_indexes[buffer_id]
+        counts = ' | '.join('{} {}'.format(name, count) for name, count in index.counts())
+        notepad.setStatusBar(STATUSBARSECTION.DOCTYPE, 'errorlist  {}'.format(counts or 'no errors'))
+
+
+    def goto_error(self, find_line):
+        '''
+            Moves the caret to the error line found by find_line,
+            indexes the rest of the document first if needed.
+
+            Args:
+                find_line = function, ErrorIndex.next_line or ErrorIndex.previous_line
+            Returns:
+                None
+        '''
+        buffer_id = notepad.getCurrentBufferID()
+        if buffer_id not in self.error_indexes:
+            return
+        index = self.error_indexes[buffer_id]
+        current_line = editor.lineFromPosition(editor.getCurrentPos())
+        line = find_line(index, current_line)
+        while line is None and index.indexed_lines < editor.getLineCount():
+            self.index_next_chunk(buffer_id)
+            line = find_line(index, current_line)
+        if line is not None:
+            editor.ensureVisible(line)
+            editor.gotoLine(line)
+
+
+    def goto_next_error(self):
+        '''
+            Moves the caret to the next error line.
+
+            Args:
+                None
+            Returns:
+                None
+        '''
+        self.goto_error(error_list_classifier.ErrorIndex.next_line)
+
+
+    def goto_previous_error(self):
+        '''
+            Moves the caret to the previous error line.
+
+            Args:
+                None
+            Returns:
+                None
+        '''
+        self.goto_error(error_list_classifier.ErrorIndex.previous_line)
+
+
+    def open_error_location(self):
+        '''
+            Opens the file the error line under the caret refers to and
+            moves the caret to the reported line.
+            Relative paths are resolved against the directory of the log.
+
+            Args:
+                None
+            Returns:
+                None
+        '''
+        line = editor.lineFromPosition(editor.getCurrentPos())
+        location = error_list_classifier.error_location(editor.getLine(line).encode('utf8'))
+        if location is None:
+            return
+        path, line_number = location
+        path = os.path.join(os.path.dirname(notepad.getCurrentFilename()), path.decode('utf8', 'replace'))
+        if not os.path.isfile(path):
+            notepad.setStatusBar(STATUSBARSECTION.DOCTYPE, 'errorlist  {} not found'.format(path))
+            return
+        notepad.open(path)
+        editor.ensureVisible(line_number - 1)
+        editor.gotoLine(line_number - 1)
+
+
+    def show_without_escape_sequences(self):
+        '''
+            Opens a new document containing the text of the current one
+            without the ansi escape sequences, to be able to search it.
+
+            Args:
+                None
+            Returns:
+                None
+        '''
+        text = error_list_classifier.strip_escape_sequences(editor.getText().encode('utf8'))
+        notepad.new()
+        editor.setText(text.decode('utf8'))
 
 
     def check_lexers(self):
@@ -146,16 +538,143 @@ class ErrorListLexer:
                 None
         '''
 
-        has_no_lexer_assigned = editor.getLexerLanguage() == 'null'
-        _, _, file_extension = notepad.getCurrentFilename().rpartition('.')
-        if has_no_lexer_assigned and file_extension in self.known_extensions:
-            self.init_lexer()
+        if editor.getLexerLanguage() == 'null':
+            # a new document or npp has reset lexer and styles while activating the buffer
+            _, _, file_extension = notepad.getCurrentFilename().rpartition('.')
+            if file_extension in self.known_extensions:
+                self.init_lexer()
+        elif notepad.getCurrentBufferID() in self.lexed_buffers and not self.theme_applied():
+            # the lexer is still in place, the styles of the view are missing or outdated
+            self.apply_theme()
+
+
+    def on_styleneeded(self, args):
+        '''
+            Callback which gets called every time scintilla needs
+            a range of a container lexed document to be styled.
+            Only documents handled by the python fallback are of interest.
+
+            Args:
+                position, up to which the document needs to be styled, is of interest
+            Returns:
+                None
+        '''
+        buffer_id = notepad.getCurrentBufferID()
+        if buffer_id in self.large_file_buffers:
+            self.style_visible_area(buffer_id)
+            # everything else gets styled once it becomes visible
+            editor.startStyling(args['position'], 0)
+        elif buffer_id in self.fallback_buffers:
+            self.style_range(editor.lineFromPosition(editor.getEndStyled()),
+                             editor.lineFromPosition(args['position']))
+
+
+    def on_updateui(self, args):
+        '''
+            Callback which gets called every time scintilla
+            (aka the editor) changed something within the document.
+            Styles the newly visible area of a large file and
+            starts the timers, within npp's main thread, if a file should be followed
+            or the document is not completely indexed.
+
+            Args:
+                provided by scintilla but none are of interest
+            Returns:
+                None
+        '''
+        buffer_id = notepad.getCurrentBufferID()
+        if buffer_id in self.large_file_buffers:
+            self.style_visible_area(buffer_id)
+        if self.tailed_buffers and not self.timer_id:
+            self.timer_id = self.user32.SetTimer(None, 0, self.tail_interval_ms, self.timer_proc)
+        index = self.error_indexes.get(buffer_id)
+        if index is not None and not self.index_timer_id and index.indexed_lines < editor.getLineCount():
+            self.index_timer_id = self.user32.SetTimer(None, 0, self.index_interval_ms, self.index_timer_proc)
+
+
+    def on_modified(self, args):
+        '''
+            Callback which gets called every time the document gets modified.
+            The lines from the modified one onwards are considered
+            as not indexed and, in large file mode, as not styled anymore.
+
+            Args:
+                position and modificationType are of interest
+            Returns:
+                None
+        '''
+        if args['modificationType'] & (MODIFICATIONFLAGS.INSERTTEXT | MODIFICATIONFLAGS.DELETETEXT):
+            buffer_id = notepad.getCurrentBufferID()
+            styled_ranges = self.large_file_buffers.get(buffer_id)
+            index = self.error_indexes.get(buffer_id)
+            if styled_ranges or index is not None:
+                line = editor.lineFromPosition(args['position'])
+                if styled_ranges:
+                    styled_ranges[:] = [(start, min(end, line - 1))
+                                        for start, end in styled_ranges if start < line]
+                if index is not None:
+                    index.truncate(line)
+
+
+    def on_timer(self, hwnd, msg, timer_id, tick_count):
+        '''
+            Callback which gets called by the timer every tail_interval_ms milliseconds.
+            Appends new content if the current document is followed and
+            stops the timer if no document is followed anymore.
+
+            Args:
+                provided by the timer but none are of interest
+            Returns:
+                None
+        '''
+        if not self.tailed_buffers:
+            self.user32.KillTimer(None, self.timer_id)
+            self.timer_id = 0
+            return
+        buffer_id = notepad.getCurrentBufferID()
+        if buffer_id in self.tailed_buffers:
+            self.append_new_content(buffer_id)
+
+
+    def on_index_timer(self, hwnd, msg, timer_id, tick_count):
+        '''
+            Callback which gets called by the index timer every index_interval_ms milliseconds.
+            Indexes the next chunk of the current document and
+            stops the timer once it is completely indexed.
+
+            Args:
+                provided by the timer but none are of interest
+            Returns:
+                None
+        '''
+        buffer_id = notepad.getCurrentBufferID()
+        if buffer_id not in self.error_indexes or not self.index_next_chunk(buffer_id):
+            self.user32.KillTimer(None, self.index_timer_id)
+            self.index_timer_id = 0
+
+
+    def on_filebeforeclose(self, args):
+        '''
+            Callback which gets called every time a document is about to be closed.
+
+            Args:
+                bufferID is of interest
+            Returns:
+                None
+        '''
+        self.lexed_buffers.discard(args['bufferID'])
+        self.fallback_buffers.discard(args['bufferID'])
+        self.large_file_buffers.pop(args['bufferID'], None)
+        self.tailed_buffers.pop(args['bufferID'], None)
+        self.error_indexes.pop(args['bufferID'], None)
 
 
     def on_bufferactivated(self, args):
         '''
             Callback which gets called every time one switches a document.
-            Triggers the check if the document is of interest.
+            Triggers the check if the document is of interest, which applies
+            the styles again only if npp has reset them,
+            and shows its error counts.
 
             Args:
                 provided by notepad object but none are of interest
@@ -163,11 +682,15 @@ class ErrorListLexer:
                 None
         '''
         self.check_lexers()
+        buffer_id = notepad.getCurrentBufferID()
+        if buffer_id in self.error_indexes:
+            self.show_error_counts(buffer_id)
 
 
     def on_langchanged(self, args):
         '''
-            Callback gets called every time one uses the Language menu to set a lexer
+            Callback gets called every time one uses the Language menu to set a lexer,
+            npp has replaced the lexer and reset the styles of the view then.
             Triggers the check if the document is of interest
 
             Args:
@@ -175,6 +698,23 @@ class ErrorListLexer:
             Returns:
                 None
         '''
+        self.lexed_buffers.discard(notepad.getCurrentBufferID())
+        self.check_lexers()
+
+
+    def on_wordstylesupdated(self, args):
+        '''
+            Callback which gets called every time npp's theme or styles have been changed,
+            npp has reset the styles of both views then.
+            Triggers the check if the document is of interest, which applies
+            the styles, with the new default foreground colour, to the current view.
+
+            Args:
+                provided by notepad object but none are of interest
+            Returns:
+                None
+        '''
+        self.applied_themes.clear()
         self.check_lexers()
 
 